@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from storage import data_path, open_database
+from suppression import address_hashes
+
+load_dotenv()
+
+# Cross-campaign frequency cap: at most FREQUENCY_CAP_MAX emails per address
+# every FREQUENCY_CAP_DAYS days (0 disables the cap and the index)
+FREQUENCY_CAP_MAX = int(os.getenv("FREQUENCY_CAP_MAX", "0"))
+FREQUENCY_CAP_DAYS = float(os.getenv("FREQUENCY_CAP_DAYS", "7"))
+CONTACT_INDEX_PATH = os.getenv("CONTACT_INDEX_PATH") or data_path("contacts.sqlite3")
+
+# SQLite page cache per connection
+CONTACT_INDEX_CACHE_MB = int(os.getenv("CONTACT_INDEX_CACHE_MB", "64"))
+
+# Delete send records that fell out of the window at most this often
+PRUNE_INTERVAL = 3600
+
+class ContactIndex:
+    """
+    Per-address send history shared by every campaign
+
+    Addresses are keyed by the same 64-bit hash as the suppression list and
+    stored as SQLite integers. `sends` holds one row per admitted email with
+    a covering (address_hash, sent_at) index, so a whole batch is counted
+    with one indexed join; `contacts` keeps the last send time per address.
+    Admission is checked and recorded in one IMMEDIATE transaction, so
+    concurrent campaigns (or processes) cannot both take the last slot.
+    """
+
+    def __init__(self, path: str = CONTACT_INDEX_PATH, max_sends: int = FREQUENCY_CAP_MAX,
+                 window_days: float = FREQUENCY_CAP_DAYS):
+        self.path = path
+        self.max_sends = max_sends
+        self.window = window_days * 24 * 3600
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._conn = open_database(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Batch inserts touch pages all over the index; keep them in memory
+        self._conn.execute(f"PRAGMA cache_size=-{CONTACT_INDEX_CACHE_MB * 1024}")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sends (address_hash INTEGER NOT NULL, sent_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sends_address ON sends(address_hash, sent_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS contacts ("
+            "address_hash INTEGER PRIMARY KEY, last_sent_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TEMP TABLE batch (address_hash INTEGER PRIMARY KEY) WITHOUT ROWID")
+
+    @contextmanager
+    def _transaction(self, mode: str = "DEFERRED"):
+        """One transaction around a batch (call with _lock held)
+
+        The connection runs in autocommit mode, so without this every row
+        written to the temp batch table would be its own transaction.
+        """
+        self._conn.execute(f"BEGIN {mode}")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _keys(emails: Iterable) -> Tuple[np.ndarray, np.ndarray]:
+        """Signed 64-bit keys (SQLite integers) and a mask of rows holding an address"""
+        hashes, present = address_hashes(emails)
+        return hashes.view(np.int64), present
+
+    def _load_batch(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Fill the temp batch table; returns (sorted unique keys, row -> unique position)"""
+        unique, inverse = np.unique(keys, return_inverse=True)
+        self._conn.execute("DELETE FROM batch")
+        # Sorted inserts append to the B-tree instead of splitting pages at random
+        self._conn.executemany("INSERT INTO batch (address_hash) VALUES (?)", ((k,) for k in unique.tolist()))
+        return unique, inverse
+
+    @staticmethod
+    def _scatter(rows, unique: np.ndarray, inverse: np.ndarray, fill, dtype) -> np.ndarray:
+        values = np.full(len(unique), fill, dtype=dtype)
+        if rows:
+            found, found_values = zip(*rows)
+            values[np.searchsorted(unique, np.array(found, dtype=np.int64))] = found_values
+        return values[inverse]
+
+    def _window_counts(self, keys: np.ndarray, since: float) -> np.ndarray:
+        unique, inverse = self._load_batch(keys)
+        rows = self._conn.execute(
+            "SELECT b.address_hash, COUNT(*) FROM batch b "
+            "JOIN sends s ON s.address_hash = b.address_hash AND s.sent_at >= ? "
+            "GROUP BY b.address_hash", (since,)
+        ).fetchall()
+        return self._scatter(rows, unique, inverse, 0, np.int64)
+
+    def recent_sends(self, emails: Iterable) -> np.ndarray:
+        """
+        Count emails sent to each address within the cap window
+
+        Args:
+            emails: Series (or iterable) of addresses
+
+        Returns:
+            np.ndarray: Send count per row, aligned with the input
+        """
+        keys, present = self._keys(emails)
+        with self._lock, self._transaction():
+            counts = self._window_counts(keys, time.time() - self.window)
+        return np.where(present, counts, 0)
+
+    def last_sent(self, emails: Iterable) -> pd.Series:
+        """Last admission time (epoch seconds) per row, NaN for never-mailed addresses"""
+        keys, present = self._keys(emails)
+        with self._lock, self._transaction():
+            unique, inverse = self._load_batch(keys)
+            rows = self._conn.execute(
+                "SELECT c.address_hash, c.last_sent_at FROM batch b JOIN contacts c USING (address_hash)"
+            ).fetchall()
+        last = self._scatter(rows, unique, inverse, np.nan, float)
+        return pd.Series(np.where(present, last, np.nan))
+
+    def admit(self, emails: Iterable) -> Tuple[np.ndarray, float]:
+        """
+        Apply the frequency cap to a batch and record the admitted sends
+
+        Repeats of an address within the batch count against its cap too.
+
+        Args:
+            emails: Series (or iterable) of addresses about to be enqueued
+
+        Returns:
+            Tuple[np.ndarray, float]: Mask of rows that may be sent, and the
+                timestamp recorded for them (pass it to release() on failure)
+        """
+        keys, present = self._keys(emails)
+        now = time.time()
+        with self._lock:
+            with self._transaction("IMMEDIATE"):
+                counts = self._window_counts(keys, now - self.window)
+                # Earlier rows for the same address take slots first
+                repeats = pd.Series(keys).groupby(keys).cumcount().to_numpy()
+                allowed = present & (counts + repeats < self.max_sends)
+                admitted = np.sort(keys[allowed])
+                self._conn.executemany(
+                    "INSERT INTO sends (address_hash, sent_at) VALUES (?, ?)", ((k, now) for k in admitted.tolist())
+                )
+                self._conn.executemany(
+                    "INSERT INTO contacts (address_hash, last_sent_at) VALUES (?, ?) "
+                    "ON CONFLICT(address_hash) DO UPDATE SET last_sent_at = excluded.last_sent_at",
+                    ((k, now) for k in np.unique(admitted).tolist())
+                )
+            self._maybe_prune(now)
+        return allowed, now
+
+    def release(self, emails: Iterable, sent_at: float) -> None:
+        """
+        Give back slots recorded by admit() for emails that were not sent
+
+        Where that admission set an address's last send time, it falls back
+        to the latest remaining send; addresses with no send left in the
+        window (older ones are pruned) lose their contacts row.
+        """
+        keys, present = self._keys(emails)
+        keys = keys[present].tolist()
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "DELETE FROM sends WHERE rowid IN "
+                "(SELECT rowid FROM sends WHERE address_hash = ? AND sent_at = ? LIMIT 1)",
+                ((k, sent_at) for k in keys)
+            )
+            unique = [(k, sent_at) for k in set(keys)]
+            self._conn.executemany(
+                "UPDATE contacts SET last_sent_at = "
+                "(SELECT MAX(sent_at) FROM sends WHERE sends.address_hash = contacts.address_hash) "
+                "WHERE address_hash = ? AND last_sent_at = ? "
+                "AND EXISTS (SELECT 1 FROM sends WHERE sends.address_hash = contacts.address_hash)",
+                unique
+            )
+            self._conn.executemany(
+                "DELETE FROM contacts WHERE address_hash = ? AND last_sent_at = ? "
+                "AND NOT EXISTS (SELECT 1 FROM sends WHERE sends.address_hash = contacts.address_hash)",
+                unique
+            )
+
+    def _maybe_prune(self, now: float) -> None:
+        """Drop send records older than the window (call with _lock held)"""
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._conn.execute("DELETE FROM sends WHERE sent_at < ?", (now - self.window,))
+        self._last_prune = now
+
+    def cap_message(self) -> str:
+        """Reason reported for rows held back by the cap"""
+        return f"Frequency cap reached ({self.max_sends} per {self.window / 86400:g} days)"
+
+    def stats(self) -> Dict:
+        with self._lock:
+            contacts = self._conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+            recent = self._conn.execute(
+                "SELECT COUNT(*) FROM sends WHERE sent_at >= ?", (time.time() - self.window,)
+            ).fetchone()[0]
+        return {
+            "max_sends": self.max_sends,
+            "window_days": self.window / 86400,
+            "contacts": contacts,
+            "sends_in_window": recent
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+_contact_index: Optional[ContactIndex] = None
+_contact_index_lock = threading.Lock()
+
+def get_contact_index() -> Optional[ContactIndex]:
+    """Get the shared contact index, or None when no frequency cap is configured"""
+    global _contact_index
+
+    if FREQUENCY_CAP_MAX <= 0:
+        return None
+    if _contact_index is None:
+        with _contact_index_lock:
+            if _contact_index is None:
+                _contact_index = ContactIndex()
+    return _contact_index
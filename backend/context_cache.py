@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+import gemini_client
+from routing import ModelRoute
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Lifetime of Gemini cachedContents created for shared prompt preambles
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+# Stop using a cached context this long before it expires
+REFRESH_MARGIN = 60
+# Upload refusals that won't change on retry (invalid or too small, no access, unknown model)
+PERMANENT_REJECTIONS = {400, 403, 404}
+# Seconds to send the preamble inline after a transient upload failure without Retry-After
+UPLOAD_RETRY_DELAY = 30.0
+
+class ContextCache:
+    """
+    Gemini cachedContents handles for shared prompt preambles
+
+    The preamble (system instruction) is uploaded once per model and reused
+    by name in every generateContent call until shortly before its TTL runs
+    out. Preambles Gemini refuses to cache (e.g. below the model's minimum
+    cacheable size) are remembered so callers fall back to sending a plain
+    system instruction without retrying the upload; after a transient
+    failure (rate limit, timeout, server error) the upload is retried once
+    Retry-After (or UPLOAD_RETRY_DELAY) has passed. A handle the server no
+    longer knows (expired or deleted early) is dropped with invalidate().
+    """
+
+    def __init__(self, ttl: int = GEMINI_CONTEXT_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._rejected = set()
+        self._retry_at: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self._async_locks = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def _key(route: ModelRoute, preamble: str) -> Tuple[str, str]:
+        return route.model, hashlib.sha256(preamble.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: Tuple[str, str]) -> Tuple[Optional[str], bool]:
+        """Return (cached name, whether an upload should be attempted)"""
+        with self._lock:
+            if key in self._rejected or self._retry_at.get(key, 0) > time.monotonic():
+                return None, False
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] - REFRESH_MARGIN > time.monotonic():
+                return entry[0], False
+            return None, True
+
+    def _payload(self, route: ModelRoute, preamble: str) -> Dict:
+        return {
+            "model": f"models/{route.model}",
+            "systemInstruction": {"parts": [{"text": preamble}]},
+            "ttl": f"{self.ttl}s"
+        }
+
+    def _store(self, key: Tuple[str, str], response) -> Optional[str]:
+        name = None
+        if response.status_code == 200:
+            try:
+                name = response.json().get('name')
+            except ValueError:
+                logger.warning("Context cache upload returned an unreadable body")
+        with self._lock:
+            if name:
+                self._entries[key] = (name, time.monotonic() + self.ttl)
+                self._retry_at.pop(key, None)
+                return name
+            if response.status_code in PERMANENT_REJECTIONS:
+                self._rejected.add(key)
+            else:
+                self._retry_at[key] = time.monotonic() + self._retry_delay(response)
+            return None
+
+    def _upload_failed(self, key: Tuple[str, str], error: Exception) -> None:
+        # Network errors and timeouts back off like a transient HTTP failure
+        logger.warning("Context cache upload failed: %s", error)
+        with self._lock:
+            self._retry_at[key] = time.monotonic() + UPLOAD_RETRY_DELAY
+
+    @staticmethod
+    def _retry_delay(response) -> float:
+        try:
+            return max(0.0, float(response.headers['retry-after']))
+        except (KeyError, ValueError):
+            return UPLOAD_RETRY_DELAY
+
+    async def get_async(self, route: ModelRoute, preamble: str, api_key: str) -> Optional[str]:
+        """
+        Get (creating if needed) the cached context name for a preamble
+
+        Args:
+            route: Model route the requests will use
+            preamble: Shared system instruction text
+            api_key: Gemini API key
+
+        Returns:
+            Optional[str]: cachedContents name, or None to send the preamble inline
+        """
+        key = self._key(route, preamble)
+        name, create = self._lookup(key)
+        if not create:
+            return name
+
+        loop = asyncio.get_running_loop()
+        lock = self._async_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            # Another task may have created it while we waited
+            name, create = self._lookup(key)
+            if not create:
+                return name
+            try:
+                response = await gemini_client.get_async_client().post(
+                    f"{route.api_base}/cachedContents?key={api_key}",
+                    json=self._payload(route, preamble)
+                )
+            except Exception as e:
+                self._upload_failed(key, e)
+                return None
+            return self._store(key, response)
+
+    def get(self, route: ModelRoute, preamble: str, api_key: str) -> Optional[str]:
+        """Synchronous counterpart of get_async"""
+        key = self._key(route, preamble)
+        name, create = self._lookup(key)
+        if not create:
+            return name
+        try:
+            response = gemini_client.get_client().post(
+                f"{route.api_base}/cachedContents?key={api_key}",
+                json=self._payload(route, preamble)
+            )
+        except Exception as e:
+            self._upload_failed(key, e)
+            return None
+        return self._store(key, response)
+
+    def invalidate(self, route: ModelRoute, preamble: str, name: str) -> None:
+        """
+        Forget a cached context the server reported missing
+
+        The next request for the preamble uploads it again. Only the given
+        handle is dropped, so a replacement created meanwhile is kept.
+        """
+        key = self._key(route, preamble)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == name:
+                del self._entries[key]
+
+_context_cache = ContextCache()
+
+def get_context_cache() -> ContextCache:
+    """Get the process-wide context cache"""
+    return _context_cache
@@ -3,8 +3,11 @@ import os
 import time
 from typing import List, Dict, Optional
 from jinja2 import Environment, FileSystemLoader
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
+from contact_index import get_contact_index
+from suppression import get_suppression_list
 
 load_dotenv()
 
@@ -69,10 +72,49 @@ def send_single_email(to_email: str, name: str, message: str,
             "error": "Resend API key not configured"
         }
     
-    try:
-        # Render email HTML
-        html_content = render_email_body(name, message, template_name)
+    # Never send a blank body (e.g. a row whose generation failed)
+    if not str(message or '').strip():
+        return {
+            "email": to_email,
+            "status": "failed",
+            "error": "Message is empty"
+        }
+    
+    # Render email HTML
+    html_content = render_email_body(name, message, template_name)
+    
+    return send_rendered_email(to_email, subject, html_content, attachment)
+
+def send_rendered_email(to_email: str, subject: str, html_content: str,
+                        attachment: Optional[Dict] = None) -> Dict:
+    """
+    Send an already rendered email using Resend API
+    
+    Args:
+        to_email: Recipient email address
+        subject: Email subject line
+        html_content: Rendered HTML body
+        attachment: Optional attachment data
         
+    Returns:
+        Dict: Send result with status and details
+    """
+    if not resend.api_key:
+        return {
+            "email": to_email,
+            "status": "failed",
+            "error": "Resend API key not configured"
+        }
+    
+    # Last line of defence: the address may have been suppressed mid-campaign
+    if get_suppression_list().is_suppressed(to_email):
+        return {
+            "email": to_email,
+            "status": "suppressed",
+            "error": "Address is on the suppression list"
+        }
+    
+    try:
         # Prepare email data
         email_data = {
             "from": SENDER_EMAIL,
@@ -134,10 +176,40 @@ def send_bulk_emails(data: Dict, delay_seconds: int = 1,
     results = []
     sent_count = 0
     failed_count = 0
+    suppressed_count = 0
+    capped_count = 0
+    
+    # Check every recipient against the suppression list in one pass
+    addresses = pd.Series([e.get('email') for e in emails_data], dtype=object)
+    suppressed = get_suppression_list().contains(addresses)
+    
+    # Reserve frequency cap slots up front; failed sends give theirs back
+    contact_index = get_contact_index()
+    capped = np.zeros(len(emails_data), dtype=bool)
+    if contact_index is not None:
+        allowed, admitted_at = contact_index.admit(addresses.where(~suppressed))
+        capped = ~suppressed & ~allowed
     
     print(f"Starting bulk email send for {len(emails_data)} recipients...")
     
     for index, email_info in enumerate(emails_data):
+        if suppressed[index]:
+            results.append({
+                "email": email_info.get('email'),
+                "status": "suppressed",
+                "error": "Address is on the suppression list"
+            })
+            suppressed_count += 1
+            continue
+        if capped[index]:
+            results.append({
+                "email": email_info.get('email'),
+                "status": "capped",
+                "error": contact_index.cap_message()
+            })
+            capped_count += 1
+            continue
+        
         # Determine subject for A/B testing
         if ab_test and index % 2 == 0:
             subject = alt_subject
@@ -158,8 +230,12 @@ def send_bulk_emails(data: Dict, delay_seconds: int = 1,
         # Update counters
         if result['status'] == 'sent':
             sent_count += 1
+        elif result['status'] == 'suppressed':
+            suppressed_count += 1
         else:
             failed_count += 1
+        if result['status'] != 'sent' and contact_index is not None:
+            contact_index.release([email_info.get('email')], admitted_at)
         
         # Progress update
         print(f"Processed {index + 1}/{len(emails_data)}: {result['email']} -> {result['status']}")
@@ -175,6 +251,8 @@ def send_bulk_emails(data: Dict, delay_seconds: int = 1,
             "total": len(emails_data),
             "sent": sent_count,
             "failed": failed_count,
+            "suppressed": suppressed_count,
+            "capped": capped_count,
             "success_rate": f"{(sent_count/len(emails_data)*100):.1f}%" if emails_data else "0%"
         },
         "results": results
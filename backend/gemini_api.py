@@ -1,14 +1,89 @@
-import httpx
 import os
+import re
+import json
+import time
 import asyncio
-from typing import List, Dict
+import logging
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+import httpx
 import pandas as pd
 from dotenv import load_dotenv
+import gemini_client
+from scheduler import get_scheduler, iterate_sync, run_sync
+from prompt_cache import get_cache
+from context_cache import get_context_cache
+import quota
+from quota import CampaignUsage, ESTIMATED_OUTPUT_TOKENS, estimate_tokens, track_usage
+from routing import (GEMINI_MAX_RETRIES, GEMINI_MODELS, RETRYABLE_STATUS, ModelRoute,
+                     backoff_delay, get_hedge_policy, get_router)
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
+# Primary model of the routing table (see routing.py)
+GEMINI_MODEL = GEMINI_MODELS[0]
+
+# How the shared prompt preamble is sent: "system" (systemInstruction on every
+# call), "cached" (uploaded once as cachedContents) or "inline" (in the prompt)
+GEMINI_PREAMBLE_MODE = os.getenv("GEMINI_PREAMBLE_MODE", "system").lower()
+
+GENERATION_MODES = ("row", "segment", "batch")
+GEMINI_BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "10"))
+
+# Placeholders Gemini is asked to use in per-segment templates
+SEGMENT_PLACEHOLDER = re.compile(r"\{\{\s*(name|company)\s*\}\}", re.IGNORECASE)
+DEFAULT_SEGMENT_COLUMNS = ['topic']
+
+# Preamble requirements that depend on what each generation mode asks for;
+# the rest of the preamble is shared
+MODE_REQUIREMENTS = {
+    "row": ["Personalize for the recipient named in the request"],
+    "segment": [
+        "Write {{name}} wherever the recipient's name belongs",
+        "Write {{company}} wherever the recipient's company belongs",
+        "Do not use any other placeholders"
+    ],
+    "batch": [
+        'Return a JSON array with one object per recipient: {"id": <recipient id>, "message": <email text>}',
+        "Personalize each email for its recipient and topic"
+    ]
+}
+
+# Structured output schema for multi-recipient prompts
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "INTEGER"},
+            "message": {"type": "STRING"}
+        },
+        "required": ["id", "message"]
+    }
+}
+
+class Prompt(NamedTuple):
+    """A prompt split into shared instructions and the per-recipient request"""
+    preamble: str
+    content: str
+    
+    def __str__(self) -> str:
+        return f"{self.preamble}\n\n{self.content}"
+
+PromptLike = Union[str, Prompt]
+
+class GeminiError(Exception):
+    """Raised when Gemini does not return generated content"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
 
 def get_industry_prompt(industry: str) -> str:
     """Get industry-specific prompt context"""
@@ -24,6 +99,327 @@ def get_industry_prompt(industry: str) -> str:
     }
     return templates.get(industry, templates["Generic"])
 
+@lru_cache(maxsize=64)
+def _build_preamble(tone: str, industry: str, enhance_options: Tuple[str, ...], mode: str = "row") -> str:
+    context = get_industry_prompt(industry)
+    requirements = "".join(f"\n    - {line}" for line in MODE_REQUIREMENTS[mode])
+    
+    preamble = f"""
+    You write {tone.lower()} marketing emails.
+    Context: {context}.
+    
+    Requirements:
+    - Keep it concise (under 200 words){requirements}
+    - Make it engaging and professional
+    """
+    
+    if "Emojis" in enhance_options:
+        preamble += "\n- Include relevant emojis"
+    if "Call to Action" in enhance_options:
+        preamble += "\n- Include a strong call-to-action"
+    if "HTML formatting" in enhance_options:
+        preamble += "\n- Format in clean HTML with proper styling"
+    else:
+        preamble += "\n- Use plain text format"
+    
+    return preamble
+
+def build_preamble(tone: str = "friendly", industry: str = "Generic",
+                   enhance_options: List[str] = None, mode: str = "row") -> str:
+    """
+    Build the instructions shared by every request of a campaign
+    
+    Args:
+        tone: Email tone (formal, friendly, urgent, promotional)
+        industry: Industry context
+        enhance_options: List of enhancement options
+        mode: Generation mode the requests use (see MODE_REQUIREMENTS)
+        
+    Returns:
+        str: Preamble text
+    """
+    return _build_preamble(tone, industry, tuple(enhance_options or []), mode)
+
+def build_prompt(row: pd.Series, tone: str = "friendly", 
+                 industry: str = "Generic", 
+                 enhance_options: List[str] = None) -> Prompt:
+    """
+    Build the Gemini prompt for a single recipient row
+    
+    Args:
+        row: Pandas Series containing email data
+        tone: Email tone (formal, friendly, urgent, promotional)
+        industry: Industry context
+        enhance_options: List of enhancement options
+        
+    Returns:
+        Prompt: Shared preamble plus the recipient-specific request
+    """
+    email = row.get('email', '')
+    name = row.get('name', 'Customer')
+    topic = row.get('topic', 'our latest offerings')
+    
+    return Prompt(
+        build_preamble(tone, industry, enhance_options),
+        f"Write a marketing email for {name} ({email}) about {topic}."
+    )
+
+def _build_payload(prompt: PromptLike, generation_config: Optional[Dict] = None,
+                   cached_content: Optional[str] = None) -> Dict:
+    """Build the generateContent request body for a prompt"""
+    split = isinstance(prompt, Prompt) and GEMINI_PREAMBLE_MODE != "inline"
+    payload = {
+        "contents": [{
+            "role": "user",
+            "parts": [{
+                "text": prompt.content if split else str(prompt)
+            }]
+        }]
+    }
+    if split:
+        # The preamble travels once per model as cached context, or as a system instruction
+        if cached_content:
+            payload["cachedContent"] = cached_content
+        else:
+            payload["systemInstruction"] = {"parts": [{"text": prompt.preamble}]}
+    if generation_config:
+        payload["generationConfig"] = generation_config
+    return payload
+
+def _retry_after(response) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header, if present"""
+    try:
+        return float(response.headers['retry-after'])
+    except (KeyError, ValueError):
+        return None
+
+def _record_usage(reservation: list, prompt_tokens: int, usage_metadata: Optional[Dict]) -> None:
+    """Correct the quota reservation and add usage to the current campaign"""
+    usage_metadata = usage_metadata or {}
+    total = usage_metadata.get('totalTokenCount', prompt_tokens + ESTIMATED_OUTPUT_TOKENS)
+    quota.get_limiter().record(reservation, int(total))
+    usage = quota.current_usage()
+    if usage is not None:
+        usage.record_request(prompt_tokens, usage_metadata)
+
+def _check_status(response, reservation: list, prompt_tokens: int) -> None:
+    """Raise GeminiError for non-200 responses, backing off on HTTP 429"""
+    if response.status_code == 200:
+        return
+    quota.get_limiter().record(reservation, prompt_tokens)
+    retry_after = _retry_after(response)
+    if response.status_code == 429:
+        quota.get_limiter().pause(retry_after or 10.0)
+        message = "HTTP 429: Gemini quota exceeded"
+    else:
+        message = f"HTTP {response.status_code}"
+    raise GeminiError(message, status_code=response.status_code,
+                      retryable=response.status_code in RETRYABLE_STATUS, retry_after=retry_after)
+
+def _extract_text(response, reservation: list, prompt_tokens: int) -> str:
+    """Extract generated text from a generateContent response or raise GeminiError"""
+    _check_status(response, reservation, prompt_tokens)
+    try:
+        body = response.json()
+        text = body['candidates'][0]['content']['parts'][0]['text'].strip()
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        raise GeminiError(f"Malformed response: {str(e)}")
+    _record_usage(reservation, prompt_tokens, body.get('usageMetadata'))
+    if not text:
+        raise GeminiError("Empty response")
+    return text
+
+def _select_route() -> ModelRoute:
+    """Pick a model route, failing fast when every circuit is open"""
+    route = get_router().select()
+    if route is None:
+        raise GeminiError("Gemini circuit open: endpoint unhealthy, failing fast")
+    return route
+
+def _cache_model() -> str:
+    """Model whose cached responses a lookup should find: the one requests go to now"""
+    return get_router().preferred().model
+
+def _report(route: ModelRoute, error: Optional[GeminiError] = None) -> None:
+    """Feed a request outcome into the route's circuit breaker"""
+    if error is not None and error.retryable and error.status_code != 429:
+        # Server errors and timeouts count against endpoint health
+        route.breaker.record_failure()
+    else:
+        route.breaker.record_success()
+
+def _transport_error(error: Exception, reservation: list, prompt_tokens: int) -> GeminiError:
+    """Wrap a client-side failure, releasing its quota reservation"""
+    quota.get_limiter().record(reservation, prompt_tokens)
+    return GeminiError(f"Request failed: {str(error)}", retryable=isinstance(error, httpx.TransportError))
+
+def _uses_context_cache(prompt: PromptLike) -> bool:
+    return isinstance(prompt, Prompt) and GEMINI_PREAMBLE_MODE == "cached"
+
+def _context_missing(response, route: ModelRoute, prompt: PromptLike, cached_content: Optional[str]) -> bool:
+    """
+    Drop a cachedContents handle the server no longer has (expired or deleted)
+    
+    Returns:
+        bool: True if the request failed for that reason and should be sent
+        again with the full preamble
+    """
+    if not cached_content or response.status_code not in (400, 403, 404):
+        return False
+    if response.status_code != 404 and "not found" not in response.text.lower():
+        return False
+    get_context_cache().invalidate(route, prompt.preamble, cached_content)
+    return True
+
+def _attempt_text(route: ModelRoute, prompt: PromptLike) -> str:
+    """One synchronous generateContent call against a route"""
+    cached_content = None
+    if _uses_context_cache(prompt):
+        cached_content = get_context_cache().get(route, prompt.preamble, GEMINI_API_KEY)
+    prompt_tokens = estimate_tokens(str(prompt))
+    reservation = quota.get_limiter().acquire_sync(prompt_tokens + ESTIMATED_OUTPUT_TOKENS)
+    started = time.monotonic()
+    try:
+        response = gemini_client.get_client().post(
+            f"{route.endpoint}?key={GEMINI_API_KEY}",
+            json=_build_payload(prompt, cached_content=cached_content)
+        )
+        if _context_missing(response, route, prompt, cached_content):
+            started = time.monotonic()
+            response = gemini_client.get_client().post(
+                f"{route.endpoint}?key={GEMINI_API_KEY}", json=_build_payload(prompt)
+            )
+    except Exception as e:
+        raise _transport_error(e, reservation, prompt_tokens)
+    text = _extract_text(response, reservation, prompt_tokens)
+    route.record_latency(time.monotonic() - started)
+    return text
+
+async def _attempt_text_async(route: ModelRoute, prompt: PromptLike,
+                              generation_config: Optional[Dict] = None) -> str:
+    """One generateContent call against a route on the shared async client"""
+    cached_content = None
+    if _uses_context_cache(prompt):
+        cached_content = await get_context_cache().get_async(route, prompt.preamble, GEMINI_API_KEY)
+    prompt_tokens = estimate_tokens(str(prompt))
+    reservation = await get_scheduler().throttle(prompt_tokens + ESTIMATED_OUTPUT_TOKENS)
+    started = time.monotonic()
+    try:
+        response = await gemini_client.get_async_client().post(
+            f"{route.endpoint}?key={GEMINI_API_KEY}",
+            json=_build_payload(prompt, generation_config, cached_content)
+        )
+        if _context_missing(response, route, prompt, cached_content):
+            started = time.monotonic()
+            response = await gemini_client.get_async_client().post(
+                f"{route.endpoint}?key={GEMINI_API_KEY}", json=_build_payload(prompt, generation_config)
+            )
+    except asyncio.CancelledError:
+        # A hedge loser never reaches _extract_text: settle its reservation
+        # with the prompt it sent instead of the full estimate
+        quota.get_limiter().record(reservation, prompt_tokens)
+        raise
+    except Exception as e:
+        raise _transport_error(e, reservation, prompt_tokens)
+    text = _extract_text(response, reservation, prompt_tokens)
+    route.record_latency(time.monotonic() - started)
+    return text
+
+async def _hedged_attempt_async(route: ModelRoute, prompt: PromptLike,
+                                generation_config: Optional[Dict] = None) -> str:
+    """
+    Run one attempt, hedging it with a duplicate if it is slow
+    
+    When hedging is enabled and the attempt is still pending after the
+    route's observed p95 latency, a second identical request is sent (within
+    the hedge budget). The first successful answer wins and the other
+    request is cancelled.
+    """
+    policy = get_hedge_policy()
+    delay = policy.delay(route)
+    original = asyncio.ensure_future(_attempt_text_async(route, prompt, generation_config))
+    if delay is None:
+        return await original
+    
+    pending = {original}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if done or not policy.try_hedge():
+            return await original
+        
+        hedge = asyncio.ensure_future(_attempt_text_async(route, prompt, generation_config))
+        pending.add(hedge)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        policy.record_win()
+                    return task.result()
+        # Both requests failed: surface the last error
+        raise task.exception()
+    finally:
+        for task in pending:
+            task.cancel()
+
+def _request_text(prompt: PromptLike) -> Tuple[str, str]:
+    """
+    Call generateContent synchronously with retries, raising GeminiError on failure
+    
+    Returns:
+        Tuple[str, str]: Generated text and the model that answered
+    """
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        route = _select_route()
+        try:
+            text = _attempt_text(route, prompt)
+        except GeminiError as e:
+            _report(route, e)
+            if not e.retryable or attempt >= GEMINI_MAX_RETRIES:
+                raise
+            time.sleep(backoff_delay(attempt, e.retry_after))
+            continue
+        except BaseException:
+            route.breaker.release()
+            raise
+        _report(route)
+        return text, route.model
+
+async def _request_text_async(prompt: PromptLike, generation_config: Optional[Dict] = None) -> Tuple[str, str]:
+    """
+    Call generateContent with retries, raising GeminiError on failure
+    
+    HTTP 429/5xx and network errors are retried with exponential backoff
+    (honoring Retry-After). Each attempt goes to the route chosen by the
+    model router, which skips models whose circuit is open or whose
+    latency is over the SLO, and may be hedged (see _hedged_attempt_async).
+    
+    Returns:
+        Tuple[str, str]: Generated text and the model that answered
+    """
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        route = _select_route()
+        try:
+            text = await _hedged_attempt_async(route, prompt, generation_config)
+        except GeminiError as e:
+            _report(route, e)
+            if not e.retryable or attempt >= GEMINI_MAX_RETRIES:
+                raise
+            await asyncio.sleep(backoff_delay(attempt, e.retry_after))
+            continue
+        except BaseException:
+            route.breaker.release()
+            raise
+        _report(route)
+        return text, route.model
+
+def _record_error(error: str, row: Optional[int] = None) -> None:
+    """Log a failed generation and count it against the current campaign"""
+    logger.warning("Generation failed%s: %s", f" for row {row}" if row is not None else "", error)
+    usage = quota.current_usage()
+    if usage is not None:
+        usage.record_error(error, row)
+
 def generate_single_message(row: pd.Series, tone: str = "friendly", 
                           industry: str = "Generic", 
                           enhance_options: List[str] = None) -> str:
@@ -38,99 +434,487 @@ def generate_single_message(row: pd.Series, tone: str = "friendly",
         
     Returns:
         str: Generated email content
+        
+    Raises:
+        GeminiError: If the API key is missing or generation fails
     """
     if not GEMINI_API_KEY:
-        return "Error: Gemini API key not configured"
+        raise GeminiError("Gemini API key not configured")
     
-    if enhance_options is None:
-        enhance_options = []
+    prompt = build_prompt(row, tone, industry, enhance_options)
     
-    email = row.get('email', '')
-    name = row.get('name', 'Customer')
-    topic = row.get('topic', 'our latest offerings')
-    context = get_industry_prompt(industry)
+    cache = get_cache()
+    if cache is not None:
+        return cache.get_or_generate(prompt, _cache_model(), _request_text)
+    text, _ = _request_text(prompt)
+    return text
+
+async def generate_text_async(prompt: PromptLike) -> str:
+    """
+    Generate text for a single prompt using the shared async client
     
-    # Build the prompt
-    prompt = f"""
-    Write a {tone.lower()} marketing email for {name} ({email}) about {topic}.
-    Context: {context}.
+    Responses are served from the prompt cache when available, and
+    identical prompts in flight at the same time share one API call.
     
-    Requirements:
-    - Keep it concise (under 200 words)
-    - Personalize for {name}
-    - Make it engaging and professional
+    Args:
+        prompt: Prompt text or split Prompt
+        
+    Returns:
+        str: Generated content
+        
+    Raises:
+        GeminiError: If generation fails
     """
+    cache = get_cache()
+    if cache is not None:
+        return await cache.get_or_generate_async(prompt, _cache_model(), _request_text_async)
+    text, _ = await _request_text_async(prompt)
+    return text
+
+async def stream_text_chunks(prompt: PromptLike) -> AsyncIterator[str]:
+    """
+    Stream generated text for a prompt as it is produced
     
-    if "Emojis" in enhance_options:
-        prompt += "\n- Include relevant emojis"
-    if "Call to Action" in enhance_options:
-        prompt += "\n- Include a strong call-to-action"
-    if "HTML formatting" in enhance_options:
-        prompt += "\n- Format in clean HTML with proper styling"
-    else:
-        prompt += "\n- Use plain text format"
+    Uses Gemini's streamGenerateContent endpoint with server-sent events,
+    so the first words arrive long before the full response is done. A
+    cached response is yielded as a single chunk, and a completed stream
+    is stored in the prompt cache.
     
-    headers = {"Content-Type": "application/json"}
-    payload = {
-        "contents": [{
-            "parts": [{
-                "text": prompt
-            }]
-        }]
-    }
+    Args:
+        prompt: Prompt text or split Prompt
+        
+    Yields:
+        str: Text chunks in order
+        
+    Raises:
+        GeminiError: If the API key is missing or the request fails
+    """
+    if not GEMINI_API_KEY:
+        raise GeminiError("Gemini API key not configured")
+    
+    cache = get_cache()
+    if cache is not None:
+        cached = cache.get(cache.make_key(prompt, _cache_model()))
+        if cached is not None:
+            yield cached
+            return
     
+    prompt_tokens = estimate_tokens(str(prompt))
+    chunks = []
+    usage_metadata = None
+    # Set once a cached context turned out to be gone on the server
+    inline_preamble = False
+    # Retry only until the first chunk; after that the caller has seen output
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        route = _select_route()
+        cached_content = None
+        if _uses_context_cache(prompt) and not inline_preamble:
+            cached_content = await get_context_cache().get_async(route, prompt.preamble, GEMINI_API_KEY)
+        reservation = await get_scheduler().throttle(prompt_tokens + ESTIMATED_OUTPUT_TOKENS)
+        context_missing = False
+        try:
+            async with gemini_client.get_async_client().stream(
+                "POST",
+                f"{route.stream_endpoint}?alt=sse&key={GEMINI_API_KEY}",
+                json=_build_payload(prompt, cached_content=cached_content)
+            ) as response:
+                if cached_content and response.status_code != 200:
+                    await response.aread()
+                    context_missing = _context_missing(response, route, prompt, cached_content)
+                if context_missing and attempt < GEMINI_MAX_RETRIES:
+                    # Send the full preamble instead, right away
+                    quota.get_limiter().record(reservation, prompt_tokens)
+                    _report(route)
+                    inline_preamble = True
+                    continue
+                _check_status(response, reservation, prompt_tokens)
+                
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    try:
+                        event = json.loads(line[len("data:"):])
+                        # The final event carries cumulative usage for the request
+                        usage_metadata = event.get('usageMetadata', usage_metadata)
+                        parts = event['candidates'][0]['content']['parts']
+                    except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+                        continue
+                    text = "".join(part.get('text', '') for part in parts)
+                    if text:
+                        chunks.append(text)
+                        yield text
+        except (GeminiError, httpx.TransportError) as e:
+            error = e if isinstance(e, GeminiError) else _transport_error(e, reservation, prompt_tokens)
+            _report(route, error)
+            if chunks or not error.retryable or attempt >= GEMINI_MAX_RETRIES:
+                raise error
+            await asyncio.sleep(backoff_delay(attempt, error.retry_after))
+            continue
+        except BaseException:
+            route.breaker.release()
+            # The consumer stopped early or the task was cancelled: charge
+            # what was streamed instead of the full output estimate
+            streamed = estimate_tokens("".join(chunks)) if chunks else 0
+            _record_usage(reservation, prompt_tokens, usage_metadata or {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": streamed,
+                "totalTokenCount": prompt_tokens + streamed
+            })
+            raise
+        _report(route)
+        break
+    
+    _record_usage(reservation, prompt_tokens, usage_metadata)
+    if cache is not None and chunks:
+        cache.set(cache.make_key(prompt, route.model), "".join(chunks).strip())
+
+def stream_text_chunks_sync(prompt: PromptLike) -> Iterator[str]:
+    """Synchronous iterator over stream_text_chunks, e.g. for st.write_stream"""
+    return iterate_sync(stream_text_chunks(prompt))
+
+async def _generate_or_error(prompt: PromptLike) -> Tuple[str, Optional[str]]:
+    """Run generate_text_async, turning a failure into an error description"""
     try:
-        response = httpx.post(
-            f"{GEMINI_ENDPOINT}?key={GEMINI_API_KEY}",
-            json=payload,
-            headers=headers,
-            timeout=30.0
-        )
+        return await generate_text_async(prompt), None
+    except GeminiError as e:
+        return "", str(e)
+
+async def stream_texts_async(prompts: Iterable[PromptLike]) -> AsyncIterator[Tuple[int, str, Optional[str]]]:
+    """
+    Generate text for many prompts, yielding each result as soon as it is ready
+    
+    Prompts are consumed lazily and scheduled through the shared scheduler,
+    so at most GEMINI_CONCURRENCY requests are in flight and RPM/TPM quotas
+    are respected. A failed prompt yields an empty text and an error
+    description, never an error string in place of content.
+    
+    Args:
+        prompts: Iterable of prompt strings or split Prompts
         
-        if response.status_code == 200:
-            content = response.json()['candidates'][0]['content']['parts'][0]['text']
-            return content.strip()
-        else:
-            return f"Error generating content: HTTP {response.status_code}"
-            
-    except Exception as e:
-        return f"Error generating content for {email}: {str(e)}"
+    Yields:
+        Tuple[int, str, Optional[str]]: (prompt index, generated text, error)
+        in completion order
+        
+    Raises:
+        GeminiError: If the API key is not configured
+    """
+    if not GEMINI_API_KEY:
+        raise GeminiError("Gemini API key not configured")
+    
+    async for index, (text, error) in get_scheduler().map_unordered(prompts, _generate_or_error):
+        yield index, text, error
 
-def generate_messages(df: pd.DataFrame, tone: str = "friendly", 
-                     industry: str = "Generic", 
-                     enhance_options: List[str] = None) -> List[str]:
+async def generate_texts_async(prompts: Iterable[PromptLike], usage: Optional[CampaignUsage] = None) -> List[str]:
     """
-    Generate email messages for all rows in DataFrame
+    Generate text for many prompts and return results in prompt order
+    
+    Args:
+        prompts: Iterable of prompt strings or split Prompts
+        usage: Optional tracker for token, cost and failure totals
+        
+    Returns:
+        List[str]: Generated texts aligned with the prompts ("" where generation failed)
+    """
+    with track_usage(usage or quota.current_usage()):
+        results = {}
+        async for index, text, error in stream_texts_async(prompts):
+            if error:
+                _record_error(error, index)
+            results[index] = text
+        return [results[i] for i in range(len(results))]
+
+def generate_texts(prompts: Iterable[PromptLike], usage: Optional[CampaignUsage] = None) -> List[str]:
+    """Synchronous wrapper around generate_texts_async"""
+    return run_sync(generate_texts_async(prompts, usage))
+
+async def stream_messages_async(df: pd.DataFrame, tone: str = "friendly", 
+                                industry: str = "Generic", 
+                                enhance_options: List[str] = None) -> AsyncIterator[Tuple[int, str, Optional[str]]]:
+    """
+    Generate email messages for all rows, yielding each one as it completes
+    
+    Args:
+        df: DataFrame containing email data
+        tone: Email tone
+        industry: Industry context
+        enhance_options: List of enhancement options
+        
+    Yields:
+        Tuple[int, str, Optional[str]]: (row position, generated message,
+        error) in completion order
+    """
+    prompts = (build_prompt(row, tone, industry, enhance_options) for _, row in df.iterrows())
+    async for position, message, error in stream_texts_async(prompts):
+        yield position, message, error
+
+def build_segment_prompt(topic: str, tone: str = "friendly", 
+                         industry: str = "Generic", 
+                         enhance_options: List[str] = None) -> Prompt:
+    """
+    Build a prompt asking for a reusable template for one segment
+    
+    Args:
+        topic: Segment topic
+        tone: Email tone
+        industry: Industry context
+        enhance_options: List of enhancement options
+        
+    Returns:
+        Prompt: Shared segment preamble plus the topic request
+    """
+    return Prompt(
+        build_preamble(tone, industry, enhance_options, mode="segment"),
+        f"Write a marketing email template about {topic}."
+    )
+
+def personalize_template(template: str, name: str, company: str = "") -> str:
+    """
+    Fill a segment template's {{name}} and {{company}} placeholders
+    
+    Args:
+        template: Generated template text
+        name: Recipient name
+        company: Recipient company
+        
+    Returns:
+        str: Personalized message
+    """
+    values = {"name": name or "Customer", "company": company or "your company"}
+    return SEGMENT_PLACEHOLDER.sub(lambda match: values[match.group(1).lower()], template)
+
+def _segment_positions(df: pd.DataFrame, segment_columns: List[str] = None) -> Dict[Tuple, List[int]]:
+    """Group row positions by their segment key values"""
+    columns = [c for c in (segment_columns or DEFAULT_SEGMENT_COLUMNS) if c in df.columns]
+    if not columns:
+        return {(): list(range(len(df)))}
+    
+    keys = df[columns].fillna('').astype(str).reset_index(drop=True)
+    return {
+        key if isinstance(key, tuple) else (key,): positions.tolist()
+        for key, positions in keys.groupby(columns, sort=False).indices.items()
+    }
+
+async def generate_segment_messages_async(df: pd.DataFrame, tone: str = "friendly", 
+                                        industry: str = "Generic", 
+                                        enhance_options: List[str] = None,
+                                        segment_columns: List[str] = None,
+                                        on_message: Optional[Callable[[int, str], None]] = None) -> List[str]:
+    """
+    Generate messages with one Gemini call per segment
+    
+    Rows are grouped by `segment_columns` (default: topic); tone, industry
+    and enhancement options are shared by the whole call. Each segment gets
+    a template with {{name}}/{{company}} placeholders that is personalized
+    locally for every row in it.
     
     Args:
         df: DataFrame containing email data
         tone: Email tone
         industry: Industry context
         enhance_options: List of enhancement options
+        segment_columns: Columns that define a segment
+        on_message: Called with (row position, message) as each row is generated
+        
+    Returns:
+        List[str]: Generated email messages, aligned with df rows ("" where
+        the segment's template could not be generated)
+    """
+    segments = _segment_positions(df, segment_columns)
+    columns = [c for c in (segment_columns or DEFAULT_SEGMENT_COLUMNS) if c in df.columns]
+    
+    prompts = []
+    for key in segments:
+        values = dict(zip(columns, key))
+        topic = values.get('topic') or 'our latest offerings'
+        prompts.append(build_segment_prompt(topic, tone, industry, enhance_options))
+    
+    logger.info("Generating %d segment templates for %d rows with Gemini API", len(prompts), len(df))
+    names = df['name'].fillna('Customer').tolist() if 'name' in df.columns else ['Customer'] * len(df)
+    companies = df['company'].fillna('').tolist() if 'company' in df.columns else [''] * len(df)
+    segment_rows = list(segments.values())
+    
+    messages = [""] * len(df)
+    async for index, template, error in stream_texts_async(prompts):
+        for position in segment_rows[index]:
+            if error:
+                _record_error(error, position)
+            else:
+                messages[position] = personalize_template(template, str(names[position]), str(companies[position]))
+                if on_message:
+                    on_message(position, messages[position])
+    
+    return messages
+
+def generate_segment_messages(df: pd.DataFrame, tone: str = "friendly", 
+                              industry: str = "Generic", 
+                              enhance_options: List[str] = None,
+                              segment_columns: List[str] = None,
+                              usage: Optional[CampaignUsage] = None) -> List[str]:
+    """Synchronous wrapper around generate_segment_messages_async"""
+    async def run() -> List[str]:
+        with track_usage(usage):
+            return await generate_segment_messages_async(df, tone, industry, enhance_options, segment_columns)
+    return run_sync(run())
+
+def build_batch_prompt(rows: List[Tuple[int, pd.Series]], tone: str = "friendly", 
+                       industry: str = "Generic", 
+                       enhance_options: List[str] = None) -> Prompt:
+    """
+    Build one prompt asking for a personalized email per recipient
+    
+    Args:
+        rows: (id, row) pairs; ids are echoed back in the JSON response
+        tone: Email tone
+        industry: Industry context
+        enhance_options: List of enhancement options
         
     Returns:
-        List[str]: Generated email messages
+        Prompt: Shared batch preamble plus the recipients as JSON
+    """
+    recipients = [
+        {
+            "id": int(row_id),
+            "name": str(row.get('name', 'Customer')),
+            "email": str(row.get('email', '')),
+            "topic": str(row.get('topic', 'our latest offerings'))
+        }
+        for row_id, row in rows
+    ]
+    
+    return Prompt(
+        build_preamble(tone, industry, enhance_options, mode="batch"),
+        f"Write a marketing email for each of these recipients (JSON):\n{json.dumps(recipients, ensure_ascii=False)}"
+    )
+
+def parse_batch_response(text: str, expected_ids: Iterable[int]) -> Dict[int, str]:
     """
-    messages = []
-    total_rows = len(df)
+    Validate a batched JSON response and map messages back to recipient ids
     
-    print(f"Generating {total_rows} messages with Gemini API...")
+    Entries with unknown ids, duplicate ids or empty messages are dropped.
     
-    for index, row in df.iterrows():
-        print(f"Processing {index + 1}/{total_rows}: {row.get('email', 'unknown')}")
-        message = generate_single_message(row, tone, industry, enhance_options)
-        messages.append(message)
+    Args:
+        text: Raw response text (a JSON array)
+        expected_ids: Recipient ids sent in the prompt
         
-        # Add small delay to respect API rate limits
-        if index < total_rows - 1:  # Don't sleep after the last iteration
-            import time
-            time.sleep(0.5)
+    Returns:
+        Dict[int, str]: Message per recipient id found in the response
+    """
+    expected = set(expected_ids)
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(entries, list):
+        return {}
+    
+    messages = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        row_id, message = entry.get('id'), entry.get('message')
+        if isinstance(row_id, str) and row_id.isdigit():
+            row_id = int(row_id)
+        if row_id in expected and row_id not in messages and isinstance(message, str) and message.strip():
+            messages[row_id] = message.strip()
+    return messages
+
+async def _request_batch_async(prompt: PromptLike) -> Tuple[str, str]:
+    """Request a JSON array response; only valid arrays are returned (and cached)"""
+    text, model = await _request_text_async(prompt, {
+        "responseMimeType": "application/json",
+        "responseSchema": BATCH_RESPONSE_SCHEMA
+    })
+    try:
+        if isinstance(json.loads(text), list):
+            return text, f"{model}:batch"
+    except ValueError:
+        pass
+    raise GeminiError("Batch response is not a JSON array")
+
+async def generate_batch_messages_async(df: pd.DataFrame, tone: str = "friendly", 
+                                      industry: str = "Generic", 
+                                      enhance_options: List[str] = None,
+                                      batch_size: int = GEMINI_BATCH_SIZE,
+                                      on_message: Optional[Callable[[int, str], None]] = None) -> List[str]:
+    """
+    Generate messages packing `batch_size` recipients into each Gemini call
+    
+    Each call asks for a JSON array (via responseSchema) that is validated
+    and mapped back to rows by id. Recipients missing or malformed in the
+    response are retried individually with the per-row prompt.
+    
+    Args:
+        df: DataFrame containing email data
+        tone: Email tone
+        industry: Industry context
+        enhance_options: List of enhancement options
+        batch_size: Recipients per request
+        on_message: Called with (row position, message) as each row is generated
+        
+    Returns:
+        List[str]: Generated email messages, aligned with df rows ("" where
+        generation failed)
+        
+    Raises:
+        GeminiError: If the API key is not configured
+    """
+    if not GEMINI_API_KEY:
+        raise GeminiError("Gemini API key not configured")
+    
+    batch_size = max(1, batch_size)
+    messages: List[Optional[str]] = [None] * len(df)
+    batches = [list(range(start, min(start + batch_size, len(df)))) for start in range(0, len(df), batch_size)]
+    cache = get_cache()
+    
+    async def run_batch(positions: List[int]) -> Dict[int, str]:
+        prompt = build_batch_prompt([(p, df.iloc[p]) for p in positions], tone, industry, enhance_options)
+        try:
+            if cache is not None:
+                text = await cache.get_or_generate_async(prompt, f"{_cache_model()}:batch", _request_batch_async)
+            else:
+                text, _ = await _request_batch_async(prompt)
+        except GeminiError as e:
+            logger.warning("Batch of %d failed, retrying individually: %s", len(positions), e)
+            return {}
+        return parse_batch_response(text, positions)
+    
+    logger.info("Generating %d messages in %d batched Gemini requests", len(df), len(batches))
+    async for _, found in get_scheduler().map_unordered(batches, run_batch):
+        for position, message in found.items():
+            messages[position] = message
+            if on_message:
+                on_message(position, message)
+    
+    missing = [p for p, message in enumerate(messages) if message is None]
+    if missing:
+        logger.info("Retrying %d recipients individually", len(missing))
+        prompts = (build_prompt(df.iloc[p], tone, industry, enhance_options) for p in missing)
+        async for index, message, error in stream_texts_async(prompts):
+            if error:
+                _record_error(error, missing[index])
+            messages[missing[index]] = message
+            if on_message and not error:
+                on_message(missing[index], message)
     
     return messages
 
+def generate_batch_messages(df: pd.DataFrame, tone: str = "friendly", 
+                            industry: str = "Generic", 
+                            enhance_options: List[str] = None,
+                            batch_size: int = GEMINI_BATCH_SIZE,
+                            usage: Optional[CampaignUsage] = None) -> List[str]:
+    """Synchronous wrapper around generate_batch_messages_async"""
+    async def run() -> List[str]:
+        with track_usage(usage):
+            return await generate_batch_messages_async(df, tone, industry, enhance_options, batch_size)
+    return run_sync(run())
+
 async def generate_messages_async(df: pd.DataFrame, tone: str = "friendly", 
                                 industry: str = "Generic", 
-                                enhance_options: List[str] = None) -> List[str]:
+                                enhance_options: List[str] = None,
+                                mode: str = "row",
+                                usage: Optional[CampaignUsage] = None,
+                                on_message: Optional[Callable[[int, str], None]] = None) -> List[str]:
     """
     Asynchronously generate email messages for better performance
     
@@ -139,86 +923,65 @@ async def generate_messages_async(df: pd.DataFrame, tone: str = "friendly",
         tone: Email tone
         industry: Industry context
         enhance_options: List of enhancement options
+        mode: "row" for one Gemini call per recipient, "segment" for one
+            call per topic personalized locally, "batch" for several
+            recipients per call
+        usage: Optional tracker for token, cost and failure totals
+        on_message: Called with (row position, message) as each row is
+            generated, in completion order; failed rows are skipped
         
     Returns:
-        List[str]: Generated email messages
+        List[str]: Generated email messages ("" for rows whose generation
+        failed; failures are recorded on `usage`)
+        
+    Raises:
+        GeminiError: If the API key is not configured
     """
-    if not GEMINI_API_KEY:
-        return ["Error: Gemini API key not configured"] * len(df)
-    
-    if enhance_options is None:
-        enhance_options = []
-    
-    async def generate_single_async(row: pd.Series) -> str:
-        """Generate single message asynchronously"""
-        email = row.get('email', '')
-        name = row.get('name', 'Customer')
-        topic = row.get('topic', 'our latest offerings')
-        context = get_industry_prompt(industry)
-        
-        prompt = f"""
-        Write a {tone.lower()} marketing email for {name} ({email}) about {topic}.
-        Context: {context}.
-        
-        Requirements:
-        - Keep it concise (under 200 words)
-        - Personalize for {name}
-        - Make it engaging and professional
-        """
-        
-        if "Emojis" in enhance_options:
-            prompt += "\n- Include relevant emojis"
-        if "Call to Action" in enhance_options:
-            prompt += "\n- Include a strong call-to-action"
-        if "HTML formatting" in enhance_options:
-            prompt += "\n- Format in clean HTML"
-        
-        headers = {"Content-Type": "application/json"}
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": prompt
-                }]
-            }]
-        }
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unsupported generation mode: {mode}. Use one of {GENERATION_MODES}.")
+    
+    with track_usage(usage or quota.current_usage()):
+        if mode == "segment":
+            return await generate_segment_messages_async(df, tone, industry, enhance_options, on_message=on_message)
+        if mode == "batch":
+            return await generate_batch_messages_async(df, tone, industry, enhance_options, on_message=on_message)
         
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{GEMINI_ENDPOINT}?key={GEMINI_API_KEY}",
-                    json=payload,
-                    headers=headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    content = response.json()['candidates'][0]['content']['parts'][0]['text']
-                    return content.strip()
-                else:
-                    return f"Error: HTTP {response.status_code}"
-                    
-        except Exception as e:
-            return f"Error generating content: {str(e)}"
-    
-    # Generate all messages concurrently (with some rate limiting)
-    tasks = []
-    for _, row in df.iterrows():
-        tasks.append(generate_single_async(row))
-    
-    # Process in batches to avoid overwhelming the API
-    batch_size = 5
-    results = []
-    
-    for i in range(0, len(tasks), batch_size):
-        batch = tasks[i:i + batch_size]
-        batch_results = await asyncio.gather(*batch)
-        results.extend(batch_results)
-        
-        # Small delay between batches
-        if i + batch_size < len(tasks):
-            await asyncio.sleep(1)
-    
-    return results
+        messages = [""] * len(df)
+        completed = 0
+        
+        async for position, message, error in stream_messages_async(df, tone, industry, enhance_options):
+            completed += 1
+            if error:
+                _record_error(error, position)
+                continue
+            messages[position] = message
+            if on_message:
+                on_message(position, message)
+            logger.debug("Generated %d/%d: %s", completed, len(df), df.iloc[position].get('email', 'unknown'))
+        
+        return messages
+
+def generate_messages(df: pd.DataFrame, tone: str = "friendly", 
+                     industry: str = "Generic", 
+                     enhance_options: List[str] = None,
+                     mode: str = "row",
+                     usage: Optional[CampaignUsage] = None) -> List[str]:
+    """
+    Generate email messages for all rows in DataFrame
+    
+    Args:
+        df: DataFrame containing email data
+        tone: Email tone
+        industry: Industry context
+        enhance_options: List of enhancement options
+        mode: Generation mode ("row", "segment" or "batch")
+        usage: Optional tracker for token, cost and failure totals
+        
+    Returns:
+        List[str]: Generated email messages ("" where generation failed)
+    """
+    logger.info("Generating %d messages with Gemini API (%s mode)", len(df), mode)
+    return run_sync(generate_messages_async(df, tone, industry, enhance_options, mode, usage))
 
 def test_gemini_connection() -> dict:
     """Test Gemini API connection and return status"""
@@ -227,20 +990,10 @@ def test_gemini_connection() -> dict:
     
     test_prompt = "Write a short greeting email."
     
-    headers = {"Content-Type": "application/json"}
-    payload = {
-        "contents": [{
-            "parts": [{
-                "text": test_prompt
-            }]
-        }]
-    }
-    
     try:
-        response = httpx.post(
-            f"{GEMINI_ENDPOINT}?key={GEMINI_API_KEY}",
-            json=payload,
-            headers=headers,
+        response = gemini_client.get_client().post(
+            f"{get_router().primary.endpoint}?key={GEMINI_API_KEY}",
+            json=_build_payload(test_prompt),
             timeout=10.0
         )
         
@@ -0,0 +1,161 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration (override via .env)
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_MAX_KEEPALIVE = int(os.getenv("GEMINI_MAX_KEEPALIVE", "10"))
+GEMINI_KEEPALIVE_EXPIRY = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "30"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "10"))
+GEMINI_HTTP2 = os.getenv("GEMINI_HTTP2", "false").lower() in ("1", "true", "yes")
+
+_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+_async_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+_watchers: Dict[asyncio.AbstractEventLoop, asyncio.Task] = {}
+_injected_async_client: Optional[httpx.AsyncClient] = None
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional 'h2' package (pip install httpx[http2])"""
+    if not GEMINI_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("GEMINI_HTTP2 is enabled but 'h2' is not installed, falling back to HTTP/1.1")
+        return False
+
+def _client_options() -> dict:
+    """Shared keyword arguments for the sync and async clients"""
+    return {
+        "http2": _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=GEMINI_MAX_KEEPALIVE,
+            keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY
+        ),
+        "timeout": httpx.Timeout(GEMINI_TIMEOUT, connect=GEMINI_CONNECT_TIMEOUT),
+        "headers": {"Content-Type": "application/json"}
+    }
+
+def get_client() -> httpx.Client:
+    """
+    Get the process-wide pooled Gemini client for synchronous calls
+
+    Returns:
+        httpx.Client: Long-lived client reusing keep-alive connections
+    """
+    global _sync_client
+
+    if _sync_client is None or _sync_client.is_closed:
+        with _lock:
+            if _sync_client is None or _sync_client.is_closed:
+                _sync_client = httpx.Client(**_client_options())
+    return _sync_client
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the pooled Gemini client for the running event loop
+
+    An AsyncClient's connections belong to the loop that opened them, so
+    each loop gets its own client, reused for as long as the loop runs.
+    Sync callers all share one background loop (scheduler.run_sync), and
+    the API has its own. A client is closed when its loop shuts down:
+    asyncio.run() cancels the watcher task registered here before closing
+    the loop.
+
+    Returns:
+        httpx.AsyncClient: Long-lived client reusing keep-alive connections
+    """
+    global _injected_async_client
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is not None and not client.is_closed:
+        return client
+    with _lock:
+        for closed in [other for other in _async_clients if other.is_closed()]:
+            _async_clients.pop(closed)
+            _watchers.pop(closed, None)
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = _injected_async_client or httpx.AsyncClient(**_client_options())
+            _injected_async_client = None
+            _async_clients[loop] = client
+            # Tasks are only weakly referenced by the loop; keep the watcher alive
+            _watchers[loop] = loop.create_task(_close_with_loop(loop, client))
+    return client
+
+async def _close_with_loop(loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient) -> None:
+    """Wait until the loop is shut down (which cancels this task), then close its client"""
+    try:
+        await loop.create_future()
+    finally:
+        with _lock:
+            if _async_clients.get(loop) is client:
+                _async_clients.pop(loop)
+                _watchers.pop(loop, None)
+        await client.aclose()
+
+def set_clients(client: Optional[httpx.Client] = None,
+                async_client: Optional[httpx.AsyncClient] = None) -> None:
+    """
+    Replace the shared clients (e.g. with a mock transport in tests)
+
+    Args:
+        client: Sync client to use for all Gemini calls
+        async_client: Async client for the running loop, or for the next
+            loop that asks for one
+    """
+    global _sync_client, _injected_async_client
+
+    with _lock:
+        if client is not None:
+            _sync_client = client
+        if async_client is not None:
+            try:
+                _async_clients[asyncio.get_running_loop()] = async_client
+            except RuntimeError:
+                _injected_async_client = async_client
+
+async def aclose_clients() -> None:
+    """Close the running loop's client and the sync client (e.g. on app shutdown)"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.pop(loop, None)
+        watcher = _watchers.pop(loop, None)
+    if watcher is not None:
+        watcher.cancel()
+    if client is not None and not client.is_closed:
+        await client.aclose()
+    close_clients()
+
+def close_clients() -> None:
+    """Close the shared sync client, and the async clients of loops still running in other threads"""
+    global _sync_client
+
+    with _lock:
+        if _sync_client is not None and not _sync_client.is_closed:
+            _sync_client.close()
+        _sync_client = None
+        clients = list(_async_clients.items())
+    for loop, client in clients:
+        if loop.is_running() and not client.is_closed:
+            try:
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+            except Exception:
+                pass
+
+atexit.register(close_clients)
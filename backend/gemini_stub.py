@@ -0,0 +1,127 @@
+"""
+Local stand-in for the Gemini REST API
+
+Implements just enough of generateContent, streamGenerateContent (SSE) and
+cachedContents to exercise Blastify without a real key or quota. Replies
+are deterministic, usageMetadata is estimated from the request text, and
+latency and error rates can be injected. Run it with
+
+    python backend/gemini_stub.py
+
+and point the app at it with GEMINI_API_BASE=http://localhost:8001/v1beta.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import uuid
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from quota import estimate_tokens
+
+# Fault injection (override via environment)
+GEMINI_STUB_LATENCY = float(os.getenv("GEMINI_STUB_LATENCY", "0"))
+GEMINI_STUB_ERROR_RATE = float(os.getenv("GEMINI_STUB_ERROR_RATE", "0"))
+# Smallest preamble (in tokens) the stub agrees to cache, like Gemini's minimum
+GEMINI_STUB_MIN_CACHE_TOKENS = int(os.getenv("GEMINI_STUB_MIN_CACHE_TOKENS", "0"))
+
+app = FastAPI(title="Gemini stub")
+app.state.cached_contents = {}
+app.state.requests = []
+
+_RECIPIENTS = re.compile(r"\[\s*\{.*?\}\s*\]", re.DOTALL)
+
+def _text(content: Dict) -> str:
+    return "".join(part.get('text', '') for part in (content or {}).get('parts', []))
+
+def _reply(body: Dict) -> str:
+    """Deterministic reply for a request body"""
+    request_text = " ".join(_text(c) for c in body.get('contents', []))
+    config = body.get('generationConfig') or {}
+    if config.get('responseMimeType') == "application/json":
+        # Batched prompts embed their recipients as a JSON array
+        match = _RECIPIENTS.search(request_text)
+        recipients = json.loads(match.group(0)) if match else []
+        return json.dumps([
+            {"id": r.get('id'), "message": f"Hello {r.get('name', 'there')}, this is a stub email."}
+            for r in recipients
+        ])
+    return f"Stub email: {request_text.strip()}"
+
+def _usage(body: Dict, reply: str) -> Dict:
+    system = _text(body.get('systemInstruction'))
+    cached = ""
+    if body.get('cachedContent'):
+        cached = app.state.cached_contents.get(body['cachedContent'], "")
+    request_text = " ".join(_text(c) for c in body.get('contents', []))
+    cached_tokens = estimate_tokens(cached) if cached else 0
+    prompt_tokens = estimate_tokens(system + request_text) + cached_tokens
+    output_tokens = estimate_tokens(reply)
+    usage = {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": output_tokens,
+        "totalTokenCount": prompt_tokens + output_tokens
+    }
+    if cached_tokens:
+        usage["cachedContentTokenCount"] = cached_tokens
+    return usage
+
+async def _simulate_conditions():
+    if GEMINI_STUB_LATENCY > 0:
+        await asyncio.sleep(GEMINI_STUB_LATENCY)
+    if GEMINI_STUB_ERROR_RATE > 0 and random.random() < GEMINI_STUB_ERROR_RATE:
+        return JSONResponse(content={"error": {"code": 503, "message": "Stub overloaded"}}, status_code=503)
+    return None
+
+def _candidate(text: str) -> List[Dict]:
+    return [{"content": {"role": "model", "parts": [{"text": text}]}}]
+
+@app.post("/v1beta/cachedContents")
+async def create_cached_content(request: Request):
+    body = await request.json()
+    preamble = _text(body.get('systemInstruction'))
+    if estimate_tokens(preamble) < GEMINI_STUB_MIN_CACHE_TOKENS:
+        return JSONResponse(
+            content={"error": {"code": 400, "message": "Cached content is too small"}}, status_code=400
+        )
+    name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+    app.state.cached_contents[name] = preamble
+    return {"name": name, "model": body.get('model'), "ttl": body.get('ttl')}
+
+@app.post("/v1beta/models/{model_action}")
+async def generate(model_action: str, request: Request):
+    model, _, action = model_action.partition(":")
+    body = await request.json()
+    app.state.requests.append({"model": model, "action": action, "body": body})
+
+    if body.get('cachedContent') and body['cachedContent'] not in app.state.cached_contents:
+        return JSONResponse(content={"error": {"code": 404, "message": "Cached content not found"}}, status_code=404)
+    failure = await _simulate_conditions()
+    if failure is not None:
+        return failure
+
+    reply = _reply(body)
+    usage = _usage(body, reply)
+    if action == "generateContent":
+        return {"candidates": _candidate(reply), "usageMetadata": usage}
+    if action != "streamGenerateContent":
+        return JSONResponse(content={"error": {"code": 404, "message": f"Unknown action {action}"}}, status_code=404)
+
+    async def events():
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            event = {"candidates": _candidate(word if i == 0 else " " + word)}
+            if i == len(words) - 1:
+                event["usageMetadata"] = usage
+            yield f"data: {json.dumps(event)}\r\n\r\n"
+            await asyncio.sleep(0)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("GEMINI_STUB_PORT", "8001")))
@@ -0,0 +1,271 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import pyarrow as pa
+from dotenv import load_dotenv
+
+import gemini_api
+import row_stream
+import workers
+from quota import CampaignUsage
+from snapshots import get_snapshot_store
+
+load_dotenv()
+
+# Finished generation jobs are forgotten after this many seconds (override via .env)
+GENERATION_JOB_TTL = int(os.getenv("GENERATION_JOB_TTL", str(24 * 3600)))
+
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+class GenerationPendingError(ValueError):
+    """A campaign was sent while its generation job has no finished snapshot"""
+
+    def __init__(self, job: "GenerationJob"):
+        if job.state == JOB_RUNNING:
+            reason = "are still being generated"
+        else:
+            reason = f"were not generated (job {job.state}{': ' + job.error if job.error else ''})"
+        super().__init__(
+            f"Messages for campaign {job.campaign_id} {reason}; send result_campaign_id from "
+            f"GET /campaigns/{job.campaign_id}/generation/ once the job is done"
+        )
+        self.job = job
+
+class GenerationJob:
+    """
+    Background message generation for one campaign snapshot
+
+    Messages are recorded in completion order as Gemini returns them, so
+    clients can page through finished rows with a cursor while the rest are
+    still being generated. Once every row is done the list and its messages
+    are saved as a new snapshot (`result_campaign_id`), ready to send.
+    """
+
+    def __init__(self, campaign_id: str, total: int, mode: str = "row", tone: str = "friendly",
+                 industry: str = "Generic", enhance_options: List[str] = None):
+        self.campaign_id = campaign_id
+        self.total = total
+        self.mode = mode
+        self.tone = tone
+        self.industry = industry
+        self.enhance_options = enhance_options
+        self.usage = CampaignUsage()
+        self.state = JOB_RUNNING
+        self.error: Optional[str] = None
+        self.result_campaign_id: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        # Row positions in completion order, and their messages
+        self.positions: List[int] = []
+        self.messages: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state != JOB_RUNNING
+
+    def _record(self, position: int, message: str) -> None:
+        self.messages[position] = message
+        self.positions.append(position)
+
+    async def run(self) -> None:
+        """Generate every message, then snapshot the list with a message column"""
+        store = get_snapshot_store()
+        try:
+            df = await workers.run_blocking(store.load, self.campaign_id)
+            df['message'] = await gemini_api.generate_messages_async(
+                df, self.tone, self.industry, self.enhance_options,
+                mode=self.mode, usage=self.usage, on_message=self._record
+            )
+            info = await workers.run_blocking(store.info, self.campaign_id)
+            self.result_campaign_id = await workers.run_blocking(
+                store.save, df, filename=info.get("filename"), sheet=info.get("sheet"),
+                source_campaign_id=self.campaign_id
+            )
+            # Sends resolve through the store once this job is forgotten
+            await workers.run_blocking(store.link_result, self.campaign_id, self.result_campaign_id)
+            self.state = JOB_DONE
+        except asyncio.CancelledError:
+            self.state = JOB_CANCELLED
+            raise
+        except Exception as e:
+            self.state = JOB_FAILED
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+
+    def page(self, table: pa.Table, cursor: Optional[str] = None, limit: int = 0) -> Tuple[pa.Table, Optional[str]]:
+        """
+        Generated rows since `cursor`, in completion order
+
+        Args:
+            table: The source snapshot
+            cursor: Where the page starts (None for the first generated row)
+            limit: Page size; 0 means every row generated so far
+
+        Returns:
+            Tuple[pa.Table, Optional[str]]: Rows with `row` (position in the
+                list) and `message` columns, and the cursor to poll next
+                (None once the job has finished and every row was returned)
+
+        Raises:
+            ValueError: If the cursor is invalid
+        """
+        offset = row_stream.decode_cursor(cursor)
+        # Read the state first: a job that finishes after this point still
+        # hands out a cursor, and the next poll returns any remaining rows
+        finished = self.finished
+        available = len(self.positions)
+        end = min(available, offset + limit) if limit > 0 else available
+        positions = self.positions[offset:end] if end > offset else []
+
+        rows = table.take(pa.array(positions, type=pa.int64()))
+        if 'message' in rows.column_names:
+            rows = rows.drop_columns(['message'])
+        rows = rows.append_column('row', pa.array(positions, type=pa.int64()))
+        rows = rows.append_column('message', pa.array([self.messages[p] for p in positions], type=pa.string()))
+        end = offset + len(positions)
+        if finished and end >= available:
+            return rows, None
+        return rows, row_stream.encode_cursor(end)
+
+    def status(self) -> Dict:
+        return {
+            "campaign_id": self.campaign_id,
+            "status": self.state,
+            "mode": self.mode,
+            "total": self.total,
+            "completed": len(self.positions),
+            "error": self.error,
+            "result_campaign_id": self.result_campaign_id,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "usage": self.usage.summary()
+        }
+
+class GenerationJobs:
+    """
+    Generation jobs keyed by the campaign snapshot they generate for
+
+    Jobs are asyncio tasks on the API's event loop: Gemini calls are async
+    and share the app's scheduler and connection pool, and the blocking
+    snapshot reads and writes go through the worker thread pool.
+    """
+
+    def __init__(self, ttl: int = GENERATION_JOB_TTL):
+        self.ttl = ttl
+        self._jobs: Dict[str, GenerationJob] = {}
+
+    async def start(self, campaign_id: str, mode: str = "row", tone: str = "friendly",
+                    industry: str = "Generic", enhance_options: List[str] = None) -> GenerationJob:
+        """
+        Start generating messages for a campaign snapshot in the background
+
+        A job that is already running for the campaign is returned as is.
+
+        Args:
+            campaign_id: Snapshot to generate for
+            mode: Generation mode ("row", "segment" or "batch")
+            tone: Email tone
+            industry: Industry context
+            enhance_options: List of enhancement options
+
+        Returns:
+            GenerationJob: The running job
+
+        Raises:
+            KeyError: If there is no such snapshot
+            ValueError: If the mode is unknown
+            GeminiError: If the API key is not configured
+        """
+        if mode not in gemini_api.GENERATION_MODES:
+            raise ValueError(f"Unsupported generation mode: {mode}. Use one of {gemini_api.GENERATION_MODES}.")
+        if not gemini_api.GEMINI_API_KEY:
+            raise gemini_api.GeminiError("Gemini API key not configured")
+        self._prune()
+        job = self._jobs.get(campaign_id)
+        if job is not None and not job.finished:
+            return job
+        table = await workers.run_blocking(get_snapshot_store().open, campaign_id)
+        job = GenerationJob(campaign_id, table.num_rows, mode, tone, industry, enhance_options)
+        job._task = asyncio.create_task(job.run(), name=f"generate-{campaign_id}")
+        self._jobs[campaign_id] = job
+        return job
+
+    def get(self, campaign_id: str) -> GenerationJob:
+        """
+        Look up the latest job for a campaign
+
+        Raises:
+            KeyError: If no job was started for it
+        """
+        job = self._jobs.get(campaign_id)
+        if job is None:
+            raise KeyError(f"No generation job for campaign: {campaign_id}")
+        return job
+
+    async def send_campaign_id(self, campaign_id: str) -> str:
+        """
+        Snapshot to send for a campaign
+
+        A list whose messages were generated by a job is sent from the job's
+        result snapshot; the source snapshot has no messages. Jobs are
+        forgotten long before snapshots expire, so the result is looked up
+        in the snapshot store when the job is gone.
+
+        Raises:
+            GenerationPendingError: If a job for the campaign is still
+                running, failed or was cancelled
+            KeyError: If there is no such snapshot
+        """
+        job = self._jobs.get(campaign_id)
+        if job is not None:
+            if job.state != JOB_DONE:
+                raise GenerationPendingError(job)
+            return job.result_campaign_id
+        result_campaign_id = await workers.run_blocking(get_snapshot_store().result_of, campaign_id)
+        return result_campaign_id or campaign_id
+
+    async def cancel(self, campaign_id: str) -> GenerationJob:
+        """Stop a job; messages generated so far stay readable"""
+        job = self.get(campaign_id)
+        if job._task is not None and not job._task.done():
+            job._task.cancel()
+            try:
+                await job._task
+            except asyncio.CancelledError:
+                pass
+        if not job.finished:
+            # Cancelled before it started running
+            job.state = JOB_CANCELLED
+            job.finished_at = time.time()
+        return job
+
+    async def aclose(self) -> None:
+        """Cancel every running job (on app shutdown)"""
+        for campaign_id in list(self._jobs):
+            await self.cancel(campaign_id)
+
+    def _prune(self) -> None:
+        """Forget jobs that finished more than `ttl` seconds ago"""
+        if self.ttl <= 0:
+            return
+        cutoff = time.time() - self.ttl
+        for campaign_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[campaign_id]
+
+_generation_jobs: Optional[GenerationJobs] = None
+
+def get_generation_jobs() -> GenerationJobs:
+    """Get the shared generation job registry (used from the event loop only)"""
+    global _generation_jobs
+
+    if _generation_jobs is None:
+        _generation_jobs = GenerationJobs()
+    return _generation_jobs
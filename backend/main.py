@@ -1,13 +1,35 @@
 from fastapi import FastAPI, UploadFile, Form, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
+from typing import Optional
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-import parser as file_parser, email_sender, gemini_api
+import email_sender, gemini_api, gemini_client, pipeline, row_stream, workers
+import pyarrow as pa
+from contact_index import get_contact_index
+from generation_jobs import GenerationPendingError, get_generation_jobs
+from snapshots import EXPORT_FORMATS, get_snapshot_store
+from uploads import UploadOffsetError, get_upload_manager
+from starlette.requests import ClientDisconnect
+from suppression import REASON_UNSUBSCRIBE, get_suppression_list
+import webhook_ingest
 
 load_dotenv()
 
-app = FastAPI(title="Blastify Email Sender API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown hooks"""
+    # Spawn parsing workers now rather than on the first upload
+    workers.warm_up()
+    yield
+    # Stop generation jobs, then release pooled Gemini connections and worker pools
+    await get_generation_jobs().aclose()
+    await gemini_client.aclose_clients()
+    webhook_ingest.close_webhook_ingestor()
+    workers.shutdown()
+
+app = FastAPI(title="Blastify Email Sender API", version="1.0.0", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -22,38 +44,420 @@ app.add_middleware(
 async def root():
     return {"message": "Blastify Email Sender API is running!"}
 
+async def _rows_response(table: pa.Table, response_format: str, cursor: Optional[str] = None,
+                         limit: int = 0, **content) -> Response:
+    """
+    One page of rows as JSON, NDJSON or an Arrow IPC stream
+
+    JSON pages carry `content` and a `next_cursor` in the body; streamed
+    formats put them in X- headers and encode the rows batch by batch in a
+    worker thread, so the event loop never builds one huge string.
+    """
+    rows, next_cursor = row_stream.page(table, cursor, limit)
+    return await _page_response(rows, next_cursor, table.num_rows, response_format, **content)
+
+async def _page_response(page_rows: pa.Table, next_cursor: Optional[str], total_rows: int,
+                         response_format: str, **content) -> Response:
+    """Encode a page of rows already sliced by the caller (see _rows_response)"""
+    if response_format == row_stream.FORMAT_JSON:
+        content.update({"data": page_rows.to_pylist(), "next_cursor": next_cursor})
+        body = await workers.run_blocking(row_stream.dumps, content)
+        return Response(body, media_type=row_stream.ROW_FORMATS[response_format])
+
+    headers = {"X-Total-Rows": str(total_rows)}
+    if content.get("campaign_id"):
+        headers["X-Campaign-Id"] = content["campaign_id"]
+    if content.get("generation"):
+        headers["X-Generation-Status"] = content["generation"]["status"]
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    encode = row_stream.iter_ndjson if response_format == row_stream.FORMAT_NDJSON else row_stream.iter_arrow_stream
+    return StreamingResponse(encode(page_rows), media_type=row_stream.ROW_FORMATS[response_format], headers=headers)
+
+def _read_upload(file: UploadFile) -> bytes:
+    file.file.seek(0)
+    return file.file.read()
+
 @app.post("/upload/")
-async def upload_file(file: UploadFile, generate_from_gemini: bool = Form(False)):
+async def upload_file(file: UploadFile, generate_from_gemini: bool = Form(False),
+                      generation_mode: str = Form("row"), sheet_name: str = Form(""),
+                      include_rows: bool = Form(True), response_format: str = Form("json"),
+                      page_size: int = Form(row_stream.DEFAULT_PAGE_ROWS)):
     """Upload CSV/Excel file and optionally generate messages with Gemini"""
     try:
-        df = file_parser.parse_file(file)
+        if response_format not in row_stream.ROW_FORMATS:
+            raise ValueError(f"Unsupported response format: {response_format}")
+        sheet = sheet_name or None
+        store = get_snapshot_store()
+        # Parsing runs in a worker process and the rows go straight into a
+        # snapshot; later calls reference it instead of re-sending the rows
+        data = await workers.run_blocking(_read_upload, file)
+        campaign_id, rows = await workers.run_cpu_bound(
+            workers.parse_to_snapshot, data, file.filename, sheet, store.directory
+        )
+        content = {"data": None, "status": "success", "campaign_id": campaign_id, "rows": rows,
+                   "send_campaign_id": campaign_id}
         
         if generate_from_gemini:
-            df['message'] = gemini_api.generate_messages(df)
+            # Messages are generated in the background; poll
+            # GET /campaigns/{campaign_id}/messages/ for the finished rows.
+            # The list is sent from the job's result_campaign_id, which
+            # GET /campaigns/{campaign_id}/generation/ reports once it is done
+            job = await get_generation_jobs().start(campaign_id, mode=generation_mode)
+            content["generation"] = job.status()
+            content["send_campaign_id"] = None
         
-        return JSONResponse(content={"data": df.to_dict('records'), "status": "success"})
+        if not include_rows:
+            return JSONResponse(content=content)
+        # Further pages come from GET /campaigns/{campaign_id}/rows/
+        table = await workers.run_blocking(store.open, content["campaign_id"])
+        return await _rows_response(table, response_format, limit=page_size, **content)
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=400)
 
+# Bytes gathered from the request body before each disk write
+UPLOAD_WRITE_BYTES = 1024 * 1024
+
+def _upload_headers(upload) -> dict:
+    headers = {"Upload-Offset": str(upload.offset), "Cache-Control": "no-store"}
+    if upload.length is not None:
+        headers["Upload-Length"] = str(upload.length)
+    return headers
+
+@app.post("/uploads/")
+def create_upload(filename: str = Form(...), length: int = Form(0), sheet_name: str = Form("")):
+    """Start a resumable upload (length 0 when the size is not known up front)"""
+    try:
+        upload = get_upload_manager().create(filename, length or None, sheet_name or None)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    headers = {**_upload_headers(upload), "Location": f"/uploads/{upload.upload_id}"}
+    return JSONResponse(content=upload.status(), status_code=201, headers=headers)
+
+@app.head("/uploads/{upload_id}")
+def upload_offset(upload_id: str):
+    """Current offset of a resumable upload, to resume after an interruption"""
+    try:
+        upload = get_upload_manager().get(upload_id)
+    except KeyError:
+        return Response(status_code=404)
+    return Response(status_code=200, headers=_upload_headers(upload))
+
+@app.get("/uploads/{upload_id}")
+def upload_status(upload_id: str):
+    """Offset and parse progress of a resumable upload"""
+    try:
+        upload = get_upload_manager().get(upload_id)
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+    return JSONResponse(content=upload.status(), headers=_upload_headers(upload))
+
+@app.patch("/uploads/{upload_id}")
+async def append_upload(upload_id: str, request: Request):
+    """
+    Append the request body at the offset given in the Upload-Offset header
+
+    Bytes are written as they arrive, so if the connection drops mid-chunk
+    the client resumes from the offset reported by HEAD.
+    """
+    try:
+        upload = await workers.run_blocking(get_upload_manager().get, upload_id)
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+    except ValueError:
+        return JSONResponse(content={"error": "Missing or invalid Upload-Offset header"}, status_code=400)
+
+    buffer = bytearray()
+    try:
+        try:
+            async for piece in request.stream():
+                buffer += piece
+                if len(buffer) >= UPLOAD_WRITE_BYTES:
+                    offset = await workers.run_blocking(upload.append, bytes(buffer), offset)
+                    buffer.clear()
+        except ClientDisconnect:
+            pass
+        if buffer:
+            await workers.run_blocking(upload.append, bytes(buffer), offset)
+    except UploadOffsetError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=409, headers=_upload_headers(upload))
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400, headers=_upload_headers(upload))
+    return JSONResponse(content=upload.status(), headers=_upload_headers(upload))
+
+@app.post("/uploads/{upload_id}/finalize/")
+async def finalize_upload(upload_id: str, checksum: str = Form("")):
+    """Complete a resumable upload and snapshot its rows under a campaign id"""
+    try:
+        return await workers.run_blocking(get_upload_manager().finalize, upload_id, checksum or None)
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+@app.delete("/uploads/{upload_id}")
+def discard_upload(upload_id: str):
+    """Abort a resumable upload and delete what was received"""
+    try:
+        get_upload_manager().discard(upload_id)
+        return {"status": "deleted"}
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+
 @app.post("/send-emails/")
 async def send_bulk_emails(data: dict):
-    """Send bulk emails using the provided data"""
+    """Send bulk emails using the provided data or an uploaded campaign snapshot"""
     try:
-        results = email_sender.send_bulk_emails(data)
+        if data.get('campaign_id'):
+            # A list with a generation job is sent from the job's result snapshot
+            campaign_id = await get_generation_jobs().send_campaign_id(data['campaign_id'])
+            df = await workers.run_blocking(
+                get_snapshot_store().load, campaign_id, columns=['email', 'name', 'message', 'topic']
+            )
+            data = {**data, "emails": df.to_dict('records')}
+        # The Resend SDK and the delay between sends both block
+        results = await workers.run_blocking(email_sender.send_bulk_emails, data)
         return JSONResponse(content=results)
+    except GenerationPendingError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=409)
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
+@app.post("/campaigns/run/")
+async def run_campaign(file: Optional[UploadFile] = None, campaign_id: str = Form(""),
+                       generate_from_gemini: bool = Form(False),
+                       subject: str = Form("Your Personalized Message"),
+                       alt_subject: str = Form("Exclusive Offer Just for You"),
+                       ab_test: bool = Form(False), delay_seconds: float = Form(0),
+                       sheet_name: str = Form(""), tone: str = Form("friendly"),
+                       industry: str = Form("Generic"), enhance_options: str = Form("")):
+    """
+    Upload a list (or reuse a snapshot) and generate, render and send it as a streaming pipeline
+
+    `delay_seconds` is the minimum spacing between any two sends of the
+    campaign; `enhance_options` is a comma-separated list.
+    """
+    try:
+        store = get_snapshot_store()
+        if not campaign_id:
+            if file is None:
+                raise ValueError("Provide a file or a campaign_id")
+            data = await workers.run_blocking(_read_upload, file)
+            campaign_id, _ = await workers.run_cpu_bound(
+                workers.parse_to_snapshot, data, file.filename, sheet_name or None, store.directory
+            )
+        elif not generate_from_gemini:
+            campaign_id = await get_generation_jobs().send_campaign_id(campaign_id)
+        df = await workers.run_blocking(store.load, campaign_id)
+        settings = {
+            "subject": subject,
+            "alt_subject": alt_subject,
+            "ab_test": ab_test,
+            "delay_seconds": delay_seconds
+        }
+        options = [o.strip() for o in enhance_options.split(",") if o.strip()]
+        results = await pipeline.run_campaign(df, settings, generate=generate_from_gemini, tone=tone,
+                                              industry=industry, enhance_options=options)
+        results["campaign_id"] = campaign_id
+        return JSONResponse(content=results)
+    except GenerationPendingError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=409)
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+@app.get("/campaigns/{campaign_id}/")
+def campaign_info(campaign_id: str):
+    """Row count, columns and upload details of a campaign snapshot"""
+    try:
+        return get_snapshot_store().info(campaign_id)
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+
+@app.get("/campaigns/{campaign_id}/preview/")
+def preview_campaign(campaign_id: str, offset: int = 0, limit: int = 20):
+    """One page of a campaign snapshot's rows"""
+    try:
+        return {"offset": offset, "data": get_snapshot_store().rows(campaign_id, offset, limit)}
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+
+@app.get("/campaigns/{campaign_id}/rows/")
+async def campaign_rows(campaign_id: str, cursor: str = "", limit: int = row_stream.DEFAULT_PAGE_ROWS, format: str = "json"):
+    """Page through a campaign snapshot's rows with a cursor (limit=0 returns the rest)"""
+    try:
+        if format not in row_stream.ROW_FORMATS:
+            raise ValueError(f"Unsupported response format: {format}")
+        table = await workers.run_blocking(get_snapshot_store().open, campaign_id)
+        return await _rows_response(table, format, cursor or None, limit, campaign_id=campaign_id)
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+@app.post("/campaigns/{campaign_id}/generate/")
+async def generate_campaign(campaign_id: str, mode: str = Form("row"), tone: str = Form("friendly"),
+                            industry: str = Form("Generic"), enhance_options: str = Form("")):
+    """Start generating messages for a campaign snapshot in the background"""
+    try:
+        options = [o.strip() for o in enhance_options.split(",") if o.strip()]
+        job = await get_generation_jobs().start(campaign_id, mode, tone, industry, options)
+        return JSONResponse(content=job.status(), status_code=202)
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+@app.get("/campaigns/{campaign_id}/generation/")
+def generation_status(campaign_id: str):
+    """Progress, usage and result snapshot of a campaign's generation job"""
+    try:
+        return get_generation_jobs().get(campaign_id).status()
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+
+@app.delete("/campaigns/{campaign_id}/generation/")
+async def cancel_generation(campaign_id: str):
+    """Stop a generation job; rows generated so far stay available"""
+    try:
+        job = await get_generation_jobs().cancel(campaign_id)
+        return job.status()
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+
+@app.get("/campaigns/{campaign_id}/messages/")
+async def generated_messages(campaign_id: str, cursor: str = "", limit: int = 100, format: str = "json"):
+    """
+    Rows whose messages are ready, in the order they were generated
+
+    Keep polling with the returned cursor while generation runs; it is
+    null once the job has finished and every row was returned.
+    """
+    try:
+        if format not in row_stream.ROW_FORMATS:
+            raise ValueError(f"Unsupported response format: {format}")
+        job = get_generation_jobs().get(campaign_id)
+        table = await workers.run_blocking(get_snapshot_store().open, campaign_id)
+        rows, next_cursor = await workers.run_blocking(job.page, table, cursor or None, limit)
+        return await _page_response(rows, next_cursor, job.total, format, campaign_id=campaign_id,
+                                    generation=job.status())
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+@app.get("/campaigns/{campaign_id}/export/")
+def export_campaign(campaign_id: str, format: str = "csv"):
+    """Download a campaign snapshot as CSV, Parquet or Arrow"""
+    try:
+        chunks = get_snapshot_store().export(campaign_id, format)
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return StreamingResponse(
+        chunks, media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="campaign_{campaign_id}.{format}"'}
+    )
+
+@app.delete("/campaigns/{campaign_id}/")
+def delete_campaign(campaign_id: str):
+    """Remove a campaign snapshot"""
+    try:
+        get_snapshot_store().delete(campaign_id)
+        return {"status": "deleted"}
+    except KeyError as e:
+        return JSONResponse(content={"error": e.args[0]}, status_code=404)
+
+@app.post("/generate/stream/")
+async def stream_message(data: dict):
+    """Stream a single generated message as plain-text chunks"""
+    settings = data.get('settings', {})
+    prompt = gemini_api.build_prompt(
+        data.get('recipient', {}),
+        settings.get('tone', 'friendly'),
+        settings.get('industry', 'Generic'),
+        settings.get('enhance_options', [])
+    )
+    
+    # Surface failures before the first byte as a proper error response
+    stream = gemini_api.stream_text_chunks(prompt)
+    try:
+        first_chunk = await stream.__anext__()
+    except StopAsyncIteration:
+        first_chunk = ""
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=502)
+    
+    async def chunks():
+        # A failure after the first chunk propagates and aborts the response
+        # before its final chunk, so clients see a broken stream rather than
+        # error text mixed into the message
+        yield first_chunk
+        async for chunk in stream:
+            yield chunk
+    
+    return StreamingResponse(chunks(), media_type="text/plain; charset=utf-8")
+
 @app.post("/webhook/inbound-email/")
 async def inbound_email(request: Request):
-    """Handle inbound emails via Resend webhook"""
+    """
+    Handle Resend webhooks (deliveries, bounces, complaints, inbound emails)
+
+    Events are acknowledged as soon as they are queued; they are written to
+    storage in batches, and bounces, complaints and unsubscribe replies then
+    feed the suppression list. Retried deliveries (same svix-id) are
+    acknowledged without being queued again. Events feed the suppression
+    list, so without a signing secret every request is refused.
+    """
+    if not webhook_ingest.RESEND_WEBHOOK_SECRET:
+        return JSONResponse(content={"error": "Webhook signing secret not configured"}, status_code=503)
+    body = await request.body()
     try:
-        payload = await request.json()
-        # Log or store the email
-        print(f"Received inbound email: {payload}")
-        return {"status": "received"}
-    except Exception as e:
-        return {"error": str(e)}
+        webhook_ingest.verify_signature(body, request.headers)
+    except webhook_ingest.WebhookSignatureError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=401)
+    status = webhook_ingest.get_webhook_ingestor().submit(body, request.headers.get("svix-id"))
+    if status == "full":
+        return JSONResponse(content={"error": "Webhook queue is full, retry later"}, status_code=503,
+                            headers={"Retry-After": "1"})
+    return {"status": "received" if status == "queued" else status}
+
+@app.get("/webhook/events/")
+def webhook_stats():
+    """Counts of received, duplicate, rejected and stored webhook events"""
+    return webhook_ingest.get_webhook_ingestor().stats()
+
+@app.post("/suppressions/import/")
+async def import_suppressions(file: UploadFile, reason: str = Form(REASON_UNSUBSCRIBE)):
+    """Bulk-add the addresses in a CSV/Excel file to the suppression list"""
+    try:
+        data = await workers.run_blocking(_read_upload, file)
+        result = await workers.run_cpu_bound(
+            workers.import_suppressions, data, file.filename, reason, get_suppression_list().directory
+        )
+        return {"status": "imported", **result}
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+@app.get("/suppressions/")
+def suppression_stats():
+    """Suppression list size by reason"""
+    return get_suppression_list().stats()
+
+@app.get("/frequency-cap/")
+def frequency_cap_stats():
+    """Cross-campaign frequency cap settings and contact index size"""
+    contact_index = get_contact_index()
+    if contact_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **contact_index.stats()}
 
 if __name__ == "__main__":
     import uvicorn
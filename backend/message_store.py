@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+from dotenv import load_dotenv
+from storage import data_path, open_database
+
+load_dotenv()
+
+# Per-row message store configuration (override via .env)
+MESSAGE_STORE_PATH = os.getenv("MESSAGE_STORE_PATH") or data_path("messages.sqlite3")
+
+# Row fields that feed the generation prompt
+PROMPT_INPUT_COLUMNS = ['email', 'name', 'topic', 'company']
+
+def _cell(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    return str(value).strip()
+
+def row_input_hashes(df: pd.DataFrame, tone: str, industry: str,
+                     enhance_options: List[str] = None) -> pd.Series:
+    """
+    Hash the prompt inputs of every row
+
+    Two rows get the same hash exactly when they would be sent the same
+    prompt: same recipient fields and same tone, industry and enhancement
+    options.
+
+    Args:
+        df: Contact rows
+        tone: Email tone
+        industry: Industry context
+        enhance_options: List of enhancement options
+
+    Returns:
+        pd.Series: Hex digest per row, aligned with df's index
+    """
+    settings = json.dumps([tone, industry, sorted(enhance_options or [])])
+    columns = [df[c] if c in df.columns else pd.Series([""] * len(df), index=df.index)
+               for c in PROMPT_INPUT_COLUMNS]
+    hashes = [
+        hashlib.sha256("\x00".join([settings] + [_cell(v) for v in values]).encode("utf-8")).hexdigest()
+        for values in zip(*columns)
+    ]
+    return pd.Series(hashes, index=df.index, dtype=object)
+
+class MessageStore:
+    """
+    SQLite table of the latest message written for each row input hash
+
+    Lets unchanged rows keep their generated (or hand-edited) messages
+    across reruns and sessions.
+    """
+
+    def __init__(self, path: str = MESSAGE_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = open_database(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "input_hash TEXT PRIMARY KEY, message TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, str]:
+        """
+        Look up stored messages
+
+        Args:
+            hashes: Row input hashes
+
+        Returns:
+            Dict[str, str]: Message per hash that has one
+        """
+        keys = list({h for h in hashes if h})
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT input_hash, message FROM messages WHERE input_hash IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def set_many(self, messages: Dict[str, str]) -> None:
+        """Store messages by input hash, skipping empty ones"""
+        now = time.time()
+        rows = [(h, m, now) for h, m in messages.items() if h and m]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages (input_hash, message, updated_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+_store: Optional[MessageStore] = None
+_store_lock = threading.Lock()
+
+def get_message_store() -> MessageStore:
+    """Get the shared message store"""
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MessageStore()
+    return _store
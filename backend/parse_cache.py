@@ -0,0 +1,158 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+from storage import DATA_DIR
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Parsed contact list cache configuration (override via .env)
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "8"))
+PARSE_CACHE_PERSIST = os.getenv("PARSE_CACHE_PERSIST", "false").lower() in ("1", "true", "yes")
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR") or os.path.join(DATA_DIR, "parse_cache")
+PARSE_CACHE_TTL = int(os.getenv("PARSE_CACHE_TTL", str(7 * 24 * 3600)))
+
+class ParseCache:
+    """
+    Cleaned contact lists keyed by upload content and parse options
+
+    Recent entries live in an in-memory LRU; with `persist` they are also
+    written to the data directory as Parquet (plus a small JSON sidecar for
+    the parse stats) so a new session can skip the parse entirely. Disk
+    entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, max_entries: int = PARSE_CACHE_MAX_ENTRIES, persist: bool = PARSE_CACHE_PERSIST,
+                 directory: str = PARSE_CACHE_DIR, ttl: int = PARSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.persist = persist
+        self.directory = directory
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[pd.DataFrame, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if persist:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(content: bytes, **options) -> str:
+        """Hash the file bytes and the options that affect the parse"""
+        digest = hashlib.sha256(content)
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return f"{base}.parquet", f"{base}.json"
+
+    def _remember(self, key: str, df: pd.DataFrame, stats: Dict) -> None:
+        with self._lock:
+            self._entries[key] = (df, stats)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[Tuple[pd.DataFrame, Dict]]:
+        frame_path, stats_path = self._paths(key)
+        try:
+            if self.ttl > 0 and time.time() - os.path.getmtime(stats_path) > self.ttl:
+                return None
+            with open(stats_path, "r", encoding="utf-8") as f:
+                stats = json.load(f)
+            return pd.read_parquet(frame_path), stats
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning("Ignoring unreadable parse cache entry %s: %s", key, e)
+            return None
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, Dict]]:
+        """
+        Look up a parsed list
+
+        Args:
+            key: Cache key from make_key()
+
+        Returns:
+            Optional[Tuple[pd.DataFrame, Dict]]: (cleaned rows, parse stats),
+                or None on a miss. The frame is a shallow copy, so callers may
+                add or replace columns freely.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is None and self.persist:
+            entry = self._load(key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._remember(key, *entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        df, stats = entry
+        return df.copy(deep=False), dict(stats)
+
+    def set(self, key: str, df: pd.DataFrame, stats: Dict) -> None:
+        """Store a parsed list (and write it to disk when persisting)"""
+        self._remember(key, df.copy(deep=False), dict(stats))
+        if not self.persist:
+            return
+        frame_path, stats_path = self._paths(key)
+        try:
+            df.to_parquet(frame_path)
+            # The sidecar is written last, so a present sidecar means a complete entry
+            with open(stats_path, "w", encoding="utf-8") as f:
+                json.dump(stats, f)
+            self._prune()
+        except Exception as e:
+            logger.warning("Could not persist parse cache entry: %s", e)
+
+    def _prune(self) -> None:
+        """Drop expired disk entries"""
+        if self.ttl <= 0:
+            return
+        cutoff = time.time() - self.ttl
+        for stats_path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                if os.path.getmtime(stats_path) < cutoff:
+                    os.remove(stats_path)
+                    os.remove(stats_path[:-len(".json")] + ".parquet")
+            except OSError:
+                pass
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and current size"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": f"{((self.hits + self.disk_hits) / lookups * 100):.1f}%" if lookups else "0%"
+        }
+
+_parse_cache: Optional[ParseCache] = None
+_parse_cache_lock = threading.Lock()
+
+def get_parse_cache() -> ParseCache:
+    """Get the shared parsed-list cache"""
+    global _parse_cache
+
+    if _parse_cache is None:
+        with _parse_cache_lock:
+            if _parse_cache is None:
+                _parse_cache = ParseCache()
+    return _parse_cache
@@ -1,13 +1,176 @@
+import os
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from io import BytesIO
-from typing import BinaryIO
+from typing import BinaryIO, Dict, Iterator, List, Optional, Union
+from dotenv import load_dotenv
+from suppression import get_suppression_list
+from validation import normalize_emails, valid_email_mask
 
-def parse_file(file) -> pd.DataFrame:
+load_dotenv()
+
+# Rows per batch in streaming parse mode (override via .env)
+PARSE_CHUNK_SIZE = int(os.getenv("PARSE_CHUNK_SIZE", "50000"))
+
+# Columns Blastify reads from uploads; anything else is skipped at parse time
+KNOWN_COLUMNS = ['email', 'name', 'topic', 'company', 'message']
+
+# Text columns are pyarrow-backed strings with NaN for missing values, the
+# default "str" dtype of pandas 3, spelled out so pandas 2.3 matches it
+ARROW_STRING = pd.StringDtype("pyarrow", na_value=np.nan)
+
+# Excel worksheet selector: name or 0-based position
+Sheet = Optional[Union[str, int]]
+
+NO_VALID_EMAILS = "No valid email addresses found in the file. Please ensure emails are real and properly formatted with '@' symbol."
+
+def clean_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize columns, validate emails, drop suppressed addresses and fill
+    optional columns
+    
+    Works on a whole file or on one chunk of it; deduplication is left to
+    the caller.
+    
+    Raises:
+        ValueError: If the required 'email' column is missing
+    """
+    # Normalize column names to lowercase for consistent handling
+    df.columns = df.columns.str.lower().str.strip()
+    
+    # Validate required columns
+    if 'email' not in df.columns:
+        raise ValueError("Missing required 'email' column in the uploaded file.")
+    
+    # Clean and validate email format with strict validation
+    df['email'] = normalize_emails(df['email'].astype(str))
+    
+    # Apply strict email validation (vectorized over the whole column)
+    valid_emails = valid_email_mask(df['email'])
+    df = df[valid_emails.to_numpy()]
+    
+    # Drop unsubscribed, bounced and complaining addresses
+    df = df[~get_suppression_list().contains(df['email'])]
+    
+    # Ensure we have required columns, fill missing ones
+    if 'name' not in df.columns:
+        df['name'] = 'Customer'
+    
+    if 'topic' not in df.columns:
+        df['topic'] = 'our services'
+        
+    if 'message' not in df.columns:
+        df['message'] = ''
+    
+    return df
+
+def _known_columns(header) -> Dict[str, int]:
+    """
+    Map each known column to its position in a header row
+    
+    Matching is case- and whitespace-insensitive; if a column appears twice
+    the first one wins.
+    
+    Raises:
+        ValueError: If there is no 'email' column
+    """
+    selected = {}
+    for position, column in enumerate(header):
+        if column is None:
+            continue
+        key = str(column).lower().strip()
+        if key in KNOWN_COLUMNS and key not in selected:
+            selected[key] = position
+    if 'email' not in selected:
+        raise ValueError("Missing required 'email' column in the uploaded file.")
+    return selected
+
+# Quoted values may span lines (e.g. multi-line messages), as pd.read_csv allows
+_CSV_PARSE_OPTIONS = pacsv.ParseOptions(newlines_in_values=True)
+
+def _csv_columns(stream: BinaryIO) -> List[str]:
+    """Header names of the known columns in a CSV stream, which is rewound afterwards"""
+    header = pacsv.open_csv(stream, parse_options=_CSV_PARSE_OPTIONS).schema.names
+    stream.seek(0)
+    return [header[position] for position in _known_columns(header).values()]
+
+def _arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    return table.to_pandas(types_mapper={pa.string(): ARROW_STRING}.get)
+
+def _csv_convert_options(columns: List[str]) -> pacsv.ConvertOptions:
+    # Everything is text: skips per-column type inference and keeps values
+    # like phone-style names or zero-padded ids exactly as written
+    return pacsv.ConvertOptions(
+        include_columns=columns,
+        column_types={column: pa.string() for column in columns},
+        strings_can_be_null=True
+    )
+
+def read_contacts_csv(stream: BinaryIO) -> pd.DataFrame:
+    """
+    Read the known columns of a contact CSV with the pyarrow engine
+    
+    Args:
+        stream: Binary file object positioned at the start of the CSV
+        
+    Returns:
+        pd.DataFrame: Known columns only, with normalized names, as
+            pyarrow-backed string columns
+        
+    Raises:
+        ValueError: If there is no 'email' column
+    """
+    columns = _csv_columns(stream)
+    table = pacsv.read_csv(stream, parse_options=_CSV_PARSE_OPTIONS,
+                           convert_options=_csv_convert_options(columns))
+    return _arrow_to_pandas(table.rename_columns([c.lower().strip() for c in columns]))
+
+def _iter_csv_chunks(stream: BinaryIO, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Stream the known columns of a CSV in batches of `chunk_size` rows"""
+    columns = _csv_columns(stream)
+    reader = pacsv.open_csv(stream, parse_options=_CSV_PARSE_OPTIONS,
+                            convert_options=_csv_convert_options(columns))
+    
+    start = 0
+    pending = []
+    pending_rows = 0
+    for batch in reader:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        # Arrow batches are sized in bytes; re-slice them into row chunks
+        while pending_rows >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            yield _arrow_to_pandas(table.slice(0, chunk_size)).set_axis(range(start, start + chunk_size))
+            start += chunk_size
+            pending = table.slice(chunk_size).to_batches()
+            pending_rows -= chunk_size
+    if pending_rows:
+        yield _arrow_to_pandas(pa.Table.from_batches(pending)).set_axis(range(start, start + pending_rows))
+
+def read_contacts(content: bytes, filename: str, sheet: Sheet = None) -> pd.DataFrame:
+    """
+    Read the known columns of an uploaded file, choosing the reader by extension
+    
+    Raises:
+        ValueError: If the file type is unsupported
+    """
+    if filename.endswith(".csv"):
+        return read_contacts_csv(BytesIO(content))
+    if filename.endswith(".xlsx"):
+        return read_contacts_excel(BytesIO(content), sheet)
+    if filename.endswith(".xls"):
+        return _read_legacy_excel(BytesIO(content), sheet)
+    raise ValueError(f"Unsupported file type: {filename}. Please use CSV or Excel files.")
+
+def parse_file(file, sheet: Sheet = None) -> pd.DataFrame:
     """
     Parse uploaded CSV or Excel file and return DataFrame
     
     Args:
         file: UploadFile object from FastAPI
+        sheet: Excel worksheet name or 0-based position (default: first sheet)
         
     Returns:
         pd.DataFrame: Parsed data with email validation
@@ -20,48 +183,209 @@ def parse_file(file) -> pd.DataFrame:
         content = file.file.read()
         file.file.seek(0)  # Reset file pointer
         
-        if file.filename.endswith(".csv"):
-            df = pd.read_csv(BytesIO(content))
-        elif file.filename.endswith((".xls", ".xlsx")):
-            df = pd.read_excel(BytesIO(content))
-        else:
-            raise ValueError(f"Unsupported file type: {file.filename}. Please use CSV or Excel files.")
+        df = clean_rows(read_contacts(content, file.filename, sheet))
         
-        # Normalize column names to lowercase for consistent handling
-        df.columns = df.columns.str.lower().str.strip()
+        if df.empty:
+            raise ValueError(NO_VALID_EMAILS)
         
-        # Validate required columns
-        if 'email' not in df.columns:
-            raise ValueError("Missing required 'email' column in the uploaded file.")
+        # Remove duplicates based on email
+        df = df.drop_duplicates(keep='first')
         
-        # Clean and validate email format with strict validation
-        df['email'] = df['email'].astype(str).str.strip().str.lower()
+        return df
         
-        # Import the robust email validator
-        from utils import validate_email
+    except Exception as e:
+        raise ValueError(f"Error parsing file: {str(e)}")
+
+def _calamine_available() -> bool:
+    """The Rust-based calamine reader is optional (pip install python-calamine)"""
+    try:
+        import python_calamine  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def list_excel_sheets(stream: BinaryIO) -> List[str]:
+    """Worksheet names of an .xlsx workbook, in order; the stream is rewound afterwards"""
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(stream, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+        stream.seek(0)
+
+def _sheet_index(sheetnames: List[str], sheet: Sheet) -> int:
+    if sheet is None:
+        return 0
+    if isinstance(sheet, int):
+        if not 0 <= sheet < len(sheetnames):
+            raise ValueError(f"Worksheet {sheet} not found. The workbook has {len(sheetnames)} sheets.")
+        return sheet
+    if sheet not in sheetnames:
+        raise ValueError(f"Worksheet '{sheet}' not found. Available sheets: {', '.join(sheetnames)}")
+    return sheetnames.index(sheet)
+
+def _excel_rows(stream: BinaryIO, sheet: Sheet, fast: bool) -> Iterator[tuple]:
+    """
+    Raw cell values of a worksheet, one row at a time
+    
+    openpyxl's read-only mode parses the sheet XML as it goes instead of
+    building the workbook object model, so memory stays flat. With `fast`
+    and python-calamine installed, the sheet is decoded natively instead:
+    several times quicker, but its cells are held in memory until done.
+    """
+    if fast and _calamine_available():
+        from python_calamine import CalamineWorkbook
         
-        # Apply strict email validation
-        valid_emails = df['email'].apply(validate_email)
-        df = df[valid_emails]
+        workbook = CalamineWorkbook.from_filelike(stream)
+        try:
+            index = _sheet_index(workbook.sheet_names, sheet)
+            yield from workbook.get_sheet_by_index(index).iter_rows()
+        finally:
+            workbook.close()
+        return
+    
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        index = _sheet_index(workbook.sheetnames, sheet)
+        yield from workbook.worksheets[index].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def _excel_text(value) -> Optional[str]:
+    # Readers disagree on empty cells ('' vs None) and whole numbers (1.0 vs 1)
+    if value is None or value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _excel_frame(batch: List[list], columns: Dict[str, int], start: int) -> pd.DataFrame:
+    # Same shape as the CSV reader: known columns as Arrow-backed strings
+    data = {
+        key: pd.Series([row[position] for row in batch], dtype=ARROW_STRING)
+        for key, position in columns.items()
+    }
+    return pd.DataFrame(data).set_axis(range(start, start + len(batch)))
+
+def _iter_excel_rows(stream: BinaryIO, chunk_size: int, sheet: Sheet = None,
+                     fast: bool = False) -> Iterator[pd.DataFrame]:
+    """Read the known columns of a worksheet in batches of `chunk_size` rows"""
+    rows = _excel_rows(stream, sheet, fast)
+    try:
+        columns = _known_columns(next(rows, None) or ())
+        positions = list(columns.values())
+        width = max(positions) + 1
         
-        if df.empty:
-            raise ValueError("No valid email addresses found in the file. Please ensure emails are real and properly formatted with '@' symbol.")
+        start = 0
+        batch = []
+        for row in rows:
+            values = [_excel_text(value) for value in row[:width]]
+            values += [None] * (width - len(values))
+            # Skip rows with nothing in the columns we read
+            if all(values[position] is None for position in positions):
+                continue
+            batch.append(values)
+            if len(batch) >= chunk_size:
+                yield _excel_frame(batch, columns, start)
+                start += len(batch)
+                batch = []
+        # A header-only sheet still yields one (empty) frame with its columns
+        if batch or start == 0:
+            yield _excel_frame(batch, columns, start)
+    finally:
+        rows.close()
+
+def read_contacts_excel(stream: BinaryIO, sheet: Sheet = None) -> pd.DataFrame:
+    """
+    Read the known columns of an .xlsx worksheet
+    
+    Uses python-calamine when it is installed, otherwise openpyxl in
+    read-only mode.
+    
+    Args:
+        stream: Binary file object with the workbook
+        sheet: Worksheet name or 0-based position (default: first sheet)
         
-        # Ensure we have required columns, fill missing ones
-        if 'name' not in df.columns:
-            df['name'] = 'Customer'
+    Returns:
+        pd.DataFrame: Known columns only, with normalized names, as
+            pyarrow-backed string columns
         
-        if 'topic' not in df.columns:
-            df['topic'] = 'our services'
-            
-        if 'message' not in df.columns:
-            df['message'] = ''
+    Raises:
+        ValueError: If the sheet does not exist or has no 'email' column
+    """
+    return pd.concat(list(_iter_excel_rows(stream, PARSE_CHUNK_SIZE, sheet, fast=True)))
+
+def _read_legacy_excel(stream: BinaryIO, sheet: Sheet) -> pd.DataFrame:
+    """Read an .xls workbook in one go (the format has no streaming reader)"""
+    df = pd.read_excel(stream, sheet_name=0 if sheet is None else sheet)
+    columns = _known_columns(df.columns)
+    return df.iloc[:, list(columns.values())].set_axis(list(columns), axis=1)
+
+def _iter_raw_chunks(file, chunk_size: int, sheet: Sheet = None) -> Iterator[pd.DataFrame]:
+    """Yield unprocessed row batches without loading the whole file"""
+    stream = file.file
+    stream.seek(0)
+    
+    if file.filename.endswith(".csv"):
+        yield from _iter_csv_chunks(stream, chunk_size)
+    elif file.filename.endswith(".xlsx"):
+        yield from _iter_excel_rows(stream, chunk_size, sheet)
+    elif file.filename.endswith(".xls"):
+        yield _read_legacy_excel(stream, sheet)
+    else:
+        raise ValueError(f"Unsupported file type: {file.filename}. Please use CSV or Excel files.")
+
+def iter_parse_file(file, chunk_size: int = PARSE_CHUNK_SIZE, sheet: Sheet = None) -> Iterator[pd.DataFrame]:
+    """
+    Parse an uploaded file in bounded-memory batches
+    
+    CSVs are read `chunk_size` rows at a time and .xlsx files row by row in
+    read-only mode; each batch is normalized, validated and deduplicated
+    like parse_file. Duplicates across batches are dropped using a Python
+    set of 64-bit row hashes, so memory grows only with the number of
+    distinct rows (roughly 50-70 bytes each as set entries), never with
+    the file size. Concatenating the
+    batches gives the same rows, in the same order and with the same
+    index, as parse_file.
+    
+    Args:
+        file: UploadFile object from FastAPI
+        chunk_size: Rows per batch
+        sheet: Excel worksheet name or 0-based position (default: first sheet)
         
-        # Remove duplicates based on email
-        df = df.drop_duplicates(keep='first')
+    Yields:
+        pd.DataFrame: Cleaned batches (empty batches are skipped)
         
-        return df
+    Raises:
+        ValueError: If file type is unsupported, columns are missing or no
+            valid email addresses are found
+    """
+    seen = set()
+    produced = False
+    try:
+        for raw in _iter_raw_chunks(file, chunk_size, sheet):
+            chunk = clean_rows(raw)
+            if chunk.empty:
+                continue
+            
+            hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+            keep = np.zeros(len(hashes), dtype=bool)
+            for i, row_hash in enumerate(hashes.tolist()):
+                if row_hash not in seen:
+                    seen.add(row_hash)
+                    keep[i] = True
+            chunk = chunk[keep]
+            
+            if not chunk.empty:
+                produced = True
+                yield chunk
         
+        if not produced:
+            raise ValueError(NO_VALID_EMAILS)
     except Exception as e:
         raise ValueError(f"Error parsing file: {str(e)}")
 
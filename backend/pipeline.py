@@ -0,0 +1,284 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+import email_sender
+import gemini_api
+import workers
+from contact_index import get_contact_index
+from quota import CampaignUsage, track_usage
+from suppression import get_suppression_list
+
+load_dotenv()
+
+# Pipeline configuration (override via .env)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+PIPELINE_RENDER_WORKERS = int(os.getenv("PIPELINE_RENDER_WORKERS", "2"))
+PIPELINE_SEND_WORKERS = int(os.getenv("PIPELINE_SEND_WORKERS", "2"))
+
+_DONE = object()
+
+class CampaignPipeline:
+    """
+    Staged generate -> render -> send executor for one campaign
+
+    Stages are connected by bounded asyncio queues: when sending falls
+    behind, rendering blocks on a full queue, which in turn stops the
+    generation stage from pulling more rows. The first email goes out as
+    soon as its message is generated, and memory stays bounded by the
+    queue sizes rather than the list size.
+
+    `delay_seconds` spaces sends apart across all send workers, so the
+    campaign never sends faster than one email per delay.
+    """
+
+    def __init__(self, df: pd.DataFrame, settings: Optional[Dict] = None,
+                 tone: str = "friendly", industry: str = "Generic",
+                 enhance_options: List[str] = None, generate: bool = False,
+                 queue_size: int = PIPELINE_QUEUE_SIZE,
+                 render_workers: int = PIPELINE_RENDER_WORKERS,
+                 send_workers: int = PIPELINE_SEND_WORKERS):
+        settings = settings or {}
+        self.df = df.reset_index(drop=True)
+        self.tone = tone
+        self.industry = industry
+        self.enhance_options = enhance_options or []
+        self.generate = generate
+        self.render_workers = max(1, render_workers)
+        self.send_workers = max(1, send_workers)
+
+        self.subject = settings.get('subject', 'Your Personalized Message')
+        self.alt_subject = settings.get('alt_subject', 'Exclusive Offer Just for You')
+        self.template_name = settings.get('template', 'base_template.html')
+        self.ab_test = bool(settings.get('ab_test', False))
+        self.delay_seconds = float(settings.get('delay_seconds', 0))
+
+        self.render_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.send_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.results: List[Dict] = []
+        self.stats = {"generated": 0, "rendered": 0, "sent": 0, "failed": 0, "suppressed": 0, "capped": 0}
+        self.contact_index = get_contact_index()
+        # Admission time of this campaign's sends in the contact index
+        self.admitted_at: Optional[float] = None
+        # Rows holding a cap slot that have no result yet
+        self.unsettled: Set[int] = set()
+        self.error: Optional[str] = None
+        self._pace_lock = asyncio.Lock()
+        self._next_send_at = 0.0
+        self.first_send_at: Optional[float] = None
+        self.usage = CampaignUsage()
+
+    def _subject_for(self, position: int) -> str:
+        """Alternate subjects for A/B testing, as send_bulk_emails does"""
+        if self.ab_test and position % 2 == 0:
+            return self.alt_subject
+        return self.subject
+
+    async def _generate_stage(self) -> None:
+        """Emit rows with existing messages, then stream generated ones"""
+        if 'message' in self.df.columns:
+            messages = self.df['message'].fillna('').astype(str)
+        else:
+            messages = pd.Series([''] * len(self.df))
+        has_message = messages.str.strip() != ''
+        # Suppressed recipients are skipped before any generation is spent on them
+        suppressed = await workers.run_blocking(get_suppression_list().contains, self.df['email'])
+        # Frequency cap slots are reserved now and given back if a send fails
+        capped = np.zeros(len(self.df), dtype=bool)
+        if self.contact_index is not None:
+            allowed, self.admitted_at = await workers.run_blocking(
+                self.contact_index.admit, self.df['email'].where(~suppressed)
+            )
+            capped = ~suppressed & ~allowed
+            self.unsettled = set(np.flatnonzero(allowed & ~suppressed).tolist())
+
+        pending = []
+        for position in range(len(self.df)):
+            if suppressed[position]:
+                await self._record_result(position, {
+                    "email": self.df.iloc[position].get('email'),
+                    "status": "suppressed",
+                    "error": "Address is on the suppression list"
+                })
+            elif capped[position]:
+                await self._record_result(position, {
+                    "email": self.df.iloc[position].get('email'),
+                    "status": "capped",
+                    "error": self.contact_index.cap_message()
+                })
+            elif has_message.iloc[position] or not self.generate:
+                await self.render_queue.put((position, messages.iloc[position]))
+            else:
+                pending.append(position)
+
+        if pending:
+            remaining = set(range(len(pending)))
+            prompts = (
+                gemini_api.build_prompt(self.df.iloc[p], self.tone, self.industry, self.enhance_options)
+                for p in pending
+            )
+            try:
+                async for index, message, error in gemini_api.stream_texts_async(prompts):
+                    remaining.discard(index)
+                    position = pending[index]
+                    if error:
+                        # Failed rows are reported, never sent with an empty body
+                        self.usage.record_error(error, position)
+                        await self._record_result(position, {
+                            "email": self.df.iloc[position].get('email'),
+                            "status": "failed",
+                            "error": f"Generation failed: {error}"
+                        })
+                        continue
+                    self.stats["generated"] += 1
+                    await self.render_queue.put((position, message))
+            except Exception as e:
+                # Rows already generated still go out; the rest fail with the reason
+                self.error = f"Generation failed: {e}"
+                for index in sorted(remaining):
+                    await self._record_result(pending[index], {
+                        "email": self.df.iloc[pending[index]].get('email'),
+                        "status": "failed",
+                        "error": self.error
+                    })
+
+        for _ in range(self.render_workers):
+            await self.render_queue.put(_DONE)
+
+    async def _render_worker(self) -> None:
+        while True:
+            item = await self.render_queue.get()
+            if item is _DONE:
+                break
+            position, message = item
+            row = self.df.iloc[position]
+            if not message.strip():
+                await self._record_result(position, {
+                    "email": row.get('email'), "status": "failed", "error": "Message is empty"
+                })
+                continue
+            html_content = email_sender.render_email_body(
+                row.get('name', 'Customer'), message, self.template_name
+            )
+            self.stats["rendered"] += 1
+            await self.send_queue.put((position, row.get('email'), html_content))
+
+    async def _record_result(self, position: int, result: Dict) -> None:
+        self.results.append(result)
+        if result['status'] == 'sent':
+            self.stats["sent"] += 1
+        elif result['status'] in ('suppressed', 'capped'):
+            self.stats[result['status']] += 1
+        else:
+            self.stats["failed"] += 1
+        if position in self.unsettled:
+            self.unsettled.discard(position)
+            if result['status'] != 'sent':
+                await workers.run_blocking(self.contact_index.release, [result.get('email')], self.admitted_at)
+
+    async def _release_unsettled(self) -> None:
+        """Give back the cap slots of rows that will not be sent"""
+        if self.unsettled:
+            emails = self.df['email'].iloc[sorted(self.unsettled)].tolist()
+            self.unsettled = set()
+            await workers.run_blocking(self.contact_index.release, emails, self.admitted_at)
+
+    async def _pace(self) -> None:
+        """Wait for this send's turn so sends are `delay_seconds` apart overall"""
+        if self.delay_seconds <= 0:
+            return
+        async with self._pace_lock:
+            now = time.monotonic()
+            if self._next_send_at > now:
+                await asyncio.sleep(self._next_send_at - now)
+            self._next_send_at = max(now, self._next_send_at) + self.delay_seconds
+
+    async def _send_worker(self) -> None:
+        while True:
+            item = await self.send_queue.get()
+            if item is _DONE:
+                break
+            position, to_email, html_content = item
+            await self._pace()
+            if self.first_send_at is None:
+                self.first_send_at = time.monotonic()
+            # Resend's SDK is blocking; keep the event loop free
+            result = await workers.run_blocking(
+                email_sender.send_rendered_email, to_email, self._subject_for(position), html_content
+            )
+            await self._record_result(position, result)
+
+    async def run(self) -> Dict:
+        """
+        Run all stages to completion
+
+        Returns:
+            Dict: Results summary in the same shape as send_bulk_emails;
+                if generation stopped part way, status is "failed" with an
+                `error` and the results of the rows handled so far
+        """
+        started = time.monotonic()
+        renderers = [asyncio.create_task(self._render_worker()) for _ in range(self.render_workers)]
+        senders = [asyncio.create_task(self._send_worker()) for _ in range(self.send_workers)]
+
+        try:
+            with track_usage(self.usage):
+                await self._generate_stage()
+            await asyncio.gather(*renderers)
+            for _ in range(self.send_workers):
+                await self.send_queue.put(_DONE)
+            await asyncio.gather(*senders)
+        except BaseException:
+            for task in renderers + senders:
+                task.cancel()
+            await self._release_unsettled()
+            raise
+
+        total = len(self.df)
+        results = {
+            "status": "completed",
+            "summary": {
+                "total": total,
+                "sent": self.stats["sent"],
+                "failed": self.stats["failed"],
+                "suppressed": self.stats["suppressed"],
+                "capped": self.stats["capped"],
+                "generated": self.stats["generated"],
+                "success_rate": f"{(self.stats['sent'] / total * 100):.1f}%" if total else "0%",
+                "seconds_to_first_send": round(self.first_send_at - started, 3) if self.first_send_at else None,
+                "elapsed_seconds": round(time.monotonic() - started, 3)
+            },
+            "generation": self.usage.summary(),
+            "results": self.results
+        }
+        if self.error:
+            # Generation stopped part way; the summary covers what was sent
+            results["status"] = "failed"
+            results["error"] = self.error
+        return results
+
+async def run_campaign(df: pd.DataFrame, settings: Optional[Dict] = None, **kwargs) -> Dict:
+    """
+    Generate, render and send a campaign as a streaming pipeline
+
+    Args:
+        df: DataFrame with at least an 'email' column
+        settings: Subject, alt_subject, template, ab_test and delay_seconds
+            (the minimum spacing between any two sends)
+        **kwargs: Generation and per-stage concurrency options for CampaignPipeline
+
+    Returns:
+        Dict: Results summary
+    """
+    if not email_sender.resend.api_key:
+        return {
+            "status": "error",
+            "message": "Resend API key not configured",
+            "results": []
+        }
+    return await CampaignPipeline(df, settings, **kwargs).run()
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+import weakref
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from storage import data_path, open_database
+
+import workers
+
+load_dotenv()
+
+# Prompt cache configuration (override via .env)
+GEMINI_CACHE_ENABLED = os.getenv("GEMINI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+GEMINI_CACHE_PATH = os.getenv("GEMINI_CACHE_PATH") or data_path("prompt_cache.sqlite3")
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", str(7 * 24 * 3600)))
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "100000"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+class _Flight:
+    """A generation in progress that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+class _LeaderCancelled(Exception):
+    """The coalesced generation was cancelled; waiters should try again"""
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation differences don't split cache entries"""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+class PromptCache:
+    """
+    Disk-backed prompt -> response cache stored in SQLite
+
+    Entries are keyed by a SHA-256 of the model name and the normalized
+    prompt, expire after `ttl` seconds and are evicted least-recently-used
+    first once `max_entries` is exceeded. Concurrent requests for the same
+    prompt are coalesced so only one API call is made.
+    """
+
+    def __init__(self, path: str = GEMINI_CACHE_PATH, ttl: int = GEMINI_CACHE_TTL,
+                 max_entries: int = GEMINI_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = open_database(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+        # In-flight generations, per event loop (async) and process-wide (threads)
+        self._async_inflight = weakref.WeakKeyDictionary()
+        self._sync_inflight: Dict[str, _Flight] = {}
+
+    @staticmethod
+    def make_key(prompt: str, model: str) -> str:
+        """Hash the model and normalized prompt into a cache key"""
+        return hashlib.sha256(f"{model}\x00{normalize_prompt(str(prompt))}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Cache key from make_key()
+
+        Returns:
+            Optional[str]: Cached text, or None on miss/expiry
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if self.ttl > 0 and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._size -= 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """Store a response, evicting least-recently-used entries if over capacity"""
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            if not exists:
+                self._size += 1
+            if self.max_entries > 0 and self._size > self.max_entries:
+                excess = self._size - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)", (excess,)
+                )
+                self._size -= excess
+                self.evictions += excess
+            self._conn.commit()
+
+    async def get_or_generate_async(self, prompt: str, model: str,
+                                    generate: Callable[[str], Awaitable[Tuple[str, str]]]) -> str:
+        """
+        Return the cached response or generate it once for all concurrent callers
+
+        Args:
+            prompt: Prompt text
+            model: Model expected to answer (part of the cache key looked up)
+            generate: Coroutine function returning (response, model that
+                answered); the response is stored under the model that
+                answered, so a fallback's output is never cached as the
+                primary's. Exceptions are propagated and nothing is cached
+
+        Returns:
+            str: Response text
+        """
+        key = self.make_key(prompt, model)
+        loop = asyncio.get_running_loop()
+        inflight = self._async_inflight.setdefault(loop, {})
+        while (future := inflight.get(key)) is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                # The caller generating it went away; take over or join the next one
+                self.coalesced -= 1
+
+        # Claim the key before the lookup, so callers arriving while SQLite
+        # answers wait for this one instead of generating too
+        future = loop.create_future()
+        inflight[key] = future
+        try:
+            # get() and set() commit under a lock shared with threaded
+            # callers; run them on the I/O threads so the loop never waits
+            value = await workers.run_blocking(self.get, key)
+            if value is None:
+                value, answered_by = await generate(prompt)
+                await workers.run_blocking(self.set, self.make_key(prompt, answered_by), value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            # A cancelled leader must not cancel unrelated waiters: they retry
+            future.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # Mark retrieved: waiters re-raise it, and none may exist
+            future.exception()
+            raise
+        finally:
+            if inflight.get(key) is future:
+                del inflight[key]
+
+    def get_or_generate(self, prompt: str, model: str, generate: Callable[[str], Tuple[str, str]]) -> str:
+        """
+        Synchronous counterpart of get_or_generate_async for threaded callers
+
+        Args:
+            prompt: Prompt text
+            model: Model expected to answer (part of the cache key looked up)
+            generate: Function returning (response, model that answered)
+
+        Returns:
+            str: Response text
+        """
+        key = self.make_key(prompt, model)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            flight = self._sync_inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._sync_inflight[key] = flight
+
+        if not leader:
+            self.coalesced += 1
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value, answered_by = generate(prompt)
+            self.set(self.make_key(prompt, answered_by), flight.value)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._sync_inflight.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": f"{(self.hits / lookups * 100):.1f}%" if lookups else "0%"
+        }
+
+    def clear(self) -> None:
+        """Remove every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._size = 0
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+_cache: Optional[PromptCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> Optional[PromptCache]:
+    """Get the shared prompt cache, or None when caching is disabled"""
+    global _cache
+
+    if not GEMINI_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PromptCache()
+    return _cache
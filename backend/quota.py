@@ -0,0 +1,203 @@
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Gemini quota and pricing configuration (override via .env)
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "32000"))
+GEMINI_INPUT_COST_PER_MTOK = float(os.getenv("GEMINI_INPUT_COST_PER_MTOK", "0.50"))
+GEMINI_OUTPUT_COST_PER_MTOK = float(os.getenv("GEMINI_OUTPUT_COST_PER_MTOK", "1.50"))
+GEMINI_CACHED_INPUT_COST_PER_MTOK = float(os.getenv("GEMINI_CACHED_INPUT_COST_PER_MTOK", "0.125"))
+
+# Expected output size added to the prompt estimate when reserving TPM
+ESTIMATED_OUTPUT_TOKENS = 300
+MAX_RECORDED_ERRORS = 100
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token for English text)"""
+    return max(1, math.ceil(len(text) / 4))
+
+class QuotaLimiter:
+    """
+    Process-wide requests-per-minute and tokens-per-minute pacing
+
+    Each request reserves its estimated tokens in a 60-second sliding
+    window before it is sent; once the response's usageMetadata arrives the
+    reservation is corrected to the real count. State is guarded by a
+    thread lock and waits are plain sleeps, so one limiter serves every
+    event loop and thread in the process.
+    """
+
+    def __init__(self, rpm: int = GEMINI_RPM, tpm: int = GEMINI_TPM, window: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._entries = deque()
+        self._tokens_in_window = 0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        while self._entries and now - self._entries[0][0] >= self.window:
+            self._tokens_in_window -= self._entries.popleft()[1]
+
+    def _try_reserve(self, tokens: int) -> tuple:
+        """Reserve a slot or return (None, seconds to wait)"""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+
+            if self._blocked_until > now:
+                return None, self._blocked_until - now
+            if self.rpm > 0 and len(self._entries) >= self.rpm:
+                return None, self._entries[0][0] + self.window - now
+            if self.tpm > 0 and self._entries and self._tokens_in_window + tokens > self.tpm:
+                # Wait until enough of the oldest reservations leave the window
+                freed = 0
+                for stamp, used in self._entries:
+                    freed += used
+                    if self._tokens_in_window - freed + tokens <= self.tpm:
+                        return None, stamp + self.window - now
+                return None, self._entries[-1][0] + self.window - now
+
+            entry = [now, tokens]
+            self._entries.append(entry)
+            self._tokens_in_window += tokens
+            return entry, 0.0
+
+    async def acquire(self, tokens: int) -> list:
+        """
+        Wait until the request fits the RPM and TPM quotas
+
+        Args:
+            tokens: Estimated total tokens (prompt + expected output)
+
+        Returns:
+            list: Reservation handle for record()
+        """
+        while True:
+            entry, wait = self._try_reserve(tokens)
+            if entry is not None:
+                return entry
+            await asyncio.sleep(max(wait, 0.01))
+
+    def acquire_sync(self, tokens: int) -> list:
+        """Blocking counterpart of acquire() for synchronous callers"""
+        while True:
+            entry, wait = self._try_reserve(tokens)
+            if entry is not None:
+                return entry
+            time.sleep(max(wait, 0.01))
+
+    def record(self, entry: list, actual_tokens: int) -> None:
+        """Replace a reservation's estimate with the real token count"""
+        with self._lock:
+            # Entries only leave the deque once they are older than the window
+            if time.monotonic() - entry[0] < self.window:
+                self._tokens_in_window += actual_tokens - entry[1]
+            entry[1] = actual_tokens
+
+    def pause(self, seconds: float) -> None:
+        """Stop issuing requests for a while (e.g. after HTTP 429)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def status(self) -> Dict:
+        """Current window usage"""
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                "requests_last_minute": len(self._entries),
+                "tokens_last_minute": self._tokens_in_window,
+                "rpm_limit": self.rpm,
+                "tpm_limit": self.tpm
+            }
+
+class CampaignUsage:
+    """Token, cost and failure totals for one generation run"""
+
+    def __init__(self, input_cost_per_mtok: float = GEMINI_INPUT_COST_PER_MTOK,
+                 output_cost_per_mtok: float = GEMINI_OUTPUT_COST_PER_MTOK,
+                 cached_input_cost_per_mtok: float = GEMINI_CACHED_INPUT_COST_PER_MTOK):
+        self.input_cost_per_mtok = input_cost_per_mtok
+        self.output_cost_per_mtok = output_cost_per_mtok
+        self.cached_input_cost_per_mtok = cached_input_cost_per_mtok
+        self.requests = 0
+        self.failed_requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.estimated_prompt_tokens = 0
+        self.errors: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record_request(self, estimated_prompt_tokens: int, usage_metadata: Optional[Dict]) -> None:
+        """Add one API response's usageMetadata to the totals"""
+        usage_metadata = usage_metadata or {}
+        with self._lock:
+            self.requests += 1
+            self.estimated_prompt_tokens += estimated_prompt_tokens
+            self.prompt_tokens += int(usage_metadata.get('promptTokenCount', estimated_prompt_tokens))
+            # Part of promptTokenCount served from cachedContents
+            self.cached_tokens += int(usage_metadata.get('cachedContentTokenCount', 0))
+            self.output_tokens += int(usage_metadata.get('candidatesTokenCount', 0))
+
+    def record_error(self, error: str, row: Optional[int] = None) -> None:
+        """Count a failed generation (the row gets no message)"""
+        with self._lock:
+            self.failed_requests += 1
+            if len(self.errors) < MAX_RECORDED_ERRORS:
+                self.errors.append({"row": row, "error": error})
+
+    @property
+    def cost(self) -> float:
+        return ((self.prompt_tokens - self.cached_tokens) * self.input_cost_per_mtok
+                + self.cached_tokens * self.cached_input_cost_per_mtok
+                + self.output_tokens * self.output_cost_per_mtok) / 1_000_000
+
+    def summary(self) -> Dict:
+        """Totals suitable for API responses"""
+        return {
+            "requests": self.requests,
+            "failed": self.failed_requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "output_tokens": self.output_tokens,
+            "estimated_prompt_tokens": self.estimated_prompt_tokens,
+            "estimated_cost_usd": round(self.cost, 6),
+            "errors": list(self.errors)
+        }
+
+_limiter = QuotaLimiter()
+_current_usage: contextvars.ContextVar = contextvars.ContextVar("campaign_usage", default=None)
+
+def get_limiter() -> QuotaLimiter:
+    """Get the process-wide Gemini quota limiter"""
+    return _limiter
+
+def current_usage() -> Optional[CampaignUsage]:
+    """Usage tracker of the generation run in progress, if any"""
+    return _current_usage.get()
+
+@contextmanager
+def track_usage(usage: Optional[CampaignUsage]):
+    """
+    Attribute every Gemini call made inside the block to `usage`
+
+    Tasks created inside the block inherit the tracker through contextvars.
+    """
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
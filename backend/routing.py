@@ -0,0 +1,277 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Model routing table: primary model first, fallbacks after (override via .env)
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODELS = [m.strip() for m in os.getenv("GEMINI_MODELS", "gemini-pro").split(",") if m.strip()] or ["gemini-pro"]
+# Route to the next model while the primary's p95 latency exceeds this (0 disables)
+GEMINI_LATENCY_SLO = float(os.getenv("GEMINI_LATENCY_SLO", "0"))
+# Latency samples older than this many seconds no longer count
+GEMINI_LATENCY_WINDOW = float(os.getenv("GEMINI_LATENCY_WINDOW", "300"))
+# Share of requests still sent to a primary that is over the SLO, so its
+# latency keeps being measured and it can win traffic back
+GEMINI_PROBE_RATE = float(os.getenv("GEMINI_PROBE_RATE", "0.05"))
+
+# Retry and circuit breaker configuration
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "1.0"))
+GEMINI_RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "30.0"))
+GEMINI_CIRCUIT_FAILURES = int(os.getenv("GEMINI_CIRCUIT_FAILURES", "5"))
+GEMINI_CIRCUIT_RESET = float(os.getenv("GEMINI_CIRCUIT_RESET", "30.0"))
+
+# Opt-in request hedging: duplicate a request still pending after the observed
+# latency percentile, capped at a fraction of extra requests
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0.95"))
+GEMINI_HEDGE_BUDGET = float(os.getenv("GEMINI_HEDGE_BUDGET", "0.05"))
+
+# Status codes worth retrying (rate limiting and server-side failures)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+LATENCY_SAMPLES = 200
+MIN_LATENCY_SAMPLES = 20
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None,
+                  base: Optional[float] = None, cap: Optional[float] = None) -> float:
+    """
+    Delay before retry number `attempt` (0-based)
+
+    Uses exponential backoff with full jitter, but never less than a
+    server-provided Retry-After.
+
+    Args:
+        attempt: Number of attempts already failed, minus one
+        retry_after: Seconds requested by the server, if any
+        base: Initial delay (default GEMINI_RETRY_BASE_DELAY)
+        cap: Maximum delay (default GEMINI_RETRY_MAX_DELAY)
+
+    Returns:
+        float: Seconds to wait
+    """
+    base = GEMINI_RETRY_BASE_DELAY if base is None else base
+    cap = GEMINI_RETRY_MAX_DELAY if cap is None else cap
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    After `failure_threshold` failures in a row the circuit opens and
+    requests fail fast. Once `reset_timeout` has passed a single trial
+    request is let through (half-open); its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = GEMINI_CIRCUIT_FAILURES,
+                 reset_timeout: float = GEMINI_CIRCUIT_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """Give back a half-open trial whose request never completed"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+class ModelRoute:
+    """One model in the routing table with its health and latency history"""
+
+    def __init__(self, model: str, api_base: str = GEMINI_API_BASE,
+                 latency_window: float = GEMINI_LATENCY_WINDOW):
+        self.model = model
+        self.api_base = api_base
+        self.endpoint = f"{api_base}/models/{model}:generateContent"
+        self.stream_endpoint = f"{api_base}/models/{model}:streamGenerateContent"
+        self.breaker = CircuitBreaker()
+        self.latency_window = latency_window
+        # (monotonic time, seconds) of recent successes
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record_latency(self, seconds: float) -> None:
+        self.latencies.append((time.monotonic(), seconds))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile over successes within the window, or None without enough samples"""
+        cutoff = time.monotonic() - self.latency_window
+        samples = sorted(seconds for at, seconds in list(self.latencies) if at >= cutoff)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def status(self) -> Dict:
+        p95 = self.percentile(0.95)
+        return {
+            "model": self.model,
+            "circuit": self.breaker.state,
+            "p95_latency": round(p95, 3) if p95 is not None else None
+        }
+
+class ModelRouter:
+    """
+    Pick the model for each Gemini request
+
+    The first route is the primary. A route is skipped while its circuit is
+    open, and the primary is also skipped while its p95 latency exceeds the
+    SLO, provided a healthy fallback exists. Latency samples age out after
+    the route's window, and `probe_rate` of the requests still go to a slow
+    primary, so routing returns to it once it recovers.
+    """
+
+    def __init__(self, models: List[str] = None, latency_slo: float = GEMINI_LATENCY_SLO,
+                 api_base: str = GEMINI_API_BASE, probe_rate: float = GEMINI_PROBE_RATE,
+                 latency_window: float = GEMINI_LATENCY_WINDOW):
+        self.routes = [ModelRoute(model, api_base, latency_window) for model in (models or GEMINI_MODELS)]
+        self.latency_slo = latency_slo
+        self.probe_rate = probe_rate
+
+    @property
+    def primary(self) -> ModelRoute:
+        return self.routes[0]
+
+    def _over_slo(self, route: ModelRoute) -> bool:
+        if self.latency_slo <= 0:
+            return False
+        p95 = route.percentile(0.95)
+        return p95 is not None and p95 > self.latency_slo
+
+    def _ordered(self, probe: bool = False) -> List[ModelRoute]:
+        if len(self.routes) > 1 and self._over_slo(self.primary):
+            if probe and random.random() < self.probe_rate:
+                return self.routes
+            return self.routes[1:] + self.routes[:1]
+        return self.routes
+
+    def select(self) -> Optional[ModelRoute]:
+        """
+        Choose a route for the next request
+
+        Returns:
+            Optional[ModelRoute]: Route to use, or None if every circuit is open
+        """
+        for route in self._ordered(probe=True):
+            if route.breaker.allow():
+                return route
+        return None
+
+    def preferred(self) -> ModelRoute:
+        """
+        The route requests currently go to, without reserving a request
+
+        Used to look up cached responses of the model that would answer.
+        """
+        for route in self._ordered():
+            if route.breaker.state != "open":
+                return route
+        return self.primary
+
+    def status(self) -> List[Dict]:
+        return [route.status() for route in self.routes]
+
+class HedgePolicy:
+    """
+    Decide when to send a duplicate (hedged) request
+
+    A request that has not answered within the route's observed latency
+    percentile may be hedged, as long as hedges stay within `budget` times
+    the number of requests seen so far.
+    """
+
+    def __init__(self, enabled: bool = GEMINI_HEDGE_ENABLED, percentile: float = GEMINI_HEDGE_PERCENTILE,
+                 budget: float = GEMINI_HEDGE_BUDGET):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def delay(self, route: ModelRoute) -> Optional[float]:
+        """
+        Count a request and return how long to wait before hedging it
+
+        Returns:
+            Optional[float]: Seconds, or None if the request must not be hedged
+        """
+        with self._lock:
+            self.requests += 1
+        if not self.enabled:
+            return None
+        return route.percentile(self.percentile)
+
+    def try_hedge(self) -> bool:
+        """Reserve one hedge if the budget allows it"""
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def record_win(self) -> None:
+        """Count a hedge that answered before the original request"""
+        with self._lock:
+            self.hedge_wins += 1
+
+    def status(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": f"{(self.hedges / self.requests * 100):.1f}%" if self.requests else "0%"
+        }
+
+_router = ModelRouter()
+_hedge_policy = HedgePolicy()
+
+def get_router() -> ModelRouter:
+    """Get the process-wide Gemini model router"""
+    return _router
+
+def get_hedge_policy() -> HedgePolicy:
+    """Get the process-wide hedging policy"""
+    return _hedge_policy
@@ -0,0 +1,218 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import queue
+import threading
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, Iterable, Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+from quota import QuotaLimiter, get_limiter
+
+load_dotenv()
+
+# Generation concurrency configuration (override via .env)
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "5"))
+
+class GenerationScheduler:
+    """
+    Sliding-window scheduler for API calls
+
+    Work items are pulled lazily from an iterator and at most `concurrency`
+    of them are in flight at once; a new item starts as soon as any running
+    one finishes, so a slow response never stalls the others. Results are
+    yielded in completion order. Workers call throttle() before each API
+    request so that cache hits don't consume the RPM/TPM budget.
+    """
+
+    def __init__(self, concurrency: int = GEMINI_CONCURRENCY, limiter: QuotaLimiter = None):
+        self.concurrency = max(1, concurrency)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self._limiter = limiter
+
+    @property
+    def limiter(self) -> QuotaLimiter:
+        """The given limiter, or the process-wide one at the time of the call"""
+        return self._limiter or get_limiter()
+
+    async def _run_one(self, index: int, item: Any,
+                       worker: Callable[[Any], Awaitable[Any]]) -> Tuple[int, Any]:
+        async with self.semaphore:
+            return index, await worker(item)
+
+    async def throttle(self, tokens: int = 1) -> list:
+        """
+        Wait for RPM/TPM capacity; call right before each real API request
+
+        Args:
+            tokens: Estimated tokens the request will consume
+
+        Returns:
+            list: Quota reservation to correct with the actual usage
+        """
+        return await self.limiter.acquire(tokens)
+
+    async def map_unordered(self, items: Iterable[Any],
+                            worker: Callable[[Any], Awaitable[Any]]) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Run `worker` over `items` with bounded concurrency
+
+        Args:
+            items: Iterable of work items (consumed lazily)
+            worker: Coroutine function processing one item
+
+        Yields:
+            Tuple[int, Any]: (item index, worker result) as each one completes
+        """
+        iterator = enumerate(items)
+        pending = set()
+
+        def fill() -> None:
+            while len(pending) < self.concurrency:
+                try:
+                    index, item = next(iterator)
+                except StopIteration:
+                    return
+                pending.add(asyncio.ensure_future(self._run_one(index, item, worker)))
+
+        fill()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                fill()
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+_schedulers = weakref.WeakKeyDictionary()
+
+def get_scheduler() -> GenerationScheduler:
+    """
+    Get the shared scheduler for the running event loop
+
+    Every campaign generated in the same loop shares one concurrency limit.
+    GEMINI_CONCURRENCY therefore applies per loop, not per process: the
+    API's loop and the background loop behind run_sync() (shared by all
+    sync callers) each allow that many requests in flight. The RPM/TPM
+    quota is shared by the whole process.
+    """
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = GenerationScheduler()
+        _schedulers[loop] = scheduler
+    return scheduler
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the long-lived event loop that runs async work for synchronous callers
+
+    One loop in a daemon thread serves every run_sync() and iterate_sync()
+    call, so sync callers (the Streamlit app, scripts) share one Gemini
+    connection pool and one scheduler instead of building both per call.
+    """
+    global _background_loop
+
+    if _background_loop is None:
+        with _background_lock:
+            if _background_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="blastify-async", daemon=True).start()
+                _background_loop = loop
+    return _background_loop
+
+def _submit(coro: Coroutine) -> Tuple[concurrent.futures.Future, Callable[[], None]]:
+    """
+    Start a coroutine on the background loop
+
+    The task runs in a copy of the caller's context, so context variables
+    (e.g. the usage tracker) carry over as they would with asyncio.run().
+
+    Returns:
+        Tuple[Future, Callable]: Future with the coroutine's outcome, and a
+            function that cancels the task
+    """
+    loop = get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("Cannot wait for the background loop from inside it")
+
+    context = contextvars.copy_context()
+    outcome: concurrent.futures.Future = concurrent.futures.Future()
+    holder = {}
+
+    def finish(task: asyncio.Task) -> None:
+        if task.cancelled():
+            outcome.set_exception(asyncio.CancelledError())
+        elif task.exception() is not None:
+            outcome.set_exception(task.exception())
+        else:
+            outcome.set_result(task.result())
+
+    def start() -> None:
+        outcome.set_running_or_notify_cancel()
+        holder["task"] = context.run(loop.create_task, coro)
+        holder["task"].add_done_callback(finish)
+
+    def cancel() -> None:
+        loop.call_soon_threadsafe(lambda: holder["task"].cancel() if "task" in holder else None)
+
+    loop.call_soon_threadsafe(start)
+    return outcome, cancel
+
+def run_sync(coro: Coroutine) -> Any:
+    """
+    Run a coroutine to completion from synchronous code
+
+    The coroutine runs on the shared background loop (see
+    get_background_loop) and this thread waits for its result.
+    """
+    outcome, _ = _submit(coro)
+    return outcome.result()
+
+def iterate_sync(agen: AsyncIterator) -> Iterator:
+    """
+    Consume an async iterator from synchronous code, item by item
+
+    The iterator runs on the shared background loop and items are handed
+    over through a queue as soon as they are produced, e.g. to feed
+    Streamlit's st.write_stream with streamed Gemini chunks. If the
+    consumer stops early, the iterator is cancelled so it can clean up.
+    """
+    items = queue.Queue()
+    done = object()
+
+    async def pump() -> None:
+        try:
+            async for item in agen:
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        finally:
+            items.put(done)
+
+    outcome, cancel = _submit(pump())
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        if not outcome.done():
+            cancel()
+            concurrent.futures.wait([outcome], timeout=30)
@@ -0,0 +1,282 @@
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from io import BytesIO
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from storage import DATA_DIR
+
+load_dotenv()
+
+# Campaign snapshot configuration (override via .env)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or os.path.join(DATA_DIR, "snapshots")
+SNAPSHOT_TTL = int(os.getenv("SNAPSHOT_TTL", str(7 * 24 * 3600)))
+# Rows per record batch; exports stream one batch at a time
+SNAPSHOT_BATCH_ROWS = 65536
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file"
+}
+
+_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_METADATA_KEY = b"blastify"
+
+class SnapshotStore:
+    """
+    Parsed contact lists saved server-side under a campaign id
+
+    Each snapshot is one uncompressed Arrow IPC file, so opening it is a
+    memory map rather than a read: previews slice a few rows without
+    touching the rest, and sends load only the columns they need. Upload
+    details (file name, sheet, creation time) live in the schema metadata.
+    Snapshots expire after `ttl` seconds.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, ttl: int = SNAPSHOT_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, campaign_id: str) -> str:
+        if not isinstance(campaign_id, str) or not _ID_PATTERN.match(campaign_id):
+            raise KeyError(f"Unknown campaign: {campaign_id}")
+        path = os.path.join(self.directory, f"{campaign_id}.arrow")
+        if not os.path.exists(path):
+            raise KeyError(f"Unknown campaign: {campaign_id}")
+        return path
+
+    def save(self, df: pd.DataFrame, **metadata) -> str:
+        """
+        Snapshot a parsed list
+
+        Args:
+            df: Cleaned contact rows
+            metadata: JSON-serializable upload details (filename, sheet, ...)
+
+        Returns:
+            str: New campaign id
+        """
+        return self.save_batches([df], **metadata)
+
+    def save_batches(self, frames: Iterable[pd.DataFrame], **metadata) -> str:
+        """
+        Snapshot a list that arrives in batches, without holding it all in memory
+
+        Args:
+            frames: Cleaned row batches with the same columns (e.g. from
+                parser.iter_parse_file)
+            metadata: JSON-serializable upload details (filename, sheet, ...)
+
+        Returns:
+            str: New campaign id
+
+        Raises:
+            ValueError: If there are no batches
+        """
+        campaign_id = uuid.uuid4().hex
+        details = json.dumps({"created_at": time.time(), **metadata}, default=str).encode("utf-8")
+        path = os.path.join(self.directory, f"{campaign_id}.arrow")
+        schema = None
+        writer = None
+
+        # Write beside the final name so readers never see a partial file
+        with pa.OSFile(path + ".tmp", "wb") as sink:
+            try:
+                for df in frames:
+                    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+                    if writer is None:
+                        schema = table.schema.with_metadata({**(table.schema.metadata or {}), _METADATA_KEY: details})
+                        table = table.replace_schema_metadata(schema.metadata)
+                        writer = pa.ipc.new_file(sink, schema)
+                    writer.write_table(table, max_chunksize=SNAPSHOT_BATCH_ROWS)
+                if writer is None:
+                    raise ValueError("No rows to snapshot")
+                writer.close()
+            except BaseException:
+                sink.close()
+                os.remove(path + ".tmp")
+                raise
+        os.replace(path + ".tmp", path)
+        self._prune()
+        return campaign_id
+
+    def open(self, campaign_id: str) -> pa.Table:
+        """
+        Memory-map a snapshot
+
+        Args:
+            campaign_id: Id returned by save()
+
+        Returns:
+            pa.Table: Zero-copy view of the file
+
+        Raises:
+            KeyError: If there is no such snapshot
+        """
+        with pa.memory_map(self._path(campaign_id), "r") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def load(self, campaign_id: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Load a snapshot as a DataFrame
+
+        Args:
+            campaign_id: Id returned by save()
+            columns: Only convert these columns (missing ones are ignored)
+
+        Returns:
+            pd.DataFrame: Contact rows
+        """
+        table = self.open(campaign_id)
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        return table.to_pandas()
+
+    def rows(self, campaign_id: str, offset: int = 0, limit: int = 20) -> List[Dict]:
+        """JSON-ready records for one page of a snapshot"""
+        return self.open(campaign_id).slice(max(0, offset), max(0, limit)).to_pylist()
+
+    def info(self, campaign_id: str) -> Dict:
+        """Row count, columns, upload details and generated result of a snapshot"""
+        table = self.open(campaign_id)
+        metadata = json.loads((table.schema.metadata or {}).get(_METADATA_KEY, b"{}"))
+        return {
+            "campaign_id": campaign_id,
+            "rows": table.num_rows,
+            "columns": table.column_names,
+            "size_bytes": os.path.getsize(self._path(campaign_id)),
+            "result_campaign_id": self.result_of(campaign_id),
+            **metadata
+        }
+
+    def link_result(self, campaign_id: str, result_campaign_id: str) -> None:
+        """
+        Record the snapshot a list's messages were generated into
+
+        Args:
+            campaign_id: Source snapshot
+            result_campaign_id: Snapshot with the generated message column
+
+        Raises:
+            KeyError: If either snapshot does not exist
+        """
+        path = self._path(campaign_id) + ".result"
+        self._path(result_campaign_id)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(result_campaign_id)
+        os.replace(path + ".tmp", path)
+
+    def result_of(self, campaign_id: str) -> Optional[str]:
+        """
+        The snapshot a list's messages were generated into
+
+        Returns:
+            Optional[str]: Result campaign id, or None if the list has no
+                (surviving) generated snapshot
+
+        Raises:
+            KeyError: If there is no such snapshot
+        """
+        try:
+            with open(self._path(campaign_id) + ".result", encoding="utf-8") as f:
+                result_campaign_id = f.read().strip()
+            self._path(result_campaign_id)
+        except (OSError, KeyError):
+            return None
+        return result_campaign_id
+
+    def export(self, campaign_id: str, fmt: str = "csv") -> Iterator[bytes]:
+        """
+        Stream a snapshot as CSV, Parquet or the Arrow file itself
+
+        Args:
+            campaign_id: Id returned by save()
+            fmt: One of EXPORT_FORMATS
+
+        Returns:
+            Iterator[bytes]: File content in chunks
+
+        Raises:
+            KeyError: If there is no such snapshot
+            ValueError: If the format is unknown
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        path = self._path(campaign_id)
+        table = self.open(campaign_id)
+        return self._export_chunks(path, table, fmt)
+
+    @staticmethod
+    def _export_chunks(path: str, table: pa.Table, fmt: str) -> Iterator[bytes]:
+        if fmt == "arrow":
+            with open(path, "rb") as f:
+                while chunk := f.read(1 << 20):
+                    yield chunk
+        elif fmt == "csv":
+            # Each record batch is encoded and handed off before the next one
+            buffer = BytesIO()
+            with pacsv.CSVWriter(buffer, table.schema) as writer:
+                for batch in table.to_batches():
+                    writer.write_batch(batch)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            # Parquet's footer records absolute offsets, so it is written in one piece
+            sink = pa.BufferOutputStream()
+            pq.write_table(table.replace_schema_metadata(), sink)
+            yield sink.getvalue().to_pybytes()
+
+    def delete(self, campaign_id: str) -> None:
+        """Remove a snapshot"""
+        path = self._path(campaign_id)
+        os.remove(path)
+        try:
+            os.remove(path + ".result")
+        except FileNotFoundError:
+            pass
+
+    def _prune(self) -> None:
+        """Drop expired snapshots"""
+        if self.ttl <= 0:
+            return
+        cutoff = time.time() - self.ttl
+        for path in glob.glob(os.path.join(self.directory, "*.arrow")):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+        # Result links go with the list they belong to
+        for path in glob.glob(os.path.join(self.directory, "*.arrow.result")):
+            if not os.path.exists(path[:-len(".result")]):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+_snapshot_store: Optional[SnapshotStore] = None
+_snapshot_lock = threading.Lock()
+
+def get_snapshot_store() -> SnapshotStore:
+    """Get the shared campaign snapshot store"""
+    global _snapshot_store
+
+    if _snapshot_store is None:
+        with _snapshot_lock:
+            if _snapshot_store is None:
+                _snapshot_store = SnapshotStore()
+    return _snapshot_store
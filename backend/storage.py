@@ -0,0 +1,43 @@
+import os
+import sqlite3
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Root directory for Blastify's local state (caches, indexes, snapshots)
+DATA_DIR = os.getenv(
+    "BLASTIFY_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+)
+
+def data_path(*parts: str) -> str:
+    """
+    Build a path inside the data directory
+
+    Nothing is created here, so importing a module that only names its
+    default file leaves the disk untouched; open_database() creates the
+    folder when the file is first opened.
+
+    Args:
+        parts: Path components relative to DATA_DIR
+
+    Returns:
+        str: Absolute path
+    """
+    return os.path.join(DATA_DIR, *parts)
+
+def open_database(path: str, **kwargs) -> sqlite3.Connection:
+    """
+    Connect to a SQLite file, creating its parent folders first
+
+    Args:
+        path: Database file
+        kwargs: Passed on to sqlite3.connect
+
+    Returns:
+        sqlite3.Connection: The open connection
+    """
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    return sqlite3.connect(path, **kwargs)
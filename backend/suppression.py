@@ -0,0 +1,288 @@
+import os
+import threading
+from email.utils import parseaddr
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from storage import DATA_DIR
+from validation import normalize_emails
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+load_dotenv()
+
+# Suppression list configuration (override via .env)
+SUPPRESSION_DIR = os.getenv("SUPPRESSION_DIR") or os.path.join(DATA_DIR, "suppression")
+# Fold the append log into the sorted index once it holds this many entries
+SUPPRESSION_COMPACT_THRESHOLD = int(os.getenv("SUPPRESSION_COMPACT_THRESHOLD", "100000"))
+
+# Why an address is suppressed
+REASON_UNSUBSCRIBE = "unsubscribe"
+REASON_BOUNCE = "bounce"
+REASON_COMPLAINT = "complaint"
+REASON_MANUAL = "manual"
+SUPPRESSION_REASONS = [REASON_UNSUBSCRIBE, REASON_BOUNCE, REASON_COMPLAINT, REASON_MANUAL]
+
+# Resend webhook type for mail received on an inbound address
+INBOUND_EVENT_TYPE = "email.received"
+
+# One append-log record: address hash plus reason code
+_RECORD = np.dtype([("hash", "<u8"), ("reason", "u1")])
+# Fixed SipHash key, so hashes are stable across processes and restarts
+_HASH_KEY = "blastify-suppr-1"
+
+def address_hashes(emails: Iterable) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash normalized addresses into 64-bit keys
+
+    Args:
+        emails: Series (or iterable) of addresses
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: uint64 hash per row, and a mask of
+            rows that actually hold an address
+    """
+    normalized = normalize_emails(emails)
+    present = (normalized.fillna("") != "").to_numpy(dtype=bool)
+    values = normalized.fillna("").to_numpy(dtype=object)
+    return pd.util.hash_array(values, hash_key=_HASH_KEY, categorize=False), present
+
+def _sorted_member(sorted_hashes: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    found = np.zeros(len(hashes), dtype=bool)
+    if len(sorted_hashes) == 0 or len(hashes) == 0:
+        return found
+    # Searching in sorted order walks the index front to back instead of
+    # jumping around it, which is an order of magnitude faster on big lists
+    order = np.argsort(hashes)
+    queries = hashes[order]
+    positions = np.searchsorted(sorted_hashes, queries)
+    positions[positions == len(sorted_hashes)] = 0
+    found[order] = np.asarray(sorted_hashes[positions]) == queries
+    return found
+
+class SuppressionList:
+    """
+    Addresses that must never be mailed again
+
+    Entries are 64-bit hashes of normalized addresses. Most live in a sorted
+    array saved as .npy and memory-mapped on open, so even multi-million
+    entry lists load instantly and are checked with a vectorized binary
+    search. New entries go to a small append log that is folded into the
+    sorted file once it grows past `compact_threshold`. Files are re-read
+    when another process (the API or the Streamlit app) changes them.
+    """
+
+    def __init__(self, directory: str = SUPPRESSION_DIR,
+                 compact_threshold: int = SUPPRESSION_COMPACT_THRESHOLD):
+        self.directory = directory
+        self.compact_threshold = compact_threshold
+        self._hashes_path = os.path.join(directory, "hashes.npy")
+        self._reasons_path = os.path.join(directory, "reasons.npy")
+        self._log_path = os.path.join(directory, "pending.bin")
+        self._lock = threading.Lock()
+        self._signature = None
+        self._hashes = np.empty(0, dtype="<u8")
+        self._reasons = np.empty(0, dtype="u1")
+        self._pending = np.empty(0, dtype=_RECORD)
+
+    def _file_lock(self):
+        """Exclusive lock shared with other processes using the same directory"""
+        os.makedirs(self.directory, exist_ok=True)
+        handle = open(os.path.join(self.directory, "lock"), "a")
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _stat(self, path: str) -> Optional[Tuple[int, int, int]]:
+        try:
+            info = os.stat(path)
+            return info.st_ino, info.st_size, info.st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self) -> None:
+        """Reload the index files if they changed on disk (call with _lock held)"""
+        signature = (self._stat(self._hashes_path), self._stat(self._log_path))
+        if signature == self._signature:
+            return
+        if signature[0] is not None:
+            self._hashes = np.load(self._hashes_path, mmap_mode="r")
+            self._reasons = np.load(self._reasons_path, mmap_mode="r")
+        else:
+            self._hashes = np.empty(0, dtype="<u8")
+            self._reasons = np.empty(0, dtype="u1")
+        if signature[1] is not None:
+            # Ignore a trailing partial record from an interrupted append
+            count = signature[1][1] // _RECORD.itemsize
+            pending = np.fromfile(self._log_path, dtype=_RECORD, count=count)
+            self._pending = pending[np.argsort(pending["hash"], kind="stable")]
+        else:
+            self._pending = np.empty(0, dtype=_RECORD)
+        self._signature = signature
+
+    def _member(self, hashes: np.ndarray) -> np.ndarray:
+        return _sorted_member(self._hashes, hashes) | _sorted_member(self._pending["hash"], hashes)
+
+    def contains(self, emails: Iterable) -> np.ndarray:
+        """
+        Check a batch of addresses in one vectorized pass
+
+        Args:
+            emails: Series (or iterable) of addresses
+
+        Returns:
+            np.ndarray: True for each suppressed address, aligned with the input
+        """
+        if not isinstance(emails, pd.Series):
+            emails = pd.Series(list(emails), dtype=object)
+        with self._lock:
+            self._refresh()
+            if len(self._hashes) == 0 and len(self._pending) == 0:
+                return np.zeros(len(emails), dtype=bool)
+        hashes, present = address_hashes(emails)
+        with self._lock:
+            self._refresh()
+            return self._member(hashes) & present
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._hashes) + len(self._pending)
+
+    def is_suppressed(self, email: str) -> bool:
+        """Whether one address is suppressed"""
+        return bool(self.contains([email])[0])
+
+    def add(self, emails: Iterable, reason: str = REASON_MANUAL) -> int:
+        """
+        Suppress addresses
+
+        Args:
+            emails: Series (or iterable) of addresses
+            reason: One of SUPPRESSION_REASONS
+
+        Returns:
+            int: Number of addresses that were not already suppressed
+
+        Raises:
+            ValueError: If the reason is unknown
+        """
+        if reason not in SUPPRESSION_REASONS:
+            raise ValueError(f"Unknown suppression reason: {reason}")
+        hashes, present = address_hashes(emails)
+        hashes = np.unique(hashes[present])
+        if len(hashes) == 0:
+            return 0
+
+        with self._lock, self._file_lock():
+            self._refresh()
+            hashes = hashes[~self._member(hashes)]
+            if len(hashes):
+                records = np.empty(len(hashes), dtype=_RECORD)
+                records["hash"] = hashes
+                records["reason"] = SUPPRESSION_REASONS.index(reason)
+                with open(self._log_path, "ab") as log:
+                    log.write(records.tobytes())
+                self._refresh()
+                if len(self._pending) >= self.compact_threshold:
+                    self._compact()
+        return int(len(hashes))
+
+    def _compact(self) -> None:
+        """Merge the append log into the sorted index (call with both locks held)"""
+        hashes = np.concatenate([np.asarray(self._hashes), self._pending["hash"]])
+        reasons = np.concatenate([np.asarray(self._reasons), self._pending["reason"]])
+        order = np.argsort(hashes, kind="stable")
+        hashes, reasons = hashes[order], reasons[order]
+        keep = np.ones(len(hashes), dtype=bool)
+        keep[1:] = hashes[1:] != hashes[:-1]
+
+        # Write beside the live files, then swap them in atomically
+        for path, values in ((self._reasons_path, reasons[keep]), (self._hashes_path, hashes[keep])):
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, values)
+            os.replace(path + ".tmp", path)
+        os.remove(self._log_path)
+        self._signature = None
+        self._refresh()
+
+    def compact(self) -> None:
+        """Fold pending entries into the sorted index now"""
+        with self._lock, self._file_lock():
+            self._refresh()
+            if len(self._pending):
+                self._compact()
+
+    def stats(self) -> Dict:
+        """Return entry counts by reason"""
+        with self._lock:
+            self._refresh()
+            counts = np.bincount(np.asarray(self._reasons), minlength=len(SUPPRESSION_REASONS))
+            counts = counts + np.bincount(self._pending["reason"], minlength=len(SUPPRESSION_REASONS))
+            return {
+                "entries": int(counts.sum()),
+                "pending": int(len(self._pending)),
+                "by_reason": {reason: int(count) for reason, count in zip(SUPPRESSION_REASONS, counts)}
+            }
+
+def suppression_events(payload: Dict) -> List[Tuple[str, str]]:
+    """
+    Extract (address, reason) pairs from a Resend webhook payload
+
+    Hard bounces and spam complaints suppress the recipient; an inbound
+    email (an `email.received` event, or a bare forwarded message with no
+    type) asking to unsubscribe suppresses its sender. Other events
+    (sends, deliveries, opens, soft bounces) yield nothing, whatever their
+    subject says.
+
+    Args:
+        payload: Decoded webhook JSON
+
+    Returns:
+        List[Tuple[str, str]]: Addresses to suppress and why
+    """
+    event_type = payload.get('type', '')
+    data = payload.get('data') or {}
+    recipients = data.get('to') or []
+    if isinstance(recipients, str):
+        recipients = [recipients]
+
+    if event_type == "email.bounced":
+        bounce = data.get('bounce') or {}
+        if str(bounce.get('type', '')).lower() in ("transient", "soft"):
+            return []
+        return [(parseaddr(r)[1], REASON_BOUNCE) for r in recipients]
+    if event_type == "email.complained":
+        return [(parseaddr(r)[1], REASON_COMPLAINT) for r in recipients]
+
+    # Inbound replies only: our own sent/delivered events carry our sender
+    # and campaign subjects, which must never be read as an opt-out
+    if event_type == INBOUND_EVENT_TYPE:
+        message = data
+    elif not event_type:
+        message = payload  # a raw inbound email forwarded without an envelope
+    else:
+        return []
+    sender = message.get('from')
+    text = " ".join(str(message.get(k) or "") for k in ("subject", "text"))
+    if sender and "unsubscribe" in text.lower():
+        return [(parseaddr(sender)[1], REASON_UNSUBSCRIBE)]
+    return []
+
+_suppression_list: Optional[SuppressionList] = None
+_suppression_lock = threading.Lock()
+
+def get_suppression_list() -> SuppressionList:
+    """Get the shared suppression list"""
+    global _suppression_list
+
+    if _suppression_list is None:
+        with _suppression_lock:
+            if _suppression_list is None:
+                _suppression_list = SuppressionList()
+    return _suppression_list
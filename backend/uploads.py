@@ -0,0 +1,413 @@
+"""
+Resumable chunked uploads
+
+A client creates an upload, appends chunks at the current offset (asking
+for the offset again after a dropped connection) and finalizes it. Chunks
+are written to disk and hashed as they arrive, and the rows end up in a
+campaign snapshot, so multi-GB lists never sit in one request body.
+"""
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from storage import DATA_DIR
+
+import parser as file_parser
+import workers
+from snapshots import get_snapshot_store
+
+load_dotenv()
+
+# Resumable upload configuration (override via .env)
+UPLOAD_DIR = os.getenv("UPLOAD_DIR") or os.path.join(DATA_DIR, "uploads")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 ** 3)))
+# Unfinished uploads are discarded after this many seconds without a chunk
+UPLOAD_TTL = int(os.getenv("UPLOAD_TTL", str(24 * 3600)))
+
+_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+class UploadOffsetError(ValueError):
+    """A chunk was sent for an offset other than the upload's current one"""
+
+    def __init__(self, expected: int, received: int):
+        super().__init__(f"Upload is at offset {expected}, chunk was sent for offset {received}")
+        self.expected = expected
+
+class _GrowingFile(io.RawIOBase):
+    """
+    Read side of an upload that is still being written
+
+    Reads block until the requested bytes have arrived or the upload is
+    finished (or aborted), so a streaming parser can follow the writer.
+    """
+
+    def __init__(self, upload: "ChunkedUpload"):
+        self._upload = upload
+        self._file = open(upload.data_path, "rb")
+        self._position = 0
+        self._lock = threading.Lock()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        with self._lock:
+            if whence == io.SEEK_CUR:
+                offset += self._position
+            elif whence == io.SEEK_END:
+                offset += self._upload.wait_for(None)
+            self._position = max(0, offset)
+            return self._position
+
+    def readinto(self, buffer) -> int:
+        with self._lock:
+            available = self._upload.wait_for(self._position + 1)
+            count = min(len(buffer), available - self._position)
+            if count <= 0:
+                return 0
+            self._file.seek(self._position)
+            data = self._file.read(count)
+            buffer[:len(data)] = data
+            self._position += len(data)
+            return len(data)
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+class ChunkedUpload:
+    """
+    One resumable upload: chunks are appended at the current offset, written
+    to disk and hashed as they arrive
+
+    CSV uploads are parsed, validated and deduplicated by a background
+    thread that reads the partial file as it grows, writing clean rows
+    straight into a campaign snapshot; by the time the last chunk lands
+    most of the work is done. Excel workbooks are zip archives whose
+    directory sits at the end, so they are parsed on finalize, in a worker
+    process.
+    """
+
+    def __init__(self, directory: str, upload_id: str, filename: str, length: Optional[int] = None,
+                 sheet: Optional[str] = None):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.length = length
+        self.sheet = sheet
+        self.data_path = os.path.join(directory, f"{upload_id}.part")
+        self.info_path = os.path.join(directory, f"{upload_id}.json")
+        self.offset = 0
+        self.updated_at = time.time()
+        self.complete = False
+        self.aborted = False
+        self.campaign_id: Optional[str] = None
+        self.error: Optional[str] = None
+        self.rows_parsed = 0
+        self._digest = hashlib.sha256()
+        self._write_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._parser: Optional[threading.Thread] = None
+
+    @property
+    def streaming(self) -> bool:
+        """Whether rows are parsed while chunks are still arriving"""
+        return self.filename.lower().endswith(".csv")
+
+    def _save_info(self) -> None:
+        with open(self.info_path, "w", encoding="utf-8") as f:
+            json.dump({"filename": self.filename, "length": self.length, "sheet": self.sheet}, f)
+
+    def _restore(self) -> None:
+        """Pick up the bytes already on disk, e.g. after a server restart"""
+        with open(self.data_path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                self._digest.update(chunk)
+                self.offset += len(chunk)
+
+    def wait_for(self, position: Optional[int]) -> int:
+        """
+        Block until `position` bytes are on disk (None: until the upload ends)
+
+        Returns:
+            int: Bytes available to readers
+        """
+        with self._changed:
+            while not (self.complete or self.aborted or (position is not None and self.offset >= position)):
+                self._changed.wait()
+            if self.aborted:
+                raise IOError("Upload was aborted")
+            return self.offset
+
+    def _start_parser(self) -> None:
+        if self._parser is None:
+            self._parser = threading.Thread(target=self._parse, name=f"upload-{self.upload_id}", daemon=True)
+            self._parser.start()
+
+    def _parse(self) -> None:
+        """
+        Parse the upload into a snapshot (runs on the upload's own thread)
+
+        Finished files (Excel workbooks) are handed to the worker process
+        pool like /upload/ parses. Streamed CSVs stay on this thread: the
+        parse lives as long as the upload, often mostly waiting for the
+        network, which would pin a pool process for that whole time, and it
+        follows the writer through an in-process condition. Its per-batch
+        work is mostly pyarrow reads and compute kernels, which release the GIL.
+        """
+        if not self.streaming:
+            try:
+                self.campaign_id, self.rows_parsed = workers.call_cpu_bound(
+                    workers.parse_path_to_snapshot, self.data_path, self.filename, self.sheet,
+                    get_snapshot_store().directory
+                )
+            except Exception as e:
+                self.error = str(e)
+            return
+
+        source = _GrowingFile(self)
+        upload_file = SimpleNamespace(filename=self.filename.lower(), file=source)
+
+        def counted(chunks):
+            for chunk in chunks:
+                self.rows_parsed += len(chunk)
+                yield chunk
+
+        try:
+            self.campaign_id = get_snapshot_store().save_batches(
+                counted(file_parser.iter_parse_file(upload_file, sheet=self.sheet)),
+                filename=self.filename, sheet=self.sheet
+            )
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            source.close()
+
+    def append(self, data: bytes, offset: Optional[int] = None) -> int:
+        """
+        Write the next piece of the file
+
+        Args:
+            data: Bytes that continue the file
+            offset: Where the client believes the file currently ends
+
+        Returns:
+            int: New offset
+
+        Raises:
+            UploadOffsetError: If `offset` is not the current offset
+            ValueError: If the upload is finished or would exceed its length
+        """
+        with self._write_lock:
+            if self.complete or self.aborted:
+                raise ValueError("Upload is already finished")
+            if offset is not None and offset != self.offset:
+                raise UploadOffsetError(self.offset, offset)
+            limit = self.length if self.length is not None else UPLOAD_MAX_BYTES
+            if self.offset + len(data) > limit:
+                raise ValueError(f"Upload would exceed its length of {limit} bytes")
+            with open(self.data_path, "ab") as f:
+                f.write(data)
+            self._digest.update(data)
+            with self._changed:
+                self.offset += len(data)
+                self.updated_at = time.time()
+                self._changed.notify_all()
+        if self.streaming:
+            self._start_parser()
+        return self.offset
+
+    def finalize(self, checksum: Optional[str] = None) -> Dict:
+        """
+        Mark the upload complete and wait for its rows to be snapshotted
+
+        Args:
+            checksum: Expected SHA-256 hex digest of the whole file
+
+        Returns:
+            Dict: Campaign id, row count, size and digest
+
+        Raises:
+            ValueError: If bytes are missing, the checksum differs or the
+                file has no valid rows
+        """
+        with self._write_lock:
+            if self.length is not None and self.offset != self.length:
+                raise ValueError(f"Upload is incomplete: {self.offset} of {self.length} bytes received")
+            sha256 = self._digest.hexdigest()
+            if checksum and checksum.lower() != sha256:
+                raise ValueError("Checksum mismatch: the uploaded bytes differ from the original file")
+            with self._changed:
+                self.complete = True
+                self._changed.notify_all()
+        self._start_parser()
+        self._parser.join()
+        if self.error:
+            raise ValueError(self.error)
+        return {
+            "campaign_id": self.campaign_id,
+            "rows": self.rows_parsed,
+            "bytes": self.offset,
+            "sha256": sha256
+        }
+
+    def abort(self) -> None:
+        """Stop the upload and its parser"""
+        with self._changed:
+            self.aborted = True
+            self._changed.notify_all()
+        if self._parser is not None:
+            self._parser.join()
+
+    def status(self) -> Dict:
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "offset": self.offset,
+            "length": self.length,
+            "complete": self.complete,
+            "rows_parsed": self.rows_parsed,
+            "error": self.error,
+            "campaign_id": self.campaign_id
+        }
+
+class UploadManager:
+    """
+    Resumable uploads in progress, tus-style: create, append at offset,
+    finalize
+
+    Each upload is a `.part` file plus a small JSON sidecar in `directory`,
+    so an interrupted upload can be resumed from its last offset even after
+    the server restarts.
+    """
+
+    def __init__(self, directory: str = UPLOAD_DIR, ttl: int = UPLOAD_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._uploads: Dict[str, ChunkedUpload] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def create(self, filename: str, length: Optional[int] = None, sheet: Optional[str] = None) -> ChunkedUpload:
+        """
+        Start an upload
+
+        Args:
+            filename: Original file name (its extension picks the parser)
+            length: Total size in bytes, if known
+            sheet: Excel worksheet name (default: first sheet)
+
+        Returns:
+            ChunkedUpload: The new upload, at offset 0
+
+        Raises:
+            ValueError: If the file type is unsupported, the length is negative
+                or the file is too large
+        """
+        if not filename.lower().endswith((".csv", ".xlsx", ".xls")):
+            raise ValueError(f"Unsupported file type: {filename}. Please use CSV or Excel files.")
+        if length is not None and length < 0:
+            raise ValueError("Upload length cannot be negative")
+        if length is not None and length > UPLOAD_MAX_BYTES:
+            raise ValueError(f"File is larger than the {UPLOAD_MAX_BYTES} byte upload limit")
+        self._prune()
+        upload = ChunkedUpload(self.directory, uuid.uuid4().hex, filename, length, sheet)
+        open(upload.data_path, "wb").close()
+        upload._save_info()
+        with self._lock:
+            self._uploads[upload.upload_id] = upload
+        return upload
+
+    def get(self, upload_id: str) -> ChunkedUpload:
+        """
+        Look up an upload, reloading it from disk if needed
+
+        Raises:
+            KeyError: If there is no such upload
+        """
+        if not isinstance(upload_id, str) or not _ID_PATTERN.match(upload_id):
+            raise KeyError(f"Unknown upload: {upload_id}")
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is not None:
+                return upload
+            info_path = os.path.join(self.directory, f"{upload_id}.json")
+            try:
+                with open(info_path, "r", encoding="utf-8") as f:
+                    info = json.load(f)
+            except FileNotFoundError:
+                raise KeyError(f"Unknown upload: {upload_id}") from None
+            upload = ChunkedUpload(self.directory, upload_id, info["filename"], info.get("length"), info.get("sheet"))
+            upload._restore()
+            self._uploads[upload_id] = upload
+        if upload.streaming and upload.offset:
+            upload._start_parser()
+        return upload
+
+    def discard(self, upload_id: str) -> None:
+        """
+        Abort an upload and delete its files
+
+        Raises:
+            KeyError: If there is no such upload
+        """
+        self.get(upload_id)
+        self._remove(upload_id)
+
+    def _remove(self, upload_id: str) -> None:
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is not None:
+            upload.abort()
+        for suffix in (".part", ".json"):
+            try:
+                os.remove(os.path.join(self.directory, upload_id + suffix))
+            except FileNotFoundError:
+                pass
+
+    def finalize(self, upload_id: str, checksum: Optional[str] = None) -> Dict:
+        """Finish an upload (see ChunkedUpload.finalize) and delete its raw bytes"""
+        result = self.get(upload_id).finalize(checksum)
+        self._remove(upload_id)
+        return result
+
+    def _prune(self) -> None:
+        """Discard uploads that stopped receiving chunks"""
+        if self.ttl <= 0:
+            return
+        cutoff = time.time() - self.ttl
+        for info_path in glob.glob(os.path.join(self.directory, "*.json")):
+            upload_id = os.path.basename(info_path)[:-len(".json")]
+            data_path = os.path.join(self.directory, f"{upload_id}.part")
+            try:
+                if os.path.getmtime(data_path if os.path.exists(data_path) else info_path) < cutoff:
+                    self._remove(upload_id)
+            except OSError:
+                pass
+
+_upload_manager: Optional[UploadManager] = None
+_upload_lock = threading.Lock()
+
+def get_upload_manager() -> UploadManager:
+    """Get the shared resumable upload manager"""
+    global _upload_manager
+
+    if _upload_manager is None:
+        with _upload_lock:
+            if _upload_manager is None:
+                _upload_manager = UploadManager()
+    return _upload_manager
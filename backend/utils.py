@@ -3,78 +3,24 @@ import re
 from typing import Dict, List, Optional
 import pandas as pd
 from datetime import datetime
+from validation import REASON_OK, email_reason, normalize_email
 
 def validate_email(email: str) -> bool:
     """
     Strict email validation - only accepts real, properly formatted emails
     
+    Single-value front end of the shared validation engine; use
+    validation.valid_email_mask for whole columns.
+    
     Args:
         email: Email address to validate
         
     Returns:
         bool: True if valid, False otherwise
     """
-    if not email or not isinstance(email, str):
-        return False
-    
-    email = email.strip().lower()
-    
-    # Must contain exactly one @ symbol
-    if email.count('@') != 1:
-        return False
-    
-    # Split into local and domain parts
-    try:
-        local, domain = email.split('@')
-    except ValueError:
-        return False
-    
-    # Local part validation (before @)
-    if not local or len(local) > 64:
-        return False
-    
-    # Domain part validation (after @)
-    if not domain or len(domain) > 255:
-        return False
-    
-    # Domain must contain at least one dot
-    if '.' not in domain:
-        return False
-    
-    # Domain must not start or end with dot or hyphen
-    if domain.startswith('.') or domain.endswith('.') or domain.startswith('-') or domain.endswith('-'):
-        return False
-    
-    # More strict pattern matching
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(pattern, email):
-        return False
-    
-    # Reject common fake/test domains
-    fake_domains = {
-        'test.com', 'example.com', 'test.test', 'fake.com', 'invalid.com',
-        'dummy.com', 'sample.com', 'temp.com', 'placeholder.com',
-        'test.org', 'example.org', 'fake.org', 'dummy.org'
-    }
-    
-    domain_part = domain.lower()
-    if domain_part in fake_domains:
+    if not isinstance(email, str):
         return False
-    
-    # Domain must have valid TLD (at least 2 characters)
-    domain_parts = domain.split('.')
-    if len(domain_parts) < 2:
-        return False
-    
-    tld = domain_parts[-1]
-    if len(tld) < 2 or not tld.isalpha():
-        return False
-    
-    # Check for consecutive dots or other invalid patterns
-    if '..' in email or email.startswith('.') or email.endswith('.'):
-        return False
-    
-    return True
+    return email_reason(email) == REASON_OK
 
 def clean_email_list(emails: List[str]) -> List[str]:
     """
@@ -89,7 +35,7 @@ def clean_email_list(emails: List[str]) -> List[str]:
     cleaned = []
     for email in emails:
         if isinstance(email, str):
-            email = email.strip().lower()
+            email = normalize_email(email)
             if validate_email(email):
                 cleaned.append(email)
     return list(set(cleaned))  # Remove duplicates
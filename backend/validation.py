@@ -0,0 +1,160 @@
+import re
+import string
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Disposable/test domains that never receive real mail
+BLOCKED_DOMAINS = frozenset({
+    'test.com', 'example.com', 'test.test', 'fake.com', 'invalid.com',
+    'dummy.com', 'sample.com', 'temp.com', 'placeholder.com',
+    'test.org', 'example.org', 'fake.org', 'dummy.org'
+})
+
+EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+_EMAIL_RE = re.compile(EMAIL_PATTERN)
+
+_BLOCKED_DOMAINS_ARRAY = pa.array(sorted(BLOCKED_DOMAINS))
+
+# Only ASCII letters are lowercased: Unicode case mapping can turn a
+# non-ASCII address into a different, valid ASCII one ('İan' -> 'ian')
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+MAX_LOCAL_LENGTH = 64
+MAX_DOMAIN_LENGTH = 255
+
+# Reason codes, in the order the checks are applied
+REASON_OK = "ok"
+REASON_MISSING = "missing"
+REASON_AT_SIGN = "at_sign"
+REASON_LOCAL_LENGTH = "local_length"
+REASON_DOMAIN_LENGTH = "domain_length"
+REASON_DOMAIN_FORMAT = "domain_format"
+REASON_PATTERN = "pattern"
+REASON_BLOCKED_DOMAIN = "blocked_domain"
+REASON_DOTS = "dots"
+REASONS = [
+    REASON_OK, REASON_MISSING, REASON_AT_SIGN, REASON_LOCAL_LENGTH, REASON_DOMAIN_LENGTH,
+    REASON_DOMAIN_FORMAT, REASON_PATTERN, REASON_BLOCKED_DOMAIN, REASON_DOTS
+]
+
+def normalize_email(email: str) -> str:
+    """Strip whitespace and lowercase ASCII letters, as normalize_emails() does"""
+    return email.strip().translate(_ASCII_LOWER)
+
+def email_reason(email) -> str:
+    """
+    Validate one address and return its reason code
+
+    Args:
+        email: Email address (None/NaN count as missing)
+
+    Returns:
+        str: REASON_OK or the first failed check
+    """
+    if email is None or (isinstance(email, float) and np.isnan(email)):
+        return REASON_MISSING
+    # Other non-strings are checked in their text form, as in the vectorized path
+    email = normalize_email(str(email))
+    if not email:
+        return REASON_MISSING
+    if email.count('@') != 1:
+        return REASON_AT_SIGN
+
+    local, domain = email.split('@')
+    if not local or len(local) > MAX_LOCAL_LENGTH:
+        return REASON_LOCAL_LENGTH
+    if not domain or len(domain) > MAX_DOMAIN_LENGTH:
+        return REASON_DOMAIN_LENGTH
+    if '.' not in domain or domain[0] in '.-' or domain[-1] in '.-':
+        return REASON_DOMAIN_FORMAT
+    if not _EMAIL_RE.match(email):
+        return REASON_PATTERN
+    if domain in BLOCKED_DOMAINS:
+        return REASON_BLOCKED_DOMAIN
+    if '..' in email or email.startswith('.') or email.endswith('.'):
+        return REASON_DOTS
+    return REASON_OK
+
+def _to_arrow(emails: Iterable) -> pa.Array:
+    if not isinstance(emails, pd.Series):
+        emails = pd.Series(list(emails), dtype=object)
+    # Zero-copy for Arrow-backed string columns (pandas' default string dtype)
+    return pa.array(emails.astype("string[pyarrow]").array)
+
+def normalize_emails(emails: Iterable) -> pd.Series:
+    """
+    Strip and lowercase (ASCII letters only) addresses as an Arrow-backed string column
+
+    Args:
+        emails: Series (or iterable) of addresses
+
+    Returns:
+        pd.Series: Normalized addresses; missing values stay missing
+    """
+    index = emails.index if isinstance(emails, pd.Series) else None
+    normalized = pc.ascii_lower(pc.utf8_trim_whitespace(_to_arrow(emails)))
+    return pd.Series(pd.arrays.ArrowStringArray(normalized), index=index)
+
+def email_reason_codes(emails: Iterable) -> pd.Series:
+    """
+    Validate a column of addresses with vectorized string kernels
+
+    Every check runs once over the whole column as an Arrow compute kernel
+    (RE2 for the pattern, a hash lookup for blocked domains), so there is
+    no per-row Python overhead. Results match email_reason() row for row.
+
+    Args:
+        emails: Series (or iterable) of addresses
+
+    Returns:
+        pd.Series: Categorical reason code per row, aligned with the input
+    """
+    index = emails.index if isinstance(emails, pd.Series) else None
+    s = pc.ascii_lower(pc.utf8_trim_whitespace(_to_arrow(emails)))
+
+    def flag(values) -> np.ndarray:
+        return np.asarray(pc.fill_null(values, False), dtype=bool)
+
+    length = pc.utf8_length(s)
+    one_at = pc.equal(pc.count_substring(s, '@'), 1)
+    # Give every row exactly one '@' so the split always has a domain part
+    domain = pc.list_element(
+        pc.split_pattern(pc.if_else(one_at, s, pa.scalar("@", s.type)), '@', max_splits=1), 1
+    )
+    domain_len = np.asarray(pc.fill_null(pc.utf8_length(domain), 0), dtype=np.int64)
+    local_len = np.asarray(pc.fill_null(length, 0), dtype=np.int64) - domain_len - 1
+
+    bad_domain = pc.or_(
+        pc.invert(pc.match_substring(domain, '.')),
+        pc.or_(
+            pc.or_(pc.starts_with(domain, '.'), pc.starts_with(domain, '-')),
+            pc.or_(pc.ends_with(domain, '.'), pc.ends_with(domain, '-'))
+        )
+    )
+    dots = pc.or_(pc.match_substring(s, '..'), pc.or_(pc.starts_with(s, '.'), pc.ends_with(s, '.')))
+
+    conditions = [
+        flag(pc.or_kleene(pc.is_null(s), pc.equal(length, 0))),
+        ~flag(one_at),
+        (local_len == 0) | (local_len > MAX_LOCAL_LENGTH),
+        (domain_len == 0) | (domain_len > MAX_DOMAIN_LENGTH),
+        flag(bad_domain),
+        ~flag(pc.match_substring_regex(s, EMAIL_PATTERN)),
+        flag(pc.is_in(domain, value_set=_BLOCKED_DOMAINS_ARRAY)),
+        flag(dots),
+    ]
+    codes = np.select(conditions, np.arange(1, len(conditions) + 1), default=0)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=REASONS), index=index, name="reason")
+
+def valid_email_mask(emails: Iterable) -> pd.Series:
+    """Boolean mask of addresses that pass every check"""
+    return email_reason_codes(emails) == REASON_OK
+
+def summarize_reasons(reasons: pd.Series) -> dict:
+    """Count rejected rows per reason code"""
+    counts = reasons.value_counts()
+    return {reason: int(count) for reason, count in counts.items() if reason != REASON_OK and count}
@@ -0,0 +1,350 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from dotenv import load_dotenv
+from storage import data_path, open_database
+from suppression import get_suppression_list, suppression_events
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Resend signs webhooks with Svix; the endpoint's signing secret (whsec_...).
+# When unset, the webhook endpoint refuses every request.
+RESEND_WEBHOOK_SECRET = os.getenv("RESEND_WEBHOOK_SECRET", "")
+# Reject signed requests whose timestamp is further off than this (seconds)
+WEBHOOK_TOLERANCE = int(os.getenv("WEBHOOK_TOLERANCE", "300"))
+
+# Ingestion configuration (override via .env)
+WEBHOOK_EVENTS_PATH = os.getenv("WEBHOOK_EVENTS_PATH") or data_path("webhook_events.sqlite3")
+WEBHOOK_BUFFER_SIZE = int(os.getenv("WEBHOOK_BUFFER_SIZE", "65536"))
+WEBHOOK_FLUSH_ROWS = int(os.getenv("WEBHOOK_FLUSH_ROWS", "2000"))
+WEBHOOK_FLUSH_INTERVAL = float(os.getenv("WEBHOOK_FLUSH_INTERVAL", "0.25"))
+WEBHOOK_DEDUP_SIZE = int(os.getenv("WEBHOOK_DEDUP_SIZE", "200000"))
+
+class WebhookSignatureError(ValueError):
+    """A webhook request is unsigned, stale or signed with another secret"""
+
+def _secret_key(secret: str) -> bytes:
+    return base64.b64decode(secret[len("whsec_"):] if secret.startswith("whsec_") else secret)
+
+def verify_signature(body: bytes, headers: Mapping[str, str], secret: Optional[str] = None,
+                     tolerance: Optional[int] = None, now: Optional[float] = None) -> None:
+    """
+    Check a Svix webhook signature
+
+    The signed content is "{svix-id}.{svix-timestamp}.{body}", HMAC-SHA256
+    with the base64-decoded part of the secret after "whsec_". The
+    svix-signature header lists one or more space-separated "v1,<base64>"
+    signatures (several during secret rotation).
+
+    Args:
+        body: Raw request body
+        headers: Request headers
+        secret: Endpoint signing secret (default: RESEND_WEBHOOK_SECRET)
+        tolerance: Allowed clock difference in seconds (default: WEBHOOK_TOLERANCE)
+        now: Current time (default: time.time())
+
+    Raises:
+        WebhookSignatureError: If no signature matches
+    """
+    secret = RESEND_WEBHOOK_SECRET if secret is None else secret
+    tolerance = WEBHOOK_TOLERANCE if tolerance is None else tolerance
+    msg_id = headers.get("svix-id")
+    timestamp = headers.get("svix-timestamp")
+    signatures = headers.get("svix-signature")
+    if not (msg_id and timestamp and signatures):
+        raise WebhookSignatureError("Missing webhook signature headers")
+    try:
+        sent_at = int(timestamp)
+    except ValueError:
+        raise WebhookSignatureError("Invalid webhook timestamp") from None
+    if abs((now if now is not None else time.time()) - sent_at) > tolerance:
+        raise WebhookSignatureError("Webhook timestamp is outside the allowed window")
+
+    signed = f"{msg_id}.{timestamp}.".encode("utf-8") + body
+    expected = base64.b64encode(hmac.new(_secret_key(secret), signed, hashlib.sha256).digest()).decode("ascii")
+    for signature in signatures.split():
+        version, _, value = signature.partition(",")
+        if version == "v1" and hmac.compare_digest(value, expected):
+            return
+    raise WebhookSignatureError("Webhook signature does not match")
+
+def sign_payload(body: bytes, msg_id: str, secret: str, timestamp: Optional[int] = None) -> Dict[str, str]:
+    """Svix headers for a body, e.g. to test or load-test the endpoint"""
+    timestamp = str(int(timestamp if timestamp is not None else time.time()))
+    digest = hmac.new(_secret_key(secret), f"{msg_id}.{timestamp}.".encode("utf-8") + body, hashlib.sha256).digest()
+    return {
+        "svix-id": msg_id,
+        "svix-timestamp": timestamp,
+        "svix-signature": "v1," + base64.b64encode(digest).decode("ascii")
+    }
+
+class RingBuffer:
+    """
+    Fixed-capacity FIFO over a preallocated list
+
+    `put` never allocates or blocks; when the buffer is full it refuses the
+    item so the caller can push back (the webhook answers 503 and the
+    sender retries later) instead of silently overwriting older events.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._items: List = [None] * capacity
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, item) -> bool:
+        """Append an item; False if the buffer is full"""
+        with self._lock:
+            if self._size == self.capacity:
+                return False
+            self._items[(self._head + self._size) % self.capacity] = item
+            self._size += 1
+            return True
+
+    def drain(self, limit: int) -> List:
+        """Remove and return up to `limit` of the oldest items"""
+        with self._lock:
+            count = min(limit, self._size)
+            end = self._head + count
+            if end <= self.capacity:
+                items = self._items[self._head:end]
+                self._items[self._head:end] = [None] * count
+            else:
+                wrapped = end - self.capacity
+                items = self._items[self._head:] + self._items[:wrapped]
+                self._items[self._head:] = [None] * (self.capacity - self._head)
+                self._items[:wrapped] = [None] * wrapped
+            self._head = end % self.capacity
+            self._size -= count
+            return items
+
+class RecentIds:
+    """Bounded LRU set of event ids, to drop retried deliveries cheaply"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._ids: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, event_id: str) -> bool:
+        """Remember an id; False if it was already seen"""
+        with self._lock:
+            if event_id in self._ids:
+                self._ids.move_to_end(event_id)
+                return False
+            self._ids[event_id] = None
+            if len(self._ids) > self.capacity:
+                self._ids.popitem(last=False)
+            return True
+
+    def discard(self, event_id: str) -> None:
+        with self._lock:
+            self._ids.pop(event_id, None)
+
+class WebhookIngestor:
+    """
+    Accept webhook events at request speed and persist them in batches
+
+    Requests only verify the signature, drop ids seen recently and push the
+    raw body onto a ring buffer. A background thread drains the buffer
+    every WEBHOOK_FLUSH_INTERVAL seconds (or as soon as WEBHOOK_FLUSH_ROWS
+    events are waiting), writes the batch to SQLite in one transaction and
+    applies bounces, complaints and unsubscribes to the suppression list.
+    Event ids are the table's primary key, so a retry that outlived the
+    in-memory LRU is still stored once. Events acknowledged but not yet
+    flushed are lost if the process dies; close() flushes on shutdown.
+    """
+
+    def __init__(self, path: str = WEBHOOK_EVENTS_PATH, buffer_size: int = WEBHOOK_BUFFER_SIZE,
+                 flush_rows: int = WEBHOOK_FLUSH_ROWS, flush_interval: float = WEBHOOK_FLUSH_INTERVAL,
+                 dedup_size: int = WEBHOOK_DEDUP_SIZE, apply_suppressions: bool = True):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.apply_suppressions = apply_suppressions
+        self._buffer = RingBuffer(buffer_size)
+        self._recent = RecentIds(dedup_size)
+        self._counts = {"received": 0, "duplicates": 0, "rejected": 0, "stored": 0, "suppressed": 0, "flushes": 0}
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._flush_lock = threading.Lock()
+        # A batch whose write failed, retried ahead of newer events, and
+        # (address, reason) pairs from stored events not yet suppressed
+        self._pending: List[Tuple[str, float, bytes]] = []
+        self._unsuppressed: List[Tuple[str, str]] = []
+        self._conn = open_database(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "event_id TEXT PRIMARY KEY, type TEXT, received_at REAL NOT NULL, payload BLOB NOT NULL)"
+        )
+        self._flusher = threading.Thread(target=self._run, name="webhook-flush", daemon=True)
+        self._flusher.start()
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def submit(self, body: bytes, event_id: Optional[str] = None) -> str:
+        """
+        Queue one webhook delivery
+
+        Args:
+            body: Raw request body (parsed when flushed)
+            event_id: Delivery id that stays the same across retries (the
+                svix-id header); defaults to a hash of the body
+
+        Returns:
+            str: "queued", "duplicate", or "full" when the buffer has no
+                room and the sender should retry
+        """
+        event_id = event_id or hashlib.sha256(body).hexdigest()
+        if not self._recent.add(event_id):
+            self._counts["duplicates"] += 1
+            return "duplicate"
+        if not self._buffer.put((event_id, time.time(), body)):
+            # Forget the id, or the sender's retry would be dropped as a duplicate
+            self._recent.discard(event_id)
+            self._counts["rejected"] += 1
+            return "full"
+        self._counts["received"] += 1
+        if len(self._buffer) >= self.flush_rows:
+            self._wake.set()
+        return "queued"
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Webhook flush failed; retrying on the next flush")
+
+    def flush(self) -> int:
+        """
+        Write every buffered event to storage now
+
+        A batch that fails to write is held aside and retried first on the
+        next flush, before anything newer is drained, so events are neither
+        dropped nor reordered. Suppressions are applied after the events are
+        committed and stay queued until they succeed.
+
+        Returns:
+            int: Events newly stored (retries already on disk are skipped)
+
+        Raises:
+            sqlite3.Error: If a batch could not be written (it is kept)
+        """
+        stored = 0
+        with self._flush_lock:
+            try:
+                while self._pending or len(self._buffer):
+                    if not self._pending:
+                        self._pending = self._buffer.drain(self.flush_rows)
+                    rows, payloads = self._decode(self._pending)
+                    with self._transaction():
+                        before = self._conn.total_changes
+                        self._conn.executemany(
+                            "INSERT OR IGNORE INTO events (event_id, type, received_at, payload) "
+                            "VALUES (?, ?, ?, ?)", rows
+                        )
+                        changes = self._conn.total_changes - before
+                    self._pending = []
+                    stored += changes
+                    self._counts["stored"] += changes
+                    self._counts["flushes"] += 1
+                    if self.apply_suppressions:
+                        self._unsuppressed.extend(
+                            pair for payload in payloads for pair in suppression_events(payload)
+                        )
+            finally:
+                if self._unsuppressed:
+                    self._suppress()
+        return stored
+
+    @staticmethod
+    def _decode(batch: List[Tuple[str, float, bytes]]) -> Tuple[List[Tuple], List[Dict]]:
+        rows = []
+        payloads = []
+        for event_id, received_at, body in batch:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = None
+            event_type = payload.get('type') if isinstance(payload, dict) else None
+            rows.append((event_id, event_type, received_at, body))
+            if isinstance(payload, dict):
+                payloads.append(payload)
+        return rows, payloads
+
+    def _suppress(self) -> None:
+        """
+        Apply queued bounces, complaints and unsubscribes, one add per reason
+
+        Pairs leave the queue only once their add succeeded; adds are
+        idempotent, so a retry after a partial failure is safe.
+        """
+        by_reason: Dict[str, List[str]] = {}
+        for address, reason in self._unsuppressed:
+            by_reason.setdefault(reason, []).append(address)
+        for reason, addresses in by_reason.items():
+            self._counts["suppressed"] += get_suppression_list().add(addresses, reason)
+            self._unsuppressed = [pair for pair in self._unsuppressed if pair[1] != reason]
+
+    def stats(self) -> Dict:
+        return {**self._counts, "buffered": len(self._buffer) + len(self._pending),
+                "unsuppressed": len(self._unsuppressed), "path": self.path}
+
+    def close(self) -> None:
+        """Stop the flusher and write whatever is still buffered"""
+        self._closed.set()
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+        self._conn.close()
+
+_webhook_ingestor: Optional[WebhookIngestor] = None
+_webhook_lock = threading.Lock()
+
+def get_webhook_ingestor() -> WebhookIngestor:
+    """Get the shared webhook ingestor"""
+    global _webhook_ingestor
+
+    if _webhook_ingestor is None:
+        with _webhook_lock:
+            if _webhook_ingestor is None:
+                _webhook_ingestor = WebhookIngestor()
+    return _webhook_ingestor
+
+def close_webhook_ingestor() -> None:
+    """Flush and close the shared ingestor (on app shutdown)"""
+    global _webhook_ingestor
+
+    with _webhook_lock:
+        if _webhook_ingestor is not None:
+            _webhook_ingestor.close()
+            _webhook_ingestor = None
@@ -0,0 +1,201 @@
+"""
+Executors that keep blocking work off the API's event loop
+
+CPU-bound work (parsing and validating uploaded files) runs in a process
+pool, so it neither blocks the loop nor competes with it for the GIL.
+Blocking I/O (SQLite, the Resend SDK, file writes) runs in a thread pool.
+Handlers only await the results.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Worker pool sizes (override via .env); WORKER_PROCESSES=0 runs CPU-bound
+# work in the thread pool instead, e.g. where subprocesses are unavailable
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "16"))
+
+T = TypeVar("T")
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the shared process pool, or None when WORKER_PROCESSES is 0"""
+    global _process_pool
+
+    if WORKER_PROCESSES <= 0:
+        return None
+    if _process_pool is None:
+        with _pool_lock:
+            if _process_pool is None:
+                # Forking a process that already runs threads (uvicorn, the
+                # pools, SQLite) is unsafe; spawn clean interpreters instead
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=WORKER_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _process_pool
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """Get the shared thread pool for blocking I/O"""
+    global _thread_pool
+
+    if _thread_pool is None:
+        with _pool_lock:
+            if _thread_pool is None:
+                _thread_pool = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="blastify-io")
+    return _thread_pool
+
+async def run_blocking(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run blocking I/O in the thread pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(), functools.partial(fn, *args, **kwargs))
+
+async def run_cpu_bound(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run CPU-bound work in the process pool and await its result
+
+    `fn` must be a module-level function and its arguments and result must
+    be picklable. Falls back to the thread pool when the process pool is
+    disabled.
+    """
+    pool = get_process_pool()
+    if pool is None:
+        return await run_blocking(fn, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+def call_cpu_bound(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Blocking counterpart of run_cpu_bound for code already running on a
+    worker thread
+
+    Same rules for `fn` and its arguments; runs `fn` in the calling thread
+    when the process pool is disabled.
+    """
+    pool = get_process_pool()
+    if pool is None:
+        return fn(*args, **kwargs)
+    return pool.submit(functools.partial(fn, *args, **kwargs)).result()
+
+def _preload() -> None:
+    import parser  # noqa: F401
+    import snapshots  # noqa: F401
+
+def warm_up() -> None:
+    """Start the worker processes and import the parsing stack in the background (on app startup)"""
+    pool = get_process_pool()
+    if pool is not None:
+        for _ in range(WORKER_PROCESSES):
+            pool.submit(_preload)
+
+def shutdown() -> None:
+    """Stop the pools (on app shutdown)"""
+    global _process_pool, _thread_pool
+
+    with _pool_lock:
+        if _process_pool is not None:
+            # Waiting lets the workers exit cleanly instead of being orphaned
+            _process_pool.shutdown(wait=True, cancel_futures=True)
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+        _thread_pool = None
+
+# Process pool tasks. They receive plain bytes and directory paths rather
+# than open files or shared objects, and return small results: the parsed
+# rows go straight into a snapshot on disk instead of being pickled back.
+
+def parse_to_snapshot(content: bytes, filename: str, sheet: Optional[str],
+                      snapshot_dir: str) -> Tuple[str, int]:
+    """
+    Parse an uploaded file and snapshot its clean rows
+
+    Args:
+        content: File bytes
+        filename: Original file name (its extension picks the parser)
+        sheet: Excel worksheet name (default: first sheet)
+        snapshot_dir: Snapshot store directory
+
+    Returns:
+        Tuple[str, int]: Campaign id and row count
+
+    Raises:
+        ValueError: If the file cannot be parsed or has no valid rows
+    """
+    import parser as file_parser
+    from snapshots import SnapshotStore
+
+    df = file_parser.parse_file(SimpleNamespace(filename=filename, file=BytesIO(content)), sheet=sheet)
+    return SnapshotStore(snapshot_dir).save(df, filename=filename, sheet=sheet), len(df)
+
+def parse_path_to_snapshot(path: str, filename: str, sheet: Optional[str],
+                           snapshot_dir: str) -> Tuple[str, int]:
+    """
+    Parse a finished upload on disk in bounded-memory batches and snapshot
+    its clean rows
+
+    Args:
+        path: File on disk
+        filename: Original file name (its extension picks the parser)
+        sheet: Excel worksheet name (default: first sheet)
+        snapshot_dir: Snapshot store directory
+
+    Returns:
+        Tuple[str, int]: Campaign id and row count
+
+    Raises:
+        ValueError: If the file cannot be parsed or has no valid rows
+    """
+    import parser as file_parser
+    from snapshots import SnapshotStore
+
+    rows = 0
+
+    def counted(chunks):
+        nonlocal rows
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+    with open(path, "rb") as f:
+        upload_file = SimpleNamespace(filename=filename.lower(), file=f)
+        campaign_id = SnapshotStore(snapshot_dir).save_batches(
+            counted(file_parser.iter_parse_file(upload_file, sheet=sheet)), filename=filename, sheet=sheet
+        )
+    return campaign_id, rows
+
+def import_suppressions(content: bytes, filename: str, reason: str, suppression_dir: str) -> Dict:
+    """
+    Add every address in an uploaded file to the suppression list
+
+    Args:
+        content: File bytes
+        filename: Original file name
+        reason: Suppression reason
+        suppression_dir: Suppression list directory
+
+    Returns:
+        Dict: Rows read, addresses added and the list's new stats
+    """
+    import parser as file_parser
+    from suppression import SuppressionList
+
+    suppressions = SuppressionList(suppression_dir)
+    added = 0
+    rows = 0
+    for chunk in file_parser.iter_parse_file(SimpleNamespace(filename=filename, file=BytesIO(content))):
+        rows += len(chunk)
+        added += suppressions.add(chunk['email'], reason)
+    return {"rows": rows, "added": added, "suppression_list": suppressions.stats()}
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark .xlsx ingestion: pd.read_excel vs the streaming readers
+
+Usage: python benchmarks/bench_excel_ingest.py [--rows 200000] [--memory]
+
+The calamine row only appears when python-calamine is installed.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+import numpy as np
+import pandas as pd
+from parser import _calamine_available, clean_rows, iter_parse_file, read_contacts_excel
+
+class UploadFile:
+    def __init__(self, filename, content):
+        self.filename = filename
+        self.file = BytesIO(content)
+
+def make_xlsx(rows: int, seed: int = 0) -> bytes:
+    """Synthetic contact workbook with the extra columns CRMs usually add"""
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, 10_000_000, rows)
+    df = pd.DataFrame({
+        "Email": [f"user{i}@company.io" for i in ids],
+        "Name": [f"User {i}" for i in ids],
+        "Topic": rng.choice(["product launch", "newsletter", "renewal"], rows),
+        "Company": rng.choice(["Tech Corp", "Design Studio"], rows),
+        "Phone": rng.integers(1_000_000, 9_999_999, rows),
+        "Score": rng.random(rows),
+        "Notes": rng.choice(["", "vip", "prefers email over phone calls"], rows),
+    })
+    buffer = BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+def measured(fn, memory: bool):
+    """Run fn, returning (result, seconds, peak Python heap in MB or None)"""
+    if memory:
+        # tracemalloc slows everything down; timings from this pass are not comparable
+        tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result, seconds, peak
+
+def baseline(content: bytes) -> pd.DataFrame:
+    """Ingestion as it was: pandas' openpyxl reader, every column, inferred dtypes"""
+    return clean_rows(pd.read_excel(BytesIO(content))).drop_duplicates(keep='first')
+
+def read_only(content: bytes) -> int:
+    """openpyxl read-only mode, as used by the chunked parser"""
+    return sum(len(chunk) for chunk in iter_parse_file(UploadFile("contacts.xlsx", content), chunk_size=20_000))
+
+def calamine(content: bytes) -> pd.DataFrame:
+    return clean_rows(read_contacts_excel(BytesIO(content))).drop_duplicates(keep='first')
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=200_000)
+    arg_parser.add_argument("--memory", action="store_true", help="also report peak Python heap")
+    args = arg_parser.parse_args()
+
+    content = make_xlsx(args.rows)
+    print(f"input: {args.rows:,} rows, {len(content) / 1e6:.1f} MB")
+
+    readers = [("pd.read_excel", baseline), ("openpyxl read-only (chunked)", read_only)]
+    if _calamine_available():
+        readers.append(("python-calamine", calamine))
+
+    timings = {}
+    for label, fn in readers:
+        result, seconds, peak = measured(lambda: fn(content), args.memory)
+        timings[label] = seconds
+        rows = result if isinstance(result, int) else len(result)
+        line = f"{label}: {seconds:.2f}s ({args.rows / seconds / 1e3:.0f}k rows/s), {rows:,} contacts"
+        print(line + (f", peak Python heap {peak:.0f} MB" if peak is not None else ""))
+
+    for label, seconds in list(timings.items())[1:]:
+        print(f"{label} speedup: {timings['pd.read_excel'] / seconds:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark the upload -> send hand-off: JSON record dicts vs campaign snapshots
+
+Usage: python benchmarks/bench_snapshots.py [--rows 500000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+import numpy as np
+import pandas as pd
+from snapshots import SnapshotStore
+
+def make_contacts(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, 10_000_000, rows)
+    return pd.DataFrame({
+        "email": [f"user{i}@company.io" for i in ids],
+        "name": [f"User {i}" for i in ids],
+        "topic": rng.choice(["product launch", "newsletter", "renewal"], rows),
+        "company": rng.choice(["Tech Corp", "Design Studio", ""], rows),
+        "message": rng.choice(["Hi there, here is what's new this month.", ""], rows),
+    })
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+def json_round_trip(df: pd.DataFrame) -> pd.DataFrame:
+    """What /upload/ + /send-emails/ did: serialize records, ship them, parse them back"""
+    body = json.dumps({"data": df.to_dict('records')})
+    return pd.DataFrame(json.loads(body)["data"])
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=500_000)
+    args = arg_parser.parse_args()
+
+    df = make_contacts(args.rows)
+    store = SnapshotStore(tempfile.mkdtemp(), ttl=0)
+    print(f"input: {args.rows:,} rows")
+
+    _, json_seconds = timed(lambda: json_round_trip(df))
+    campaign_id, save_seconds = timed(lambda: store.save(df))
+    _, load_seconds = timed(lambda: store.load(campaign_id, columns=['email', 'name', 'message']))
+    _, preview_seconds = timed(lambda: store.rows(campaign_id, args.rows // 2, 20))
+    print(f"json records round trip: {json_seconds:.3f}s")
+    print(f"snapshot: save {save_seconds:.3f}s, load for send {load_seconds:.3f}s, "
+          f"preview page {preview_seconds * 1000:.1f}ms "
+          f"({json_seconds / (save_seconds + load_seconds):.1f}x)")
+    print(f"snapshot size: {store.info(campaign_id)['size_bytes'] / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark webhook ingestion throughput with a local load generator
+
+First measures the ingestor in-process: verify + dedup + enqueue per
+event, and batched flushes against one SQLite commit per event. Then
+starts the API with uvicorn in a subprocess and several client processes
+post signed Resend-style events (deliveries, opens, bounces, with a share
+of retried deliveries) as fast as the API acknowledges them. Reports
+acknowledged events per second, latency percentiles, and how long the
+batched writer took to get every unique event into SQLite.
+
+Usage: python benchmarks/bench_webhook_ingest.py [--events 50000] [--clients 2] [--concurrency 16] [--no-http]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'backend'))
+
+from webhook_ingest import WEBHOOK_FLUSH_ROWS, WebhookIngestor, sign_payload, verify_signature  # noqa: E402
+
+SECRET = "whsec_" + base64.b64encode(b"blastify-benchmark-secret").decode("ascii")
+EVENT_TYPES = ["email.delivered", "email.opened", "email.clicked", "email.bounced"]
+
+def make_events(count: int, retry_share: float, seed: int = 7) -> list:
+    """(svix-id, body) pairs; retries repeat an earlier id and body"""
+    rng = np.random.default_rng(seed)
+    events = []
+    for i in range(count):
+        if events and rng.random() < retry_share:
+            events.append(events[int(rng.integers(len(events)))])
+            continue
+        event_type = EVENT_TYPES[i % len(EVENT_TYPES)]
+        data = {"email_id": f"em_{i}", "to": [f"user{i}@company.io"], "subject": "Hello"}
+        if event_type == "email.bounced":
+            data["bounce"] = {"type": "Permanent"}
+        events.append((f"msg_{i}", json.dumps({"type": event_type, "created_at": time.time(), "data": data}).encode()))
+    return events
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError("API did not start")
+
+def bench_in_process(events: list) -> None:
+    signed = [(body, sign_payload(body, msg_id, SECRET)) for msg_id, body in events]
+    # Hold everything in the buffer while enqueueing, then flush in the usual batch size
+    ingestor = WebhookIngestor(os.path.join(tempfile.mkdtemp(), "events.sqlite3"), buffer_size=len(events),
+                               flush_rows=len(events) + 1, flush_interval=3600, dedup_size=len(events),
+                               apply_suppressions=False)
+    started = time.perf_counter()
+    for body, headers in signed:
+        verify_signature(body, headers, SECRET)
+        ingestor.submit(body, headers["svix-id"])
+    submit_seconds = time.perf_counter() - started
+    ingestor.flush_rows = WEBHOOK_FLUSH_ROWS
+    started = time.perf_counter()
+    stored = ingestor.flush()
+    flush_seconds = time.perf_counter() - started
+    ingestor.close()
+    print(f"in-process: verify+enqueue {len(events) / submit_seconds:,.0f} events/s, "
+          f"batched flush {stored / flush_seconds:,.0f} events/s ({stored:,} stored)")
+
+    # One durable commit per event, the write path without a buffer
+    sample = events[:min(len(events), 2000)]
+    conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(), "events.sqlite3"), isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE events (event_id TEXT PRIMARY KEY, type TEXT, received_at REAL, payload BLOB)")
+    started = time.perf_counter()
+    for msg_id, body in sample:
+        conn.execute("INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?)",
+                     (msg_id, json.loads(body)["type"], time.time(), body))
+    per_event = len(sample) / (time.perf_counter() - started)
+    print(f"baseline: one commit per event {per_event:,.0f} events/s")
+
+async def post_all(port: int, events: list, concurrency: int) -> tuple:
+    queue = iter(events)
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        async def sender():
+            for msg_id, body in queue:
+                headers = {"content-type": "application/json", **sign_payload(body, msg_id, SECRET)}
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/webhook/inbound-email/", content=body, headers=headers)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    nonlocal errors
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*(sender() for _ in range(concurrency)))
+    return latencies, errors
+
+def client_process(args) -> tuple:
+    port, events, concurrency = args
+    return asyncio.run(post_all(port, events, concurrency))
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--events", type=int, default=50_000)
+    arg_parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    arg_parser.add_argument("--concurrency", type=int, default=16, help="connections per client process")
+    arg_parser.add_argument("--retries", type=float, default=0.1, help="share of retried deliveries")
+    arg_parser.add_argument("--port", type=int, default=8766)
+    arg_parser.add_argument("--no-http", action="store_true", help="only run the in-process measurements")
+    args = arg_parser.parse_args()
+
+    events = make_events(args.events, args.retries)
+    unique = len({msg_id for msg_id, _ in events})
+    print(f"load: {len(events):,} signed events ({unique:,} unique)")
+    bench_in_process(events)
+    if args.no_http:
+        return
+
+    print(f"http: {args.clients} clients x {args.concurrency} connections")
+    data_dir = tempfile.mkdtemp()
+    env = {**os.environ, "BLASTIFY_DATA_DIR": data_dir, "RESEND_WEBHOOK_SECRET": SECRET, "WORKER_PROCESSES": "0"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.path.join(ROOT, "backend"),
+         "--port", str(args.port), "--log-level", "warning", "--no-access-log"],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(args.port)
+        shares = [(args.port, events[i::args.clients], args.concurrency) for i in range(args.clients)]
+        started = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            results = pool.map(client_process, shares)
+        elapsed = time.perf_counter() - started
+        latencies = np.concatenate([np.array(part) for part, _ in results])
+        errors = sum(e for _, e in results)
+        print(f"acknowledged: {len(latencies):,} in {elapsed:.2f}s = {len(latencies) / elapsed:,.0f} events/s"
+              f" ({errors:,} failed requests)")
+        print(f"latency: p50 {np.percentile(latencies, 50):.1f}ms, p99 {np.percentile(latencies, 99):.1f}ms, "
+              f"max {latencies.max():.1f}ms")
+
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            stats = httpx.get(f"http://127.0.0.1:{args.port}/webhook/events/").json()
+            if stats["stored"] >= unique and not stats["buffered"]:
+                break
+            time.sleep(0.05)
+        drained = time.perf_counter() - started
+        print(f"stored: {stats['stored']:,} unique events in {stats['flushes']} flushes, "
+              f"all on disk {drained - elapsed:.2f}s after the last ack; "
+              f"{stats['duplicates']:,} retries dropped, {stats['rejected']:,} pushed back")
+    finally:
+        server.terminate()
+        server.wait()
+
+    conn = sqlite3.connect(os.path.join(data_dir, "webhook_events.sqlite3"))
+    print(f"events table: {conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]:,} rows")
+
+if __name__ == "__main__":
+    main()
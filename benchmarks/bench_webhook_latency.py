@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark API responsiveness: webhook latency while a large list is uploaded
+
+Starts the API with uvicorn in a subprocess, pings /webhook/inbound-email/
+every few milliseconds, and compares latency when idle against latency
+while /upload/ parses a large CSV.
+
+Usage: python benchmarks/bench_webhook_latency.py [--rows 1000000] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'backend'))
+
+from webhook_ingest import sign_payload  # noqa: E402
+
+SECRET = "whsec_" + base64.b64encode(b"blastify-benchmark-secret").decode("ascii")
+
+def make_csv(rows: int) -> bytes:
+    lines = ["email,name,topic"] + [f"user{i}@company.io,User {i},newsletter" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError("API did not start")
+
+async def ping(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list:
+    """Webhook latencies in milliseconds until `stop` is set"""
+    body = json.dumps({"type": "email.delivered", "data": {"to": ["ann@company.io"]}}).encode("utf-8")
+    latencies = []
+    while not stop.is_set():
+        headers = {"content-type": "application/json", **sign_payload(body, f"msg_{len(latencies)}", SECRET)}
+        started = time.perf_counter()
+        response = await client.post("/webhook/inbound-email/", content=body, headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+def describe(label: str, latencies: list) -> None:
+    values = np.array(latencies)
+    print(f"{label}: n={len(values)}, p50 {np.percentile(values, 50):.1f}ms, "
+          f"p99 {np.percentile(values, 99):.1f}ms, max {values.max():.1f}ms")
+
+async def run(port: int, content: bytes, interval: float) -> None:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=600) as client:
+        stop = asyncio.Event()
+        pinger = asyncio.create_task(ping(client, stop, interval))
+        await asyncio.sleep(2)
+        stop.set()
+        describe("idle", await pinger)
+
+        stop = asyncio.Event()
+        pinger = asyncio.create_task(ping(client, stop, interval))
+        started = time.perf_counter()
+        response = await client.post(
+            "/upload/", files={"file": ("contacts.csv", content)}, data={"include_rows": "false"}
+        )
+        upload_seconds = time.perf_counter() - started
+        stop.set()
+        latencies = await pinger
+        print(f"upload: {response.json().get('rows')} rows in {upload_seconds:.2f}s")
+        describe("during upload", latencies)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--rows", type=int, default=1_000_000)
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--interval", type=float, default=0.01, help="seconds between webhook pings")
+    args = arg_parser.parse_args()
+
+    content = make_csv(args.rows)
+    print(f"input: {args.rows:,} rows, {len(content) / 1e6:.1f} MB")
+
+    env = {**os.environ, "BLASTIFY_DATA_DIR": tempfile.mkdtemp(), "RESEND_WEBHOOK_SECRET": SECRET}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.path.join(ROOT, "backend"),
+         "--port", str(args.port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(args.port)
+        asyncio.run(run(args.port, content, args.interval))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
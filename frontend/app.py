@@ -15,12 +15,21 @@ sys.path.append(parent_dir)
 try:
     from utils import (
         generate_messages_with_gemini,
+        reuse_stored_messages,
+        generate_row_messages,
+        stream_message_with_gemini,
         render_email_html,
         send_email_with_resend,
         validate_api_configuration,
         create_sample_data,
-        estimate_send_time
+        estimate_send_time,
+        load_contact_list
     )
+    # utils puts the backend on the path
+    from contact_index import get_contact_index
+    from gemini_api import CampaignUsage
+    from parser import list_excel_sheets
+    from suppression import get_suppression_list
 except ImportError as e:
     st.error(f"Import error: {e}")
     st.error("Please ensure all dependencies are installed and the utils module is available.")
@@ -119,6 +128,13 @@ def main():
             default=["HTML formatting"]
         )
         
+        generation_mode = st.radio(
+            "Generation mode",
+            ["Per recipient", "Batched recipients", "Per topic (faster)"],
+            help="Batched packs several recipients into each Gemini request. "
+                 "Per topic asks Gemini once for each topic and fills in each recipient's name and company locally"
+        )
+        
         # Sending Settings
         st.subheader("🚀 Sending Options")
         ab_test = st.checkbox("📊 Enable A/B testing")
@@ -147,152 +163,142 @@ def main():
             help="File should contain at least an 'email' column. Optional columns: 'name', 'topic', 'company'"
         )
         
+        # Workbooks with several sheets: let the user pick the contact sheet
+        sheet = None
+        if uploaded_file and uploaded_file.name.endswith('.xlsx'):
+            sheets_key = f"sheets:{uploaded_file.name}:{uploaded_file.size}"
+            if sheets_key not in st.session_state:
+                try:
+                    st.session_state[sheets_key] = list_excel_sheets(BytesIO(uploaded_file.getvalue()))
+                except Exception:
+                    st.session_state[sheets_key] = []
+            sheets = st.session_state[sheets_key]
+            if len(sheets) > 1:
+                sheet = st.selectbox("Worksheet", sheets, help="Sheet that holds the contact list")
+        
         # AI Generation toggle
         use_gemini = st.checkbox(
             "🧠 Auto-generate messages with Gemini AI",
             help="Generate personalized messages using AI based on recipient data"
         )
     
+    # Parse once per upload; reruns are served from the parse cache
+    contacts, parse_stats, parse_error = None, None, None
+    if uploaded_file:
+        try:
+            contacts, parse_stats = load_contact_list(uploaded_file.getvalue(), uploaded_file.name, sheet)
+        except Exception as e:
+            parse_error = str(e)
+    
     with col2:
         st.header("📊 Quick Stats")
-        if uploaded_file:
-            try:
-                # Load and display file info
-                if uploaded_file.name.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file)
-                else:
-                    df = pd.read_excel(uploaded_file)
-                
-                st.metric("Total Contacts", len(df))
-                if 'email' in df.columns:
-                    valid_emails = df['email'].dropna().nunique()
-                    st.metric("Unique Emails", valid_emails)
-                
-                # Time estimate
-                time_est = estimate_send_time(len(df), schedule_delay)
-                st.metric("Estimated Time", time_est["formatted"])
-                
-            except Exception as e:
-                st.error(f"Error reading file: {str(e)}")
+        if parse_stats:
+            st.metric("Total Contacts", parse_stats["total_rows"])
+            st.metric("Unique Emails", parse_stats["unique_emails"])
+            
+            # Time estimate
+            time_est = estimate_send_time(parse_stats["total_rows"], schedule_delay)
+            st.metric("Estimated Time", time_est["formatted"])
+        elif parse_error:
+            st.error(f"Error reading file: {parse_error}")
     
     # Process uploaded file
     if uploaded_file:
         try:
-            # Load data
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
-            
-            # Validate required columns
-            if 'email' not in df.columns:
-                st.error("❌ Missing required 'email' column in the uploaded file.")
+            if parse_error:
+                st.error(f"❌ {parse_error}")
                 st.stop()
-            
-            # Clean and validate data with strict email validation
-            df['email'] = df['email'].astype(str).str.strip().str.lower()
-            
-            # Apply strict email validation - only real emails with '@' symbol
-            def validate_strict_email(email):
-                """Strict email validation - filters out fake/test emails"""
-                if not email or not isinstance(email, str):
-                    return False
-                
-                email = str(email).strip().lower()
-                
-                # Must contain exactly one @ symbol
-                if email.count('@') != 1:
-                    return False
-                
-                # Split into local and domain parts
-                try:
-                    local, domain = email.split('@')
-                except ValueError:
-                    return False
-                
-                # Basic validation
-                if not local or not domain or '.' not in domain:
-                    return False
-                
-                # Reject common fake/test domains
-                fake_domains = {
-                    'test.com', 'example.com', 'test.test', 'fake.com', 'invalid.com',
-                    'dummy.com', 'sample.com', 'temp.com', 'placeholder.com',
-                    'test.org', 'example.org', 'fake.org', 'dummy.org'
-                }
-                
-                if domain in fake_domains:
-                    return False
-                
-                # Domain must have valid TLD
-                domain_parts = domain.split('.')
-                if len(domain_parts) < 2:
-                    return False
-                
-                tld = domain_parts[-1]
-                if len(tld) < 2 or not tld.isalpha():
-                    return False
-                
-                # Pattern validation
-                import re
-                pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-                return bool(re.match(pattern, email))
-            
-            # Count original emails
-            original_count = len(df)
-            
-            # Apply validation
-            valid_emails = df['email'].apply(validate_strict_email)
-            df = df[valid_emails]
+            df = contacts
             
             # Show filtering results
-            filtered_count = original_count - len(df)
-            if filtered_count > 0:
-                st.warning(f"⚠️ Filtered out {filtered_count} invalid/fake email addresses. Only real emails with '@' symbol are accepted.")
-            
-            if df.empty:
-                st.error("❌ No valid email addresses found in the file. Please ensure all emails are real and properly formatted with '@' symbol.")
-                st.stop()
-            
-            # Fill missing columns
-            if 'name' not in df.columns:
-                df['name'] = 'Customer'
-            if 'topic' not in df.columns:
-                df['topic'] = 'our services'
-            if 'message' not in df.columns:
-                df['message'] = ''
-            
-            # Remove duplicates
-            df = df.drop_duplicates(subset=['email'])
+            if parse_stats["filtered"] > 0:
+                breakdown = ", ".join(f"{reason}: {count}" for reason, count in parse_stats["reasons"].items())
+                st.warning(f"⚠️ Filtered out {parse_stats['filtered']} invalid, fake or suppressed email addresses ({breakdown}). Only real emails with '@' symbol are accepted.")
             
             st.success(f"✅ Successfully loaded {len(df)} unique contacts")
             
-            # Generate messages with Gemini if requested
-            if use_gemini and not df['message'].any():
-                with st.spinner("🧠 Generating personalized messages with Gemini AI..."):
-                    try:
-                        messages = generate_messages_with_gemini(df, tone, industry, enhance_options)
-                        df['message'] = messages
-                        st.success("✅ Messages generated successfully!")
-                    except Exception as e:
-                        st.error(f"❌ Error generating messages: {str(e)}")
+            # The working list lives in session state so edits and generated
+            # messages survive reruns; a new upload starts a new list
+            state = st.session_state
+            source_id = f"{uploaded_file.name}:{uploaded_file.size}:{sheet}"
+            if state.get("working_source") != source_id:
+                state["working_source"] = source_id
+                state["working_df"] = df.assign(input_hash='')
+                state["editor_version"] = state.get("editor_version", 0) + 1
+                state["failed_hashes"] = set()
+            
+            # Show the outcome of the generation that triggered this rerun
+            notice = state.pop("generation_notice", None)
+            if notice:
+                if notice["failed"]:
+                    st.warning(f"⚠️ {notice['failed']} messages could not be generated and were left empty. Fill them in before sending.")
+                elif notice["generated"]:
+                    st.success(f"✅ Generated {notice['generated']} messages")
+                if notice["reused"]:
+                    st.info(f"♻️ Reused {notice['reused']} stored messages for unchanged rows")
+                if notice["usage"]:
+                    st.caption(notice["usage"])
             
             # Display and edit data
             st.header("✏️ Review & Edit Your Email List")
             st.info("You can edit the data directly in the table below. Make sure all messages are complete before sending.")
             
             edited_df = st.data_editor(
-                df,
+                state["working_df"],
+                key=f"email_editor_{state['editor_version']}",
                 use_container_width=True,
                 num_rows="dynamic",
                 column_config={
                     "email": st.column_config.TextColumn("Email Address", width="medium"),
                     "name": st.column_config.TextColumn("Name", width="medium"),
                     "topic": st.column_config.TextColumn("Topic", width="medium"),
-                    "message": st.column_config.TextColumn("Message", width="large")
+                    "message": st.column_config.TextColumn("Message", width="large"),
+                    "input_hash": None
                 }
             )
             
+            # Incremental generation: only rows whose prompt inputs changed
+            working, pending = reuse_stored_messages(edited_df, tone, industry, enhance_options)
+            to_generate = []
+            if use_gemini:
+                to_generate = [i for i in pending["missing"] if pending["hashes"][i] not in state["failed_hashes"]]
+                if state.pop("regenerate_stale", False):
+                    to_generate += pending["stale"]
+            
+            notice = {"generated": 0, "failed": 0, "reused": pending["reused"], "usage": None}
+            if to_generate:
+                with st.spinner(f"🧠 Generating {len(to_generate)} personalized messages with Gemini AI..."):
+                    try:
+                        mode = {"Per topic (faster)": "segment", "Batched recipients": "batch"}.get(generation_mode, "row")
+                        usage = CampaignUsage()
+                        working, failed = generate_row_messages(
+                            working, to_generate, pending["hashes"], tone, industry, enhance_options, mode, usage
+                        )
+                        state["failed_hashes"] |= failed
+                        notice.update(generated=len(to_generate) - len(failed), failed=len(failed), usage=(
+                            f"Gemini usage: {usage.prompt_tokens + usage.output_tokens:,} tokens "
+                            f"(~${usage.cost:.4f}) across {usage.requests} requests"
+                        ))
+                    except Exception as e:
+                        st.error(f"❌ Error generating messages: {str(e)}")
+                        to_generate = []
+            
+            if to_generate or pending["reused"]:
+                # Rebuild the editor on top of the updated list
+                state["working_df"] = working
+                state["editor_version"] += 1
+                state["generation_notice"] = notice
+                st.rerun()
+            
+            if pending["stale"] and use_gemini:
+                if st.button(f"🔄 Regenerate {len(pending['stale'])} messages whose details changed"):
+                    state["regenerate_stale"] = True
+                    st.rerun()
+            if state["failed_hashes"] and use_gemini:
+                if st.button("🔁 Retry failed generations"):
+                    state["failed_hashes"] = set()
+                    st.rerun()
+            
             # Email Preview Section
             st.header("📬 Email Previews")
             
@@ -313,9 +319,20 @@ def main():
                     st.write(f"**To:** {row['email']}")
                     st.write(f"**Subject:** {subject}")
                     
+                    # Live preview: stream a fresh Gemini draft token by token
+                    preview_messages = st.session_state.setdefault("preview_messages", {})
+                    if use_gemini and st.button("✨ Live-generate this message with Gemini"):
+                        try:
+                            preview_messages[row['email']] = st.write_stream(
+                                stream_message_with_gemini(row, tone, industry, enhance_options)
+                            )
+                        except Exception as e:
+                            st.error(f"❌ Error streaming message: {str(e)}")
+                    message = preview_messages.get(row['email'], row['message'])
+                    
                     # Render email HTML
                     try:
-                        html_content = render_email_html(row['name'], row['message'])
+                        html_content = render_email_html(row['name'], message)
                         st.components.v1.html(html_content, height=400, scrolling=True)
                     except Exception as e:
                         st.error(f"Error rendering email preview: {str(e)}")
@@ -396,7 +413,25 @@ def send_bulk_emails(df: pd.DataFrame, ab_test: bool, delay: int, sender_name: s
         log_placeholder = st.empty()
         log_messages = []
     
+    contact_index = None
+    admitted_at = None
+    settled = 0  # rows whose frequency cap slot is final (kept on send, released otherwise)
+    
     try:
+        # Skip unsubscribed, bounced and complaining addresses
+        suppressed = get_suppression_list().contains(df['email'])
+        if suppressed.any():
+            st.info(f"🚫 Skipping {int(suppressed.sum())} suppressed recipients (unsubscribed, bounced or complained)")
+            df = df[~suppressed].reset_index(drop=True)
+        
+        # Hold back recipients who already got their quota of campaign emails
+        contact_index = get_contact_index()
+        if contact_index is not None:
+            allowed, admitted_at = contact_index.admit(df['email'])
+            if not allowed.all():
+                st.info(f"⏳ Skipping {int((~allowed).sum())} recipients: {contact_index.cap_message().lower()}")
+                df = df[allowed].reset_index(drop=True)
+        
         total_emails = len(df)
         
         for index, row in df.iterrows():
@@ -435,11 +470,17 @@ def send_bulk_emails(df: pd.DataFrame, ab_test: bool, delay: int, sender_name: s
                 failed_count += 1
                 error_msg = f"❌ {row['email']} - Error: {str(e)}"
                 log_messages.append(error_msg)
-                results.append({
+                result = {
                     'email': row['email'],
                     'status': 'failed',
                     'error': str(e)
-                })
+                }
+                results.append(result)
+            
+            # Unsent recipients get their frequency cap slot back
+            if result['status'] != 'sent' and contact_index is not None:
+                contact_index.release([row['email']], admitted_at)
+            settled = index + 1
             
             # Update metrics
             with metrics_container:
@@ -498,6 +539,9 @@ def send_bulk_emails(df: pd.DataFrame, ab_test: bool, delay: int, sender_name: s
         st.error(f"❌ Critical error during bulk sending: {str(e)}")
     
     finally:
+        # Rows admitted but never attempted (error or rerun mid-campaign) get their slots back
+        if admitted_at is not None and settled < len(df):
+            contact_index.release(df['email'].iloc[settled:], admitted_at)
         progress_bar.progress(1.0)
         status_text.text("✅ Process completed!")
 
@@ -1,11 +1,22 @@
-import httpx
 import resend
 import os
+import sys
 import pandas as pd
 from jinja2 import Environment, FileSystemLoader
 from dotenv import load_dotenv
-from typing import List, Dict, Optional
-import time
+from functools import lru_cache
+from typing import Iterator, List, Dict, Optional, Set, Tuple
+
+# Share backend modules (pooled Gemini client, generation scheduler) with the Streamlit app
+backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import gemini_api
+from message_store import get_message_store, row_input_hashes
+from parse_cache import get_parse_cache
+from parser import NO_VALID_EMAILS, clean_rows, read_contacts
+from validation import REASON_OK, email_reason_codes, normalize_emails, summarize_reasons
 
 load_dotenv()
 
@@ -32,7 +43,61 @@ def get_industry_prompt(industry: str) -> str:
     }
     return templates.get(industry, templates["Generic"])
 
-def generate_messages_with_gemini(df: pd.DataFrame, tone: str, industry: str, enhance_options: List[str]) -> List[str]:
+def build_gemini_prompt(row: pd.Series, tone: str, industry: str, enhance_options: List[str]) -> gemini_api.Prompt:
+    """
+    Build the personalized Gemini prompt for one contact
+    
+    The campaign-wide instructions form the preamble, which the backend
+    sends once as a system instruction or cached context; only the
+    contact-specific request changes from row to row.
+    
+    Args:
+        row: Contact row
+        tone: Email tone (formal, friendly, urgent, promotional)
+        industry: Industry context
+        enhance_options: List of enhancement options
+        
+    Returns:
+        gemini_api.Prompt: Shared preamble plus the contact-specific request
+    """
+    name = row.get('name', 'Customer')
+    topic = row.get('topic', 'our latest offerings')
+    company = row.get('company', '')
+    
+    return gemini_api.Prompt(
+        build_gemini_preamble(tone, industry, tuple(enhance_options or [])),
+        f"Write a marketing email for {name} at {company if company else 'their company'} about {topic}."
+    )
+
+@lru_cache(maxsize=64)
+def build_gemini_preamble(tone: str, industry: str, enhance_options: Tuple[str, ...]) -> str:
+    """Instructions shared by every contact of a campaign"""
+    context = get_industry_prompt(industry)
+    
+    preamble = f"""
+    You write {tone.lower()} marketing emails.
+    Context: {context}.
+    
+    Requirements:
+    - Keep it concise and engaging (under 250 words)
+    - Personalize for the contact named in the request
+    - Make it professional yet approachable
+    - Focus on value proposition
+    """
+    
+    if "Emojis" in enhance_options:
+        preamble += "\n- Include relevant emojis to make it more engaging"
+    if "Call to Action" in enhance_options:
+        preamble += "\n- Include a clear and compelling call-to-action"
+    if "HTML formatting" in enhance_options:
+        preamble += "\n- Use HTML formatting with <p>, <strong>, <em> tags for better structure"
+    else:
+        preamble += "\n- Use plain text format"
+    
+    return preamble
+
+def generate_messages_with_gemini(df: pd.DataFrame, tone: str, industry: str, enhance_options: List[str],
+                                  mode: str = "row", usage: Optional[gemini_api.CampaignUsage] = None) -> List[str]:
     """
     Generate personalized email messages using Gemini AI
     
@@ -41,64 +106,132 @@ def generate_messages_with_gemini(df: pd.DataFrame, tone: str, industry: str, en
         tone: Email tone (formal, friendly, urgent, promotional)
         industry: Industry context
         enhance_options: List of enhancement options
+        mode: "row" for one call per contact, "segment" for one call per topic,
+            "batch" for several contacts per call
+        usage: Optional tracker for token, cost and failure totals
         
     Returns:
-        List[str]: Generated email messages
+        List[str]: Generated email messages ("" where generation failed)
+        
+    Raises:
+        GeminiError: If the Gemini API key is not configured
     """
     if not GEMINI_KEY:
-        return ["Error: Gemini API key not configured"] * len(df)
+        raise gemini_api.GeminiError("Gemini API key not configured")
     
-    messages = []
-    context = get_industry_prompt(industry)
+    if mode == "segment":
+        # One template per topic, personalized locally with name/company
+        return gemini_api.generate_segment_messages(df, tone, industry, enhance_options, usage=usage)
+    if mode == "batch":
+        # Several contacts per request, answered as a JSON array
+        return gemini_api.generate_batch_messages(df, tone, industry, enhance_options, usage=usage)
     
-    for index, row in df.iterrows():
-        email = row.get('email', '')
-        name = row.get('name', 'Customer')
-        topic = row.get('topic', 'our latest offerings')
-        company = row.get('company', '')
-        
-        # Build personalized prompt
-        prompt = f"""
-        Write a {tone.lower()} marketing email for {name} at {company if company else 'their company'} about {topic}.
-        Context: {context}.
+    # Rows are generated concurrently through the backend scheduler
+    prompts = (build_gemini_prompt(row, tone, industry, enhance_options) for _, row in df.iterrows())
+    return gemini_api.generate_texts(prompts, usage)
+
+def reuse_stored_messages(df: pd.DataFrame, tone: str, industry: str,
+                          enhance_options: List[str]) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Fill rows from the message store and find rows that need generation
+    
+    The 'input_hash' column records the prompt inputs each message was
+    written for. Rows whose hash still matches keep their message (and any
+    hand edits are saved to the store); empty rows and rows whose inputs
+    changed reuse a stored message for their new inputs when one exists.
+    
+    Args:
+        df: Contact rows as returned by the editor
+        tone: Email tone
+        industry: Industry context
+        enhance_options: List of enhancement options
         
-        Requirements:
-        - Keep it concise and engaging (under 250 words)
-        - Personalize for {name}
-        - Make it professional yet approachable
-        - Focus on value proposition
-        """
+    Returns:
+        Tuple[pd.DataFrame, Dict]: Updated rows, and a dict with 'hashes',
+        'reused' (count), 'missing' (empty rows) and 'stale' (rows whose
+        inputs changed since their message was generated)
+    """
+    df = df.copy()
+    if 'input_hash' not in df.columns:
+        df['input_hash'] = ''
+    df['input_hash'] = df['input_hash'].fillna('').astype(str)
+    df['message'] = df['message'].fillna('').astype(str) if 'message' in df.columns else ''
+    
+    store = get_message_store()
+    hashes = row_input_hashes(df, tone, industry, enhance_options)
+    has_message = df['message'].str.strip() != ''
+    current = has_message & (df['input_hash'] == hashes)
+    stale = has_message & (df['input_hash'] != '') & (df['input_hash'] != hashes)
+    candidates = ~has_message | stale
+    
+    stored = store.get_many(hashes[current | candidates])
+    # Persist hand edits of messages whose inputs are unchanged
+    store.set_many({
+        h: m for h, m in zip(hashes[current], df.loc[current, 'message']) if stored.get(h) != m
+    })
+    
+    reused = [i for i in df.index[candidates] if hashes[i] in stored]
+    df.loc[reused, 'message'] = [stored[hashes[i]] for i in reused]
+    df.loc[reused, 'input_hash'] = hashes[reused]
+    
+    reused_set = set(reused)
+    return df, {
+        "hashes": hashes,
+        "reused": len(reused),
+        "missing": [i for i in df.index[~has_message] if i not in reused_set],
+        "stale": [i for i in df.index[stale] if i not in reused_set]
+    }
+
+def generate_row_messages(df: pd.DataFrame, rows: List, hashes: pd.Series, tone: str, industry: str,
+                          enhance_options: List[str], mode: str = "row",
+                          usage: Optional[gemini_api.CampaignUsage] = None) -> Tuple[pd.DataFrame, Set[str]]:
+    """
+    Generate messages for selected rows only and save them to the message store
+    
+    Args:
+        df: Contact rows
+        rows: Index labels of the rows to (re)generate
+        hashes: Row input hashes from reuse_stored_messages
+        tone: Email tone
+        industry: Industry context
+        enhance_options: List of enhancement options
+        mode: Generation mode ("row", "segment" or "batch")
+        usage: Optional tracker for token, cost and failure totals
         
-        if "Emojis" in enhance_options:
-            prompt += "\n- Include relevant emojis to make it more engaging"
-        if "Call to Action" in enhance_options:
-            prompt += "\n- Include a clear and compelling call-to-action"
-        if "HTML formatting" in enhance_options:
-            prompt += "\n- Use HTML formatting with <p>, <strong>, <em> tags for better structure"
+    Returns:
+        Tuple[pd.DataFrame, Set[str]]: Updated rows and the input hashes
+        whose generation failed
+    """
+    df = df.copy()
+    messages = generate_messages_with_gemini(df.loc[rows], tone, industry, enhance_options, mode, usage)
+    
+    failed = set()
+    generated = {}
+    for label, message in zip(rows, messages):
+        if message:
+            df.at[label, 'message'] = message
+            df.at[label, 'input_hash'] = hashes[label]
+            generated[hashes[label]] = message
         else:
-            prompt += "\n- Use plain text format"
-        
-        try:
-            response = httpx.post(
-                f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={GEMINI_KEY}",
-                headers={"Content-Type": "application/json"},
-                json={"contents": [{"parts": [{"text": prompt}]}]},
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                content = response.json()['candidates'][0]['content']['parts'][0]['text']
-                messages.append(content.strip())
-            else:
-                messages.append(f"Error generating message for {name}: HTTP {response.status_code}")
-                
-        except Exception as e:
-            messages.append(f"Error generating message for {name}: {str(e)}")
-        
-        # Small delay to respect API limits
-        time.sleep(0.5)
+            failed.add(hashes[label])
+    get_message_store().set_many(generated)
+    return df, failed
+
+def stream_message_with_gemini(row: pd.Series, tone: str, industry: str, enhance_options: List[str]) -> Iterator[str]:
+    """
+    Stream one personalized message from Gemini as it is generated
     
-    return messages
+    Args:
+        row: Contact row
+        tone: Email tone
+        industry: Industry context
+        enhance_options: List of enhancement options
+        
+    Returns:
+        Iterator[str]: Text chunks, suitable for st.write_stream
+    """
+    prompt = build_gemini_prompt(row, tone, industry, enhance_options)
+    return gemini_api.stream_text_chunks_sync(prompt)
 
 def render_email_html(name: str, message: str, template_name: str = "base_template.html") -> str:
     """
@@ -398,73 +531,14 @@ def validate_email_list(df: pd.DataFrame) -> Dict:
         results["valid"] = False
         results["errors"].append("Missing required 'email' column")
     
-    # Strict email validation
+    # Strict email validation (shared vectorized engine)
     if 'email' in df.columns:
-        def validate_single_email(email):
-            """Strict email validation function"""
-            if not email or not isinstance(email, str):
-                return False
-            
-            email = str(email).strip().lower()
-            
-            # Must contain exactly one @ symbol
-            if email.count('@') != 1:
-                return False
-            
-            # Split into local and domain parts
-            try:
-                local, domain = email.split('@')
-            except ValueError:
-                return False
-            
-            # Local part validation (before @)
-            if not local or len(local) > 64:
-                return False
-            
-            # Domain part validation (after @)
-            if not domain or len(domain) > 255:
-                return False
-            
-            # Domain must contain at least one dot
-            if '.' not in domain:
-                return False
-            
-            # Domain must not start or end with dot or hyphen
-            if domain.startswith('.') or domain.endswith('.') or domain.startswith('-') or domain.endswith('-'):
-                return False
-            
-            # Reject common fake/test domains
-            fake_domains = {
-                'test.com', 'example.com', 'test.test', 'fake.com', 'invalid.com',
-                'dummy.com', 'sample.com', 'temp.com', 'placeholder.com',
-                'test.org', 'example.org', 'fake.org', 'dummy.org'
-            }
-            
-            if domain in fake_domains:
-                return False
-            
-            # Domain must have valid TLD (at least 2 characters)
-            domain_parts = domain.split('.')
-            if len(domain_parts) < 2:
-                return False
-            
-            tld = domain_parts[-1]
-            if len(tld) < 2 or not tld.isalpha():
-                return False
-            
-            # Check for consecutive dots or other invalid patterns
-            if '..' in email or email.startswith('.') or email.endswith('.'):
-                return False
-            
-            import re
-            pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            return bool(re.match(pattern, email))
-        
-        valid_emails = df['email'].apply(validate_single_email)
-        invalid_count = (~valid_emails).sum()
+        reasons = email_reason_codes(df['email'])
+        invalid_count = int((reasons != REASON_OK).sum())
         
         if invalid_count > 0:
-            results["warnings"].append(f"{invalid_count} invalid or fake email addresses found and will be filtered out")
+            breakdown = ", ".join(f"{reason}: {count}" for reason, count in summarize_reasons(reasons).items())
+            results["warnings"].append(f"{invalid_count} invalid or fake email addresses found and will be filtered out ({breakdown})")
     
     # Statistics
     results["stats"] = {
@@ -476,3 +550,53 @@ def validate_email_list(df: pd.DataFrame) -> Dict:
     }
     
     return results
+
+def _parse_contact_list(content: bytes, filename: str, sheet: Optional[str]) -> Tuple[pd.DataFrame, Dict]:
+    df = read_contacts(content, filename, sheet)
+    if 'email' not in df.columns:
+        raise ValueError("Missing required 'email' column in the uploaded file.")
+    
+    stats = {"total_rows": len(df), "unique_emails": int(df['email'].dropna().nunique())}
+    stats["reasons"] = summarize_reasons(email_reason_codes(normalize_emails(df['email'].astype(str))))
+    
+    # Validate, drop suppressed addresses and fill optional columns exactly as the API does
+    df = clean_rows(df)
+    stats["filtered"] = stats["total_rows"] - len(df)
+    suppressed = stats["filtered"] - sum(stats["reasons"].values())
+    if suppressed:
+        stats["reasons"]["suppressed"] = suppressed
+    
+    if df.empty:
+        raise ValueError(NO_VALID_EMAILS)
+    
+    df = df.drop_duplicates(keep='first')
+    return df, stats
+
+def load_contact_list(content: bytes, filename: str, sheet: Optional[str] = None) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Parse, validate and deduplicate an uploaded contact list, with caching
+    
+    Results are cached by a hash of the file bytes plus the parse options,
+    so Streamlit reruns on an unchanged upload cost a hash and a lookup.
+    
+    Args:
+        content: Uploaded file bytes
+        filename: Original file name (selects the reader)
+        sheet: Excel worksheet name (default: first sheet)
+        
+    Returns:
+        Tuple[pd.DataFrame, Dict]: Cleaned contacts and parse stats
+            (total_rows, unique_emails, filtered, reasons)
+        
+    Raises:
+        ValueError: If the email column is missing or no address is valid
+    """
+    cache = get_parse_cache()
+    key = cache.make_key(content, reader=os.path.splitext(filename)[1].lower(), sheet=sheet)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    
+    df, stats = _parse_contact_list(content, filename, sheet)
+    cache.set(key, df, stats)
+    return df.copy(deep=False), stats
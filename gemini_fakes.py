@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Shared test helpers for running Gemini generation against a fake transport
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import httpx
+import gemini_api
+import gemini_client
+import prompt_cache
+import quota
+
+@contextmanager
+def patched(*replacements):
+    """
+    Set module attributes for the duration of a with-block
+
+    Args:
+        replacements: (object, attribute name, value) triples; the old values
+            are restored in reverse order on exit
+    """
+    originals = [(target, name, getattr(target, name)) for target, name, _ in replacements]
+    for target, name, value in replacements:
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for target, name, value in reversed(originals):
+            setattr(target, name, value)
+
+@contextmanager
+def fake_gemini(handler, *replacements):
+    """
+    Route Gemini requests to `handler` with an API key set, the prompt cache
+    off and a fresh, unlimited quota limiter
+
+    Args:
+        handler: A MockTransport handler, or an httpx transport (e.g. an
+            ASGITransport for the stub server)
+        replacements: Extra (object, attribute name, value) triples to patch
+    """
+    transport = handler if isinstance(handler, httpx.AsyncBaseTransport) else httpx.MockTransport(handler)
+    with patched(
+        (gemini_api, "GEMINI_API_KEY", "test-key"),
+        (prompt_cache, "GEMINI_CACHE_ENABLED", False),
+        (quota, "_limiter", quota.QuotaLimiter(rpm=0, tpm=0)),
+        (gemini_client, "get_async_client", lambda: httpx.AsyncClient(transport=transport)),
+        *replacements
+    ):
+        yield
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming (chunked) contact file parser
+"""
+
+import sys
+import os
+from io import BytesIO
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+import pytest
+
+from parser import (ARROW_STRING, iter_parse_file, list_excel_sheets, parse_file, read_contacts_csv,
+                    read_contacts_excel)
+
+class UploadFile:
+    """Minimal stand-in for FastAPI's UploadFile"""
+    def __init__(self, filename, content):
+        self.filename = filename
+        self.file = BytesIO(content)
+
+def _contacts_csv() -> bytes:
+    rows = ["Email,Name,Topic"]
+    for i in range(250):
+        # Repeat rows across chunk boundaries and mix in invalid addresses
+        rows.append(f" User{i % 90}@Company.io ,User {i % 90},Topic {i % 90}")
+        if i % 7 == 0:
+            rows.append(f"broken-{i},Nobody,None")
+        if i % 11 == 0:
+            rows.append(f"someone{i}@example.com,Blocked,None")
+    return ("\n".join(rows) + "\n").encode("utf-8")
+
+def test_chunked_csv_matches_parse_file():
+    content = _contacts_csv()
+    expected = parse_file(UploadFile("contacts.csv", content))
+    chunks = list(iter_parse_file(UploadFile("contacts.csv", content), chunk_size=32))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 32 for chunk in chunks)
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+    print("✅ Chunked CSV parse matches parse_file")
+
+def test_chunked_excel_matches_parse_file():
+    frame = pd.read_csv(BytesIO(_contacts_csv()))
+    buffer = BytesIO()
+    frame.to_excel(buffer, index=False)
+    content = buffer.getvalue()
+
+    expected = parse_file(UploadFile("contacts.xlsx", content))
+    chunks = list(iter_parse_file(UploadFile("contacts.xlsx", content), chunk_size=40))
+
+    assert len(chunks) > 1
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+    assert (read_contacts_excel(BytesIO(content)).dtypes == ARROW_STRING).all()
+    print("✅ Read-only Excel parse matches parse_file")
+
+def test_csv_reads_known_columns_as_strings():
+    content = b"Email,Phone,Name,Company,Notes\nada@lovelace.io,555-0100,007,,first\n"
+    df = parse_file(UploadFile("contacts.csv", content))
+
+    assert list(df.columns) == ['email', 'name', 'company', 'topic', 'message']
+    assert isinstance(df['name'].array, pd.arrays.ArrowStringArray)
+    assert (df.dtypes[['name', 'company']] == ARROW_STRING).all()
+    assert df['name'].iloc[0] == "007"
+    assert pd.isna(df['company'].iloc[0])
+    print("✅ CSV ingestion keeps only known columns as Arrow strings")
+
+def test_csv_multiline_values_across_blocks():
+    """Quoted values spanning lines parse in files larger than one Arrow block"""
+    rows = ["email,name,message"]
+    for i in range(30000):
+        rows.append(f'user{i}@company.io,User {i},"Hi User {i},\nthanks for signing up.\nSee you soon"')
+    content = ("\n".join(rows) + "\n").encode("utf-8")
+    assert len(content) > 1 << 20
+
+    df = read_contacts_csv(BytesIO(content))
+    assert len(df) == 30000
+    assert df['message'].iloc[-1] == "Hi User 29999,\nthanks for signing up.\nSee you soon"
+    chunks = list(iter_parse_file(UploadFile("contacts.csv", content), chunk_size=7000))
+    assert sum(len(chunk) for chunk in chunks) == 30000
+    pd.testing.assert_frame_equal(pd.concat(chunks), parse_file(UploadFile("contacts.csv", content)))
+    print("✅ Multi-line quoted values parse across blocks")
+
+def test_excel_sheet_selection():
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        pd.DataFrame({"Notes": ["cover sheet"]}).to_excel(writer, sheet_name="Readme", index=False)
+        pd.DataFrame({"Email": ["ada@lovelace.io", "grace@navy.mil"], "Name": ["Ada", 7]}).to_excel(
+            writer, sheet_name="Contacts", index=False
+        )
+        pd.DataFrame({"Email": []}).to_excel(writer, sheet_name="Empty", index=False)
+    content = buffer.getvalue()
+
+    assert list_excel_sheets(BytesIO(content)) == ["Readme", "Contacts", "Empty"]
+    for sheet in ("Contacts", 1):
+        df = parse_file(UploadFile("contacts.xlsx", content), sheet=sheet)
+        assert df['email'].tolist() == ["ada@lovelace.io", "grace@navy.mil"]
+        assert df['name'].tolist() == ["Ada", "7"]
+    chunks = list(iter_parse_file(UploadFile("contacts.xlsx", content), chunk_size=1, sheet="Contacts"))
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+
+    with pytest.raises(ValueError, match="Missing required 'email' column"):
+        parse_file(UploadFile("contacts.xlsx", content))
+    with pytest.raises(ValueError, match="No valid email addresses"):
+        parse_file(UploadFile("contacts.xlsx", content), sheet="Empty")
+    with pytest.raises(ValueError, match="Worksheet 'Leads' not found"):
+        parse_file(UploadFile("contacts.xlsx", content), sheet="Leads")
+    print("✅ Excel worksheets can be listed and selected")
+
+def test_chunked_parse_errors():
+    with pytest.raises(ValueError, match="No valid email addresses"):
+        list(iter_parse_file(UploadFile("contacts.csv", b"email\nbroken\n"), chunk_size=10))
+    with pytest.raises(ValueError, match="Missing required 'email' column"):
+        list(iter_parse_file(UploadFile("contacts.csv", b"name\nAda\n"), chunk_size=10))
+    with pytest.raises(ValueError, match="Unsupported file type"):
+        list(iter_parse_file(UploadFile("contacts.txt", b"email\n"), chunk_size=10))
+    print("✅ Chunked parse reports the same errors")
+
+if __name__ == "__main__":
+    test_chunked_csv_matches_parse_file()
+    test_chunked_excel_matches_parse_file()
+    test_csv_reads_known_columns_as_strings()
+    test_csv_multiline_values_across_blocks()
+    test_excel_sheet_selection()
+    test_chunked_parse_errors()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for the cross-campaign contact index and frequency cap
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+import contact_index
+import email_sender
+import pipeline
+from contact_index import ContactIndex
+
+def make_index(max_sends=2, window_days=7):
+    return ContactIndex(os.path.join(tempfile.mkdtemp(), "contacts.sqlite3"), max_sends, window_days)
+
+def test_cap_applies_within_and_across_batches():
+    """Repeats in one batch and earlier campaigns both use up an address's slots"""
+    index = make_index(max_sends=2)
+
+    allowed, _ = index.admit(["ann@mail.com", "ANN@mail.com ", "ann@mail.com", "bob@mail.com", None])
+    assert allowed.tolist() == [True, True, False, True, False]
+
+    allowed, _ = index.admit(pd.Series(["bob@mail.com", "ann@mail.com", "cat@mail.com"]))
+    assert allowed.tolist() == [True, False, True]
+    assert index.recent_sends(["ann@mail.com", "bob@mail.com", "dan@mail.com"]).tolist() == [2, 2, 0]
+
+    # A second connection to the same file sees the same history
+    reopened = ContactIndex(index.path, 2, 7)
+    assert reopened.admit(["cat@mail.com", "cat@mail.com"])[0].tolist() == [True, False]
+    assert reopened.stats()["contacts"] == 3
+    print("✅ Frequency cap holds within and across batches")
+
+def test_release_and_window():
+    """Failed sends give their slot back; sends outside the window do not count"""
+    index = make_index(max_sends=1)
+    allowed, admitted_at = index.admit(["ann@mail.com", "bob@mail.com"])
+    assert allowed.all()
+    index.release(["bob@mail.com"], admitted_at)
+    assert index.admit(["ann@mail.com", "bob@mail.com"])[0].tolist() == [False, True]
+
+    last = index.last_sent(["ann@mail.com", "eve@mail.com"])
+    assert last.iloc[0] >= admitted_at and pd.isna(last.iloc[1])
+
+    # Released sends roll back the last send time too
+    history = make_index(max_sends=3)
+    _, first = history.admit(["ann@mail.com"])
+    _, second = history.admit(["ann@mail.com", "ann@mail.com", "bob@mail.com"])
+    history.release(["ann@mail.com", "bob@mail.com"], second)
+    assert history.last_sent(["ann@mail.com"]).iloc[0] == second, "ann still has one send at that time"
+    history.release(["ann@mail.com"], second)
+    last = history.last_sent(["ann@mail.com", "bob@mail.com"])
+    assert last.iloc[0] == first and pd.isna(last.iloc[1])
+
+    expired = make_index(max_sends=1, window_days=0)
+    assert expired.admit(["ann@mail.com"])[0].all()
+    assert expired.admit(["ann@mail.com"])[0].all(), "a zero-day window never caps"
+    print("✅ Released and expired sends free up slots")
+
+def test_senders_report_capped_rows():
+    """send_bulk_emails and the pipeline skip capped rows and release failed ones"""
+    index = make_index(max_sends=1)
+    index.admit(["bob@mail.com"])
+    sent = []
+
+    def fake_send(email_data):
+        if email_data["to"][0] == "cat@mail.com":
+            raise RuntimeError("mailbox unavailable")
+        sent.append(email_data["to"][0])
+        return {"id": "x"}
+
+    original = (contact_index._contact_index, contact_index.FREQUENCY_CAP_MAX)
+    original_send = email_sender.resend.Emails.send
+    original_key = email_sender.resend.api_key
+    contact_index._contact_index, contact_index.FREQUENCY_CAP_MAX = index, 1
+    email_sender.resend.Emails.send = fake_send
+    email_sender.resend.api_key = "re_test"
+    try:
+        summary = email_sender.send_bulk_emails({"emails": [
+            {"email": "ann@mail.com", "message": "Hi"},
+            {"email": "bob@mail.com", "message": "Hi"},
+            {"email": "cat@mail.com", "message": "Hi"}
+        ]}, delay_seconds=0)
+        assert summary["summary"]["sent"] == 1
+        assert summary["summary"]["capped"] == 1
+        assert summary["summary"]["failed"] == 1
+        assert summary["results"][1]["error"] == "Frequency cap reached (1 per 7 days)"
+
+        rows = pd.DataFrame({"email": ["ann@mail.com", "dan@mail.com", "cat@mail.com"], "message": ["Hi"] * 3})
+        result = asyncio.run(pipeline.CampaignPipeline(rows).run())
+        assert result["summary"]["sent"] == 1
+        assert result["summary"]["capped"] == 1
+        assert result["summary"]["failed"] == 1
+    finally:
+        contact_index._contact_index, contact_index.FREQUENCY_CAP_MAX = original
+        email_sender.resend.Emails.send = original_send
+        email_sender.resend.api_key = original_key
+
+    assert sent == ["ann@mail.com", "dan@mail.com"]
+    assert index.recent_sends(["cat@mail.com"]).tolist() == [0], "failed sends are released"
+    print("✅ Capped recipients are reported and failed sends released")
+
+if __name__ == "__main__":
+    test_cap_applies_within_and_across_batches()
+    test_release_and_window()
+    test_senders_report_capped_rows()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test script for shared prompt preambles against the local Gemini stand-in server
+"""
+
+import sys
+import os
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import httpx
+import pandas as pd
+import context_cache
+import gemini_api
+import gemini_stub
+from gemini_fakes import fake_gemini
+from quota import CampaignUsage
+
+def _run_against_stub(preamble_mode, min_cache_tokens=0, context=None):
+    """Generate three messages through the stub and return (messages, requests, usage)"""
+    gemini_stub.app.state.requests = []
+    gemini_stub.app.state.cached_contents = {}
+    with fake_gemini(httpx.ASGITransport(app=gemini_stub.app),
+                     (gemini_api, "GEMINI_PREAMBLE_MODE", preamble_mode),
+                     (context_cache, "_context_cache", context or context_cache.ContextCache()),
+                     (gemini_stub, "GEMINI_STUB_MIN_CACHE_TOKENS", min_cache_tokens)):
+        df = pd.DataFrame({
+            "email": ["ann@mail.com", "bob@mail.com", "cy@mail.com"],
+            "name": ["Ann", "Bob", "Cy"],
+            "topic": ["launch", "launch", "webinar"]
+        })
+        usage = CampaignUsage()
+        messages = gemini_api.generate_messages(df, usage=usage)
+    return messages, gemini_stub.app.state.requests, usage
+
+def test_system_instruction_carries_preamble():
+    """Per-row requests only carry the recipient delta"""
+    messages, requests, usage = _run_against_stub("system")
+    preamble = gemini_api.build_preamble()
+
+    assert messages[0].startswith("Stub email: Write a marketing email for Ann")
+    for request in requests:
+        assert request["body"]["systemInstruction"]["parts"][0]["text"] == preamble
+        assert preamble not in request["body"]["contents"][0]["parts"][0]["text"]
+    assert usage.requests == 3 and usage.prompt_tokens > 0
+    print(f"✅ {len(requests)} requests with a system instruction")
+
+def test_cached_context_uploaded_once():
+    """The preamble is uploaded once and referenced by every request"""
+    messages, requests, usage = _run_against_stub("cached")
+
+    assert len(gemini_stub.app.state.cached_contents) == 1
+    name = next(iter(gemini_stub.app.state.cached_contents))
+    assert all(r["body"]["cachedContent"] == name for r in requests)
+    assert all("systemInstruction" not in r["body"] for r in requests)
+    assert usage.cached_tokens > 0
+    assert all(messages)
+    print(f"✅ Cached context {name} reused by {len(requests)} requests")
+
+def test_rejected_cache_falls_back_to_system_instruction():
+    """A preamble too small to cache is sent as a system instruction instead"""
+    messages, requests, usage = _run_against_stub("cached", min_cache_tokens=100000)
+
+    assert not gemini_stub.app.state.cached_contents
+    assert all("systemInstruction" in r["body"] for r in requests)
+    assert all(messages)
+    print("✅ Fell back to system instructions")
+
+def test_transient_upload_failures_are_retried():
+    """Rate limits and unreadable replies delay the upload; only permanent refusals stick"""
+    context = context_cache.ContextCache()
+    key = ("gemini-pro", "preamble")
+
+    assert context._store(key, httpx.Response(429, headers={"Retry-After": "0"})) is None
+    assert context._lookup(key) == (None, True), "retried once Retry-After has passed"
+    assert context._store(key, httpx.Response(200, content=b"<html>")) is None
+    assert context._lookup(key) == (None, False), "backs off without a Retry-After"
+
+    context._retry_at.clear()
+    assert context._store(key, httpx.Response(200, json={"name": "cachedContents/abc"})) == "cachedContents/abc"
+    assert context._lookup(key) == ("cachedContents/abc", False)
+
+    assert context._store(("gemini-pro", "tiny"), httpx.Response(400)) is None
+    assert context._lookup(("gemini-pro", "tiny")) == (None, False)
+    assert ("gemini-pro", "tiny") in context._rejected
+    print("✅ Transient context upload failures are retried")
+
+def test_failed_upload_waits_before_retrying():
+    """A network error during the upload is not retried until UPLOAD_RETRY_DELAY has passed"""
+    import asyncio
+    import gemini_client
+    from gemini_fakes import patched
+    from routing import ModelRoute
+
+    uploads = []
+
+    def unreachable(request):
+        uploads.append(request)
+        raise httpx.ConnectTimeout("timed out", request=request)
+
+    transport = httpx.MockTransport(unreachable)
+    context = context_cache.ContextCache()
+    route = ModelRoute("gemini-pro", "http://gemini.test/v1beta")
+    with patched((gemini_client, "get_client", lambda: httpx.Client(transport=transport)),
+                 (gemini_client, "get_async_client", lambda: httpx.AsyncClient(transport=transport))):
+        assert context.get(route, "preamble", "key") is None
+        assert asyncio.run(context.get_async(route, "preamble", "key")) is None
+        assert context.get(route, "preamble", "key") is None
+        assert len(uploads) == 1, "no new upload while backing off"
+
+        context._retry_at = {key: 0 for key in context._retry_at}
+        assert asyncio.run(context.get_async(route, "preamble", "key")) is None
+        assert len(uploads) == 2, "retried once the delay has passed"
+    print("✅ Failed context uploads back off")
+
+def test_expired_context_is_dropped_and_retried():
+    """A cached context gone on the server is forgotten and the request resent with the full preamble"""
+    context = context_cache.ContextCache()
+    _run_against_stub("cached", context=context)
+    # The stub starts every run without cached contents, as if they expired
+    messages, requests, usage = _run_against_stub("cached", context=context)
+
+    live = gemini_stub.app.state.cached_contents
+    stale = [r for r in requests if r["body"].get("cachedContent") and r["body"]["cachedContent"] not in live]
+    resent = [r for r in requests if "systemInstruction" in r["body"]]
+    assert all(messages) and not usage.errors
+    assert stale and len(resent) == len(stale), "each 404 is retried once with the preamble"
+    assert len(live) <= 1 and len(requests) - len(stale) - len(resent) == 3 - len(stale), \
+        "later requests use a freshly uploaded context"
+    print(f"✅ {len(stale)} requests recovered from an expired context")
+
+def test_expired_context_is_retried_when_streaming():
+    """Streamed generation recovers from a missing cached context the same way"""
+    context = context_cache.ContextCache()
+    _run_against_stub("cached", context=context)
+    gemini_stub.app.state.cached_contents = {}
+    gemini_stub.app.state.requests = []
+    prompt = gemini_api.build_prompt(pd.Series({"name": "Ann", "email": "ann@mail.com"}))
+    with fake_gemini(httpx.ASGITransport(app=gemini_stub.app),
+                     (gemini_api, "GEMINI_PREAMBLE_MODE", "cached"),
+                     (context_cache, "_context_cache", context)):
+        text = "".join(gemini_api.stream_text_chunks_sync(prompt))
+
+    requests = gemini_stub.app.state.requests
+    assert text.startswith("Stub email: Write a marketing email for Ann")
+    assert len(requests) == 2 and "cachedContent" in requests[0]["body"] and "systemInstruction" in requests[1]["body"]
+    print("✅ Stream resent with the full preamble")
+
+if __name__ == "__main__":
+    test_system_instruction_carries_preamble()
+    test_cached_context_uploaded_once()
+    test_rejected_cache_falls_back_to_system_instruction()
+    test_transient_upload_failures_are_retried()
+    test_failed_upload_waits_before_retrying()
+    test_expired_context_is_dropped_and_retried()
+    test_expired_context_is_retried_when_streaming()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Test script for background generation jobs and their partial results
+"""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import httpx
+import pandas as pd
+import snapshots
+from gemini_fakes import fake_gemini, patched
+from generation_jobs import JOB_CANCELLED, JOB_DONE, GenerationJobs
+
+NAMES = ["Ann", "Bob", "Cy", "Dee", "Eve"]
+
+def with_mock_gemini(test):
+    """Run a test against a snapshot store in a temp dir and a fake Gemini where Ann is slow"""
+    async def handler(request):
+        prompt = request.read().decode()
+        name = next(n for n in NAMES if f"for {n}" in prompt)
+        await asyncio.sleep(0.5 if name == "Ann" else 0.01)
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": f"Hi {name}"}]}}]})
+
+    def run():
+        with fake_gemini(handler, (snapshots, "_snapshot_store", snapshots.SnapshotStore(tempfile.mkdtemp()))):
+            test()
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+def save_contacts() -> str:
+    df = pd.DataFrame({
+        "email": [f"{n.lower()}@mail.com" for n in NAMES],
+        "name": NAMES,
+        "message": [""] * len(NAMES)
+    })
+    return snapshots.get_snapshot_store().save(df, filename="contacts.csv")
+
+@with_mock_gemini
+def test_partial_results_before_completion():
+    """Fast rows can be read while a slow one is still generating"""
+    campaign_id = save_contacts()
+
+    async def run():
+        jobs = GenerationJobs()
+        job = await jobs.start(campaign_id)
+        assert await jobs.start(campaign_id) is job, "a running job is reused"
+        table = snapshots.get_snapshot_store().open(campaign_id)
+
+        await asyncio.sleep(0.2)
+        early, cursor = job.page(table, limit=2)
+        assert not job.finished and cursor is not None
+        seen = early.to_pylist()
+        while cursor is not None:
+            await asyncio.sleep(0.05)
+            rows, cursor = job.page(table, cursor, limit=2)
+            seen += rows.to_pylist()
+        return job, early.to_pylist(), seen
+
+    job, early, seen = asyncio.run(run())
+    assert [r["name"] for r in early] and "Ann" not in [r["name"] for r in early]
+    assert sorted(r["row"] for r in seen) == list(range(len(NAMES)))
+    assert all(r["message"] == f"Hi {r['name']}" for r in seen)
+    assert seen[-1]["name"] == "Ann"
+
+    assert job.state == JOB_DONE and job.status()["completed"] == len(NAMES)
+    result = snapshots.get_snapshot_store().load(job.result_campaign_id)
+    assert result["message"].tolist() == [f"Hi {n}" for n in NAMES]
+    assert snapshots.get_snapshot_store().info(job.result_campaign_id)["source_campaign_id"] == campaign_id
+    print(f"✅ {len(early)} rows readable early, {len(seen)} in total")
+
+@with_mock_gemini
+def test_cancel_keeps_generated_rows():
+    """Cancelling stops the job and keeps what was generated"""
+    campaign_id = save_contacts()
+
+    async def run():
+        jobs = GenerationJobs()
+        await jobs.start(campaign_id)
+        await asyncio.sleep(0.2)
+        job = await jobs.cancel(campaign_id)
+        rows, cursor = job.page(snapshots.get_snapshot_store().open(campaign_id))
+        return job, rows, cursor
+
+    job, rows, cursor = asyncio.run(run())
+    assert job.state == JOB_CANCELLED and job.result_campaign_id is None
+    assert cursor is None and 0 < rows.num_rows < len(NAMES)
+    try:
+        GenerationJobs().get(campaign_id)
+        assert False, "jobs are per registry"
+    except KeyError:
+        pass
+    print(f"✅ Cancelled after {rows.num_rows} rows")
+
+@with_mock_gemini
+def test_upload_returns_before_generation():
+    """/upload/ answers with the job status instead of waiting for every message"""
+    import generation_jobs
+    import main
+
+    class UploadFile:
+        filename = "contacts.csv"
+        def __init__(self, content):
+            from io import BytesIO
+            self.file = BytesIO(content)
+
+    content = ("email,name\n" + "".join(f"{n.lower()}@mail.com,{n}\n" for n in NAMES)).encode("utf-8")
+
+    async def run():
+        original_jobs = generation_jobs._generation_jobs
+        generation_jobs._generation_jobs = GenerationJobs()
+        try:
+            response = await main.upload_file(
+                UploadFile(content), generate_from_gemini=True, generation_mode="row", sheet_name="",
+                include_rows=False, response_format="json", page_size=0
+            )
+            body = json.loads(response.body)
+            assert body["generation"]["status"] == "running"
+            assert body["send_campaign_id"] is None, "the list is sent from the job's result"
+            await generation_jobs.get_generation_jobs().get(body["campaign_id"])._task
+            page = await main.generated_messages(body["campaign_id"], cursor="", limit=100, format="json")
+            return json.loads(page.body)
+        finally:
+            await generation_jobs._generation_jobs.aclose()
+            generation_jobs._generation_jobs = original_jobs
+
+    original_processes = main.workers.WORKER_PROCESSES
+    main.workers.WORKER_PROCESSES = 0
+    try:
+        page = asyncio.run(run())
+    finally:
+        main.workers.WORKER_PROCESSES = original_processes
+        main.workers.shutdown()
+    assert page["next_cursor"] is None and len(page["data"]) == len(NAMES)
+    assert page["generation"]["status"] == "done"
+    print("✅ Upload returned while generation ran in the background")
+
+@with_mock_gemini
+def test_send_uses_generated_snapshot():
+    """Sending the uploaded campaign waits for its job, then sends the generated messages"""
+    import email_sender
+    import generation_jobs
+    import main
+    from types import SimpleNamespace
+
+    campaign_id = save_contacts()
+    sent = {}
+
+    def fake_send(email_data):
+        sent[email_data["to"][0]] = email_data["html"]
+        return {"id": "x"}
+
+    async def run():
+        jobs = generation_jobs.get_generation_jobs()
+        job = await jobs.start(campaign_id)
+        pending = await main.send_bulk_emails({"campaign_id": campaign_id})
+        await job._task
+        done = await main.send_bulk_emails({"campaign_id": campaign_id})
+        return pending, json.loads(done.body), job.result_campaign_id
+
+    with patched(
+        (generation_jobs, "_generation_jobs", GenerationJobs()),
+        (email_sender.resend.Emails, "send", fake_send),
+        (email_sender.resend, "api_key", "re_test"),
+        (email_sender, "time", SimpleNamespace(sleep=lambda seconds: None))
+    ):
+        pending, done, result_campaign_id = asyncio.run(run())
+
+    assert pending.status_code == 409 and "result_campaign_id" in json.loads(pending.body)["error"]
+    assert done["summary"]["sent"] == len(NAMES), done
+    assert all(f"Hi {n}" in sent[f"{n.lower()}@mail.com"] for n in NAMES)
+    other_id = save_contacts()
+    assert asyncio.run(GenerationJobs().send_campaign_id(other_id)) == other_id, "lists without a job send as they are"
+    print(f"✅ {campaign_id} was sent from {result_campaign_id}")
+
+@with_mock_gemini
+def test_send_after_job_is_pruned():
+    """A finished job that was forgotten still sends from its result snapshot"""
+    campaign_id = save_contacts()
+
+    async def run():
+        jobs = GenerationJobs(ttl=1)
+        job = await jobs.start(campaign_id)
+        await job._task
+        job.finished_at -= 2
+        jobs._prune()
+        return jobs, job, await jobs.send_campaign_id(campaign_id)
+
+    jobs, job, send_id = asyncio.run(run())
+    try:
+        jobs.get(campaign_id)
+        assert False, "the job was pruned"
+    except KeyError:
+        pass
+    assert send_id == job.result_campaign_id
+    assert snapshots.get_snapshot_store().info(campaign_id)["result_campaign_id"] == send_id
+    assert snapshots.get_snapshot_store().load(send_id)["message"].tolist() == [f"Hi {n}" for n in NAMES]
+    print(f"✅ Pruned job still resolves {campaign_id} to {send_id}")
+
+if __name__ == "__main__":
+    test_partial_results_before_completion()
+    test_cancel_keeps_generated_rows()
+    test_upload_returns_before_generation()
+    test_send_uses_generated_snapshot()
+    test_send_after_job_is_pruned()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-row message store used by incremental regeneration
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+from message_store import MessageStore, row_input_hashes
+
+def test_row_hash_tracks_prompt_inputs():
+    """Only changes to prompt inputs or settings change a row's hash"""
+    df = pd.DataFrame({
+        "email": ["ann@mail.com", "bob@mail.com"],
+        "name": ["Ann", "Bob"],
+        "topic": ["launch", None],
+        "message": ["draft", ""]
+    })
+    hashes = row_input_hashes(df, "friendly", "Generic", ["Emojis"])
+
+    edited = df.copy()
+    edited.loc[0, "message"] = "edited draft"
+    edited.loc[1, "topic"] = "webinar"
+    changed = row_input_hashes(edited, "friendly", "Generic", ["Emojis"])
+
+    assert changed[0] == hashes[0], "message edits are not prompt inputs"
+    assert changed[1] != hashes[1]
+    assert row_input_hashes(df, "formal", "Generic", ["Emojis"])[0] != hashes[0]
+    print("✅ Hashes follow prompt inputs")
+
+def test_store_round_trip_across_instances():
+    """Stored messages survive reopening the store"""
+    path = os.path.join(tempfile.mkdtemp(), "messages.sqlite3")
+    store = MessageStore(path)
+    store.set_many({"h1": "Hello Ann", "h2": ""})
+    store.close()
+
+    reopened = MessageStore(path)
+    assert reopened.get_many(["h1", "h2", "h3"]) == {"h1": "Hello Ann"}
+    print("✅ Messages persisted")
+
+if __name__ == "__main__":
+    test_row_hash_tracks_prompt_inputs()
+    test_store_round_trip_across_instances()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test script for the parsed contact list cache used by the Streamlit app
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+from parse_cache import ParseCache
+
+def _contacts() -> pd.DataFrame:
+    return pd.DataFrame({"email": ["ann@mail.com", "bob@mail.com"], "name": ["Ann", "Bob"]})
+
+def test_key_covers_content_and_options():
+    """Same bytes and options share a key; anything else does not"""
+    key = ParseCache.make_key(b"email\nann@mail.com\n", reader=".csv", sheet=None)
+
+    assert key == ParseCache.make_key(b"email\nann@mail.com\n", sheet=None, reader=".csv")
+    assert key != ParseCache.make_key(b"email\nbob@mail.com\n", reader=".csv", sheet=None)
+    assert key != ParseCache.make_key(b"email\nann@mail.com\n", reader=".xlsx", sheet=None)
+    assert key != ParseCache.make_key(b"email\nann@mail.com\n", reader=".csv", sheet="Leads")
+    print("✅ Keys cover file bytes and parse options")
+
+def test_memory_hits_are_isolated_from_callers():
+    """Callers can modify what they get back without touching the cache"""
+    cache = ParseCache(max_entries=1)
+    cache.set("a", _contacts(), {"total_rows": 2})
+
+    df, stats = cache.get("a")
+    df["message"] = "edited"
+    df.loc[0, "name"] = "Changed"
+    stats["total_rows"] = 0
+
+    again, stats = cache.get("a")
+    assert "message" not in again.columns
+    assert again["name"].tolist() == ["Ann", "Bob"]
+    assert stats == {"total_rows": 2}
+
+    cache.set("b", _contacts(), {})
+    assert cache.get("a") is None, "least recently used entry is evicted"
+    assert cache.stats()["hits"] == 2
+    print("✅ Memory cache returns isolated copies and evicts LRU entries")
+
+def test_persisted_entries_survive_new_sessions():
+    """With persistence on, a fresh cache loads earlier parses from disk"""
+    directory = tempfile.mkdtemp()
+    ParseCache(persist=True, directory=directory).set("a", _contacts(), {"filtered": 1, "reasons": {"dots": 1}})
+
+    cache = ParseCache(persist=True, directory=directory)
+    df, stats = cache.get("a")
+    pd.testing.assert_frame_equal(df, _contacts())
+    assert stats == {"filtered": 1, "reasons": {"dots": 1}}
+    assert cache.stats()["disk_hits"] == 1
+
+    expired = ParseCache(persist=True, directory=directory, ttl=1)
+    os.utime(os.path.join(directory, "a.json"), (0, 0))
+    assert expired.get("a") is None
+    assert ParseCache(persist=False, directory=directory).get("a") is None
+    print("✅ Disk entries are reused across sessions until they expire")
+
+if __name__ == "__main__":
+    test_key_covers_content_and_options()
+    test_memory_hits_are_isolated_from_callers()
+    test_persisted_entries_survive_new_sessions()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the generate -> render -> send campaign pipeline
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import numpy as np
+import pandas as pd
+import contact_index
+import email_sender
+import gemini_api
+import pipeline
+from contact_index import ContactIndex
+from gemini_fakes import patched
+
+def test_sending_starts_before_generation_finishes():
+    """The first email is sent while later messages are still generating"""
+    events = []
+
+    async def fake_stream(prompts):
+        for index, _ in enumerate(prompts):
+            await asyncio.sleep(0.05)
+            events.append(("generated", index))
+            yield index, f"Message {index}", None
+
+    def fake_send(to_email, subject, html_content, attachment=None):
+        events.append(("sent", to_email))
+        return {"email": to_email, "status": "sent", "id": "x", "subject": subject}
+
+    original_stream = gemini_api.stream_texts_async
+    original_send = email_sender.send_rendered_email
+    gemini_api.stream_texts_async = fake_stream
+    email_sender.send_rendered_email = fake_send
+    try:
+        df = pd.DataFrame({
+            "email": [f"user{i}@mail.com" for i in range(4)],
+            "name": [f"User {i}" for i in range(4)],
+            "message": ["", "", "", ""]
+        })
+        summary = asyncio.run(pipeline.CampaignPipeline(df, generate=True, queue_size=1).run())
+    finally:
+        gemini_api.stream_texts_async = original_stream
+        email_sender.send_rendered_email = original_send
+
+    assert summary["summary"]["sent"] == 4
+    first_send = events.index(next(e for e in events if e[0] == "sent"))
+    last_generated = events.index(("generated", 3))
+    assert first_send < last_generated
+    print(f"✅ Event order: {events}")
+
+def test_generation_failure_returns_partial_results():
+    """Rows generated before a failure are sent; the rest fail and give back their cap slots"""
+    sent = []
+
+    async def failing_stream(prompts):
+        next(iter(prompts))
+        yield 0, "Message 0", None
+        raise gemini_api.GeminiError("Gemini API key not configured")
+
+    def fake_send(to_email, subject, html_content, attachment=None):
+        sent.append(to_email)
+        return {"email": to_email, "status": "sent", "id": "x", "subject": subject}
+
+    emails = ["ann@mail.com", "bob@mail.com", "cy@mail.com", "dee@mail.com"]
+    index = ContactIndex(os.path.join(tempfile.mkdtemp(), "contacts.sqlite3"), max_sends=1)
+    with patched((gemini_api, "stream_texts_async", failing_stream),
+                 (email_sender, "send_rendered_email", fake_send),
+                 (contact_index, "_contact_index", index),
+                 (contact_index, "FREQUENCY_CAP_MAX", 1)):
+        df = pd.DataFrame({"email": emails, "name": ["Ann", "Bob", "Cy", "Dee"], "message": ["Hi", "", "", ""]})
+        result = asyncio.run(pipeline.CampaignPipeline(df, generate=True).run())
+
+    assert result["status"] == "failed" and "not configured" in result["error"]
+    assert sorted(sent) == ["ann@mail.com", "bob@mail.com"]
+    assert result["summary"]["sent"] == 2 and result["summary"]["failed"] == 2
+    assert index.recent_sends(emails).tolist() == [1, 1, 0, 0], "unsent rows give back their slots"
+    print(f"✅ Partial result: {result['summary']}")
+
+def test_delay_spaces_sends_across_workers():
+    """delay_seconds paces the whole campaign, not each send worker"""
+    sent_at = []
+
+    def fake_send(to_email, subject, html_content, attachment=None):
+        sent_at.append(time.monotonic())
+        return {"email": to_email, "status": "sent", "id": "x", "subject": subject}
+
+    with patched((email_sender, "send_rendered_email", fake_send)):
+        df = pd.DataFrame({"email": [f"user{i}@mail.com" for i in range(4)], "message": ["Hi"] * 4})
+        asyncio.run(pipeline.CampaignPipeline(df, {"delay_seconds": 0.05}, send_workers=3).run())
+
+    gaps = np.diff(sorted(sent_at))
+    assert len(sent_at) == 4 and gaps.min() >= 0.045
+    print(f"✅ Send gaps: {[round(g, 3) for g in gaps]}")
+
+if __name__ == "__main__":
+    test_sending_starts_before_generation_finishes()
+    test_generation_failure_returns_partial_results()
+    test_delay_spaces_sends_across_workers()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent Gemini prompt cache
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from prompt_cache import PromptCache
+
+def make_cache(**kwargs) -> PromptCache:
+    """Create a cache in a throwaway directory"""
+    path = os.path.join(tempfile.mkdtemp(), "cache.sqlite3")
+    return PromptCache(path=path, **kwargs)
+
+def test_hits_misses_and_normalization():
+    """Whitespace-only prompt differences share one entry"""
+    cache = make_cache()
+    key = cache.make_key("Write  an email\n for Ann", "gemini-pro")
+
+    assert cache.get(key) is None
+    cache.set(key, "Hello Ann")
+    assert cache.get(cache.make_key("Write an email for Ann", "gemini-pro")) == "Hello Ann"
+    assert cache.get(cache.make_key("Write an email for Ann", "other-model")) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    print(f"✅ Stats: {stats}")
+
+def test_ttl_and_eviction():
+    """Expired entries miss and the least recently used entries are evicted"""
+    expired = make_cache(ttl=0.001)
+    expired.set("k", "v")
+    time.sleep(0.01)
+    assert expired.get("k") is None
+
+    cache = make_cache(max_entries=2)
+    cache.set("a", "1")
+    time.sleep(0.01)
+    cache.set("b", "2")
+    time.sleep(0.01)
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+def test_single_flight():
+    """Concurrent identical prompts result in one generation call"""
+    cache = make_cache()
+    calls = []
+
+    async def generate(prompt):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return f"reply to {prompt}", "gemini-pro"
+
+    async def run():
+        return await asyncio.gather(*[
+            cache.get_or_generate_async("same prompt", "gemini-pro", generate) for _ in range(5)
+        ])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert results == ["reply to same prompt"] * 5
+    assert cache.stats()["coalesced"] == 4
+
+def test_cancelled_leader_hands_over():
+    """Cancelling the caller that is generating doesn't cancel the ones waiting on it"""
+    cache = make_cache()
+    calls = []
+
+    async def generate(prompt):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return f"reply to {prompt}", "gemini-pro"
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_generate_async("same prompt", "gemini-pro", generate))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_generate_async("same prompt", "gemini-pro", generate))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        try:
+            await leader
+            assert False, "the leader is cancelled"
+        except asyncio.CancelledError:
+            pass
+        return await waiter
+
+    assert asyncio.run(run()) == "reply to same prompt"
+    assert len(calls) == 2, "the waiter generates once the leader is gone"
+    assert cache.stats()["entries"] == 1
+
+def test_async_lookups_leave_the_loop():
+    """The async path runs its SQLite reads and writes on worker threads"""
+    cache = make_cache()
+    threads = []
+    for name in ("get", "set"):
+        method = getattr(cache, name)
+
+        def recorded(*args, method=method):
+            threads.append(threading.current_thread())
+            return method(*args)
+        setattr(cache, name, recorded)
+
+    async def generate(prompt):
+        return "hello", "gemini-pro"
+
+    assert asyncio.run(cache.get_or_generate_async("prompt", "gemini-pro", generate)) == "hello"
+    assert asyncio.run(cache.get_or_generate_async("prompt", "gemini-pro", generate)) == "hello"
+    assert len(threads) == 3 and threading.main_thread() not in threads
+    assert cache.stats()["hits"] == 1
+
+def test_errors_are_not_cached():
+    """Failed generations propagate and leave the cache empty"""
+    cache = make_cache()
+
+    def failing(prompt):
+        raise RuntimeError("HTTP 500")
+
+    try:
+        cache.get_or_generate("prompt", "gemini-pro", failing)
+        assert False, "expected failure"
+    except RuntimeError:
+        pass
+    assert cache.stats()["entries"] == 0
+
+if __name__ == "__main__":
+    test_hits_misses_and_normalization()
+    test_ttl_and_eviction()
+    test_single_flight()
+    test_cancelled_leader_hands_over()
+    test_async_lookups_leave_the_loop()
+    test_errors_are_not_cached()
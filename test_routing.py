@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test script for Gemini retries, circuit breaking and model routing
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import httpx
+import gemini_api
+import prompt_cache
+import quota
+import routing
+from gemini_fakes import fake_gemini
+from prompt_cache import PromptCache
+from routing import CircuitBreaker, HedgePolicy, ModelRouter
+
+def _generate(handler, router, hedge_policy=None):
+    """Run generate_text_async against a mock transport and a fresh router"""
+    with fake_gemini(handler,
+                     (routing, "_router", router),
+                     (routing, "_hedge_policy", hedge_policy or HedgePolicy(enabled=False)),
+                     (routing, "GEMINI_RETRY_BASE_DELAY", 0.01)):
+        return asyncio.run(gemini_api.generate_text_async("Say hi"))
+
+def _ok(text):
+    return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+def test_retries_server_errors():
+    """503s are retried with backoff until the request succeeds"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        return _ok("Hello")
+
+    assert _generate(handler, ModelRouter(["primary-model"])) == "Hello"
+    assert len(calls) == 3
+    print(f"✅ Succeeded after {len(calls)} attempts")
+
+def test_circuit_opens_and_fails_fast():
+    """After repeated failures the circuit opens and requests stop reaching the API"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    router = ModelRouter(["primary-model"])
+    router.primary.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    try:
+        _generate(handler, router)
+        assert False, "expected GeminiError"
+    except gemini_api.GeminiError as e:
+        assert "circuit open" in str(e)
+    assert len(calls) == 2
+    assert router.primary.breaker.state == "open"
+    print("✅ Circuit opened after 2 failures")
+
+def test_half_open_trial_closes_circuit():
+    """A successful trial after the reset timeout closes the circuit"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow(), "only one trial at a time"
+    breaker.record_success()
+    assert breaker.state == "closed"
+    print("✅ Half-open trial closed the circuit")
+
+def test_slow_primary_routes_to_fallback():
+    """Requests go to the fallback model while the primary's p95 is over the SLO"""
+    models = []
+
+    def handler(request):
+        models.append(request.url.path.rsplit("/", 1)[-1].split(":")[0])
+        return _ok("Hi")
+
+    router = ModelRouter(["slow-model", "fast-model"], latency_slo=1.0, probe_rate=0)
+    for _ in range(routing.MIN_LATENCY_SAMPLES):
+        router.primary.record_latency(5.0)
+    _generate(handler, router)
+    assert models == ["fast-model"]
+    print(f"✅ Routed to {models[0]}")
+
+def test_slow_primary_wins_traffic_back():
+    """Probes keep measuring a slow primary and old samples age out"""
+    router = ModelRouter(["slow-model", "fast-model"], latency_slo=1.0, probe_rate=1.0)
+    router.primary.latency_window = 0.1
+    for _ in range(routing.MIN_LATENCY_SAMPLES):
+        router.primary.record_latency(5.0)
+    assert router.select() is router.primary, "a probe still reaches the slow primary"
+    router.probe_rate = 0
+    assert router.select().model == "fast-model"
+    assert router.preferred().model == "fast-model"
+
+    time.sleep(0.15)
+    assert router.primary.percentile(0.95) is None
+    assert router.select() is router.primary, "routing returns once the slow samples expire"
+    print("✅ Primary won traffic back")
+
+def test_fallback_answers_are_cached_under_fallback():
+    """A response from the fallback model is never served as the primary's"""
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.path)
+        return _ok("Hi")
+
+    router = ModelRouter(["primary-model", "fallback-model"])
+    router.primary.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    router.primary.breaker.record_failure()
+    cache = PromptCache(path=os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+    with fake_gemini(handler, (prompt_cache, "GEMINI_CACHE_ENABLED", True), (prompt_cache, "_cache", cache),
+                     (routing, "_router", router), (routing, "_hedge_policy", HedgePolicy(enabled=False))):
+        assert asyncio.run(gemini_api.generate_text_async("Say hi")) == "Hi"
+        assert asyncio.run(gemini_api.generate_text_async("Say hi")) == "Hi"
+        assert len(calls) == 1, "the fallback's answer is reused while it serves traffic"
+
+        router.primary.breaker.record_success()
+        assert asyncio.run(gemini_api.generate_text_async("Say hi")) == "Hi"
+
+    assert len(calls) == 2 and "primary-model" in calls[1], "the primary's cache entry was empty"
+    assert cache.get(cache.make_key("Say hi", "fallback-model")) == "Hi"
+    assert cache.get(cache.make_key("Say hi", "primary-model")) == "Hi"
+    print("✅ Cache entries are keyed by the model that answered")
+
+def _slow_first_handler(calls):
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1.0)
+            return _ok("Original")
+        return _ok("Hedge")
+    return handler
+
+def _warm_router(latency):
+    router = ModelRouter(["primary-model"])
+    for _ in range(routing.MIN_LATENCY_SAMPLES):
+        router.primary.record_latency(latency)
+    return router
+
+def test_hedge_answers_slow_request():
+    """A request slower than p95 is duplicated and the faster answer wins"""
+    calls = []
+    policy = HedgePolicy(enabled=True, budget=1.0)
+    text = _generate(_slow_first_handler(calls), _warm_router(0.05), policy)
+    assert text == "Hedge"
+    assert len(calls) == 2
+    assert policy.status()["hedge_wins"] == 1
+    print(f"✅ Hedge won: {policy.status()}")
+
+def test_hedge_loser_settles_its_reservation():
+    """The cancelled attempt is charged its prompt only, not the full output estimate"""
+    calls = []
+    limiter = quota.QuotaLimiter(rpm=0, tpm=0)
+    with fake_gemini(_slow_first_handler(calls),
+                     (routing, "_router", _warm_router(0.05)),
+                     (routing, "_hedge_policy", HedgePolicy(enabled=True, budget=1.0)),
+                     (quota, "_limiter", limiter)):
+        assert asyncio.run(gemini_api.generate_text_async("Say hi")) == "Hedge"
+
+    prompt_tokens = quota.estimate_tokens("Say hi")
+    assert len(calls) == 2
+    assert limiter.status()["tokens_last_minute"] == 2 * prompt_tokens + quota.ESTIMATED_OUTPUT_TOKENS
+    print(f"✅ Hedge loser settled: {limiter.status()}")
+
+def test_hedge_budget_caps_extra_requests():
+    """No hedge is sent when the budget is exhausted"""
+    calls = []
+    policy = HedgePolicy(enabled=True, budget=0.05)
+    text = _generate(_slow_first_handler(calls), _warm_router(0.05), policy)
+    assert text == "Original"
+    assert len(calls) == 1
+    assert policy.hedges == 0
+    print("✅ Budget prevented a hedge")
+
+if __name__ == "__main__":
+    test_retries_server_errors()
+    test_circuit_opens_and_fails_fast()
+    test_half_open_trial_closes_circuit()
+    test_slow_primary_routes_to_fallback()
+    test_slow_primary_wins_traffic_back()
+    test_fallback_answers_are_cached_under_fallback()
+    test_hedge_answers_slow_request()
+    test_hedge_loser_settles_its_reservation()
+    test_hedge_budget_caps_extra_requests()
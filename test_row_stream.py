@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script for paginated and streamed row responses
+"""
+
+import sys
+import os
+import json
+import asyncio
+import tempfile
+from io import BytesIO
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import httpx
+import pyarrow as pa
+import row_stream
+import snapshots
+from gemini_fakes import patched
+from row_stream import decode_cursor, dumps, iter_arrow_stream, iter_ndjson, page
+
+class UploadFile:
+    def __init__(self, filename, content):
+        self.filename = filename
+        self.file = BytesIO(content)
+
+def make_table(count=25):
+    return pa.table({
+        "email": [f"user{i}@mail.com" for i in range(count)],
+        "score": [float("nan")] + [1.5] * (count - 1)
+    })
+
+def test_cursor_pages_cover_every_row():
+    """Following next cursors visits each row exactly once"""
+    table = make_table()
+    seen, cursor = [], None
+    while True:
+        rows, cursor = page(table, cursor, limit=10)
+        seen.extend(rows.column("email").to_pylist())
+        if cursor is None:
+            break
+    assert seen == table.column("email").to_pylist()
+    assert page(table, None, limit=0)[0].num_rows == 25, "limit 0 returns every row"
+
+    for bad in ["zzz", "bzotMQ"]:
+        try:
+            decode_cursor(bad)
+            assert False, "malformed cursors raise ValueError"
+        except ValueError:
+            pass
+    print("✅ Cursor pagination covers every row")
+
+def test_streamed_formats():
+    """NDJSON and Arrow streams decode back to the same rows, in several chunks"""
+    table = make_table()
+    lines = b"".join(iter_ndjson(table, batch_rows=10)).decode("utf-8").splitlines()
+    assert len(lines) == 25
+    assert json.loads(lines[0]) == {"email": "user0@mail.com", "score": None}
+
+    chunks = list(iter_arrow_stream(table, batch_rows=10))
+    assert len(chunks) > 3
+    streamed = pa.ipc.open_stream(b"".join(chunks)).read_all()
+    assert streamed.schema == table.schema
+    assert streamed.column("email").to_pylist() == table.column("email").to_pylist()
+    print("✅ NDJSON and Arrow streams round-trip")
+
+def test_json_encoders_agree():
+    """orjson and the standard library fallback produce the same valid JSON"""
+    value = {"data": [{"email": "ann@mail.com", "name": "Zoë", "score": float("nan")}], "next_cursor": None}
+    with patched((row_stream, "orjson", None)):
+        fallback = dumps(value)
+    assert json.loads(fallback) == json.loads(dumps(value)) == {
+        "data": [{"email": "ann@mail.com", "name": "Zoë", "score": None}], "next_cursor": None
+    }
+    print("✅ JSON encoders agree")
+
+def test_upload_first_page():
+    """/upload/ returns one page of rows and a cursor for the rest"""
+    import main
+
+    content = b"email,name\n" + b"".join(f"user{i}@mail.com,User {i}\n".encode() for i in range(25))
+    original = snapshots._snapshot_store
+    snapshots._snapshot_store = snapshots.SnapshotStore(tempfile.mkdtemp())
+    try:
+        response = asyncio.run(main.upload_file(
+            UploadFile("contacts.csv", content), generate_from_gemini=False, generation_mode="row",
+            sheet_name="", include_rows=True, response_format="json", page_size=10
+        ))
+        body = json.loads(response.body)
+        assert body["rows"] == 25 and len(body["data"]) == 10
+
+        response = asyncio.run(main.campaign_rows(body["campaign_id"], cursor=body["next_cursor"], limit=0))
+        rest = json.loads(response.body)
+        assert [r["email"] for r in rest["data"]] == [f"user{i}@mail.com" for i in range(10, 25)]
+        assert rest["next_cursor"] is None
+    finally:
+        snapshots._snapshot_store = original
+    print("✅ Uploads return the first page and a cursor")
+
+def test_upload_pages_by_default():
+    """Without page_size, /upload/ returns a bounded first page rather than every row"""
+    import main
+
+    total = row_stream.DEFAULT_PAGE_ROWS + 5
+    content = b"email\n" + b"".join(f"user{i}@mail.com\n".encode() for i in range(total))
+
+    async def post():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/upload/", files={"file": ("contacts.csv", content)})
+
+    original = snapshots._snapshot_store
+    snapshots._snapshot_store = snapshots.SnapshotStore(tempfile.mkdtemp())
+    try:
+        body = asyncio.run(post()).json()
+    finally:
+        snapshots._snapshot_store = original
+    assert body["rows"] == total and len(body["data"]) == row_stream.DEFAULT_PAGE_ROWS
+    assert body["next_cursor"] is not None
+    print(f"✅ Default page holds {len(body['data'])} of {total} rows")
+
+if __name__ == "__main__":
+    test_cursor_pages_cover_every_row()
+    test_streamed_formats()
+    test_json_encoders_agree()
+    test_upload_first_page()
+    test_upload_pages_by_default()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Test script for the Gemini generation scheduler
+"""
+
+import sys
+import os
+import asyncio
+import json
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import httpx
+import pandas as pd
+import gemini_api
+import gemini_client
+import quota
+from gemini_fakes import fake_gemini
+from quota import CampaignUsage, QuotaLimiter
+from scheduler import GenerationScheduler, run_sync
+
+def test_bounded_concurrency_and_completion_order():
+    """Slow items must not block fast ones and in-flight work stays bounded"""
+    state = {"running": 0, "peak": 0, "pulled": 0}
+
+    def items():
+        for delay in [0.2, 0.01, 0.01, 0.01, 0.01]:
+            state["pulled"] += 1
+            yield delay
+
+    async def worker(delay):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(delay)
+        state["running"] -= 1
+        return delay
+
+    async def run():
+        scheduler = GenerationScheduler(concurrency=2)
+        order = []
+        async for index, _ in scheduler.map_unordered(items(), worker):
+            order.append(index)
+        return order
+
+    order = asyncio.run(run())
+    assert state["peak"] == 2
+    assert state["pulled"] == 5
+    assert order[-1] == 0, "slow first item should finish last"
+    print(f"✅ Completion order: {order}")
+
+def test_generate_messages_keeps_row_order():
+    """generate_messages returns one message per row in row order"""
+    def handler(request):
+        prompt = request.read().decode()
+        name = "Ann" if "Ann" in prompt else "Bob"
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": f"Hi {name}"}]}}]})
+
+    with fake_gemini(handler):
+        df = pd.DataFrame({"email": ["ann@mail.com", "bob@mail.com"], "name": ["Ann", "Bob"]})
+        messages = gemini_api.generate_messages(df)
+
+    assert messages == ["Hi Ann", "Hi Bob"]
+    print(f"✅ Messages: {messages}")
+
+def test_segment_mode_calls_once_per_topic():
+    """Segment mode makes one call per topic and personalizes locally"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [
+            {"text": "Hi {{name}} from {{ company }}"}
+        ]}}]})
+
+    with fake_gemini(handler):
+        df = pd.DataFrame({
+            "email": ["ann@mail.com", "bob@mail.com", "cy@mail.com"],
+            "name": ["Ann", "Bob", "Cy"],
+            "company": ["Acme", None, "Initech"],
+            "topic": ["launch", "launch", "webinar"]
+        })
+        messages = gemini_api.generate_messages(df, mode="segment")
+
+    assert len(calls) == 2
+    assert messages == ["Hi Ann from Acme", "Hi Bob from your company", "Hi Cy from Initech"]
+    body = json.loads(calls[0].read())
+    assert body["systemInstruction"]["parts"][0]["text"] == gemini_api.build_preamble(mode="segment")
+    assert body["contents"][0]["parts"][0]["text"] == "Write a marketing email template about launch."
+    print(f"✅ Segment messages: {messages}")
+
+def test_batch_mode_retries_missing_recipients():
+    """Batch mode maps JSON entries by id and retries missing rows one by one"""
+    calls = []
+
+    def handler(request):
+        body = json.loads(request.read())
+        calls.append(body)
+        if "generationConfig" in body:
+            # Answer for the first recipient only, plus an unknown id
+            return httpx.Response(200, json={"candidates": [{"content": {"parts": [
+                {"text": json.dumps([{"id": 0, "message": "Batch Ann"}, {"id": 99, "message": "?"}])}
+            ]}}]})
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "Single Bob"}]}}]})
+
+    with fake_gemini(handler):
+        df = pd.DataFrame({"email": ["ann@mail.com", "bob@mail.com"], "name": ["Ann", "Bob"]})
+        messages = gemini_api.generate_messages(df, mode="batch")
+
+    assert messages == ["Batch Ann", "Single Bob"]
+    assert len(calls) == 2
+    assert calls[0]["generationConfig"]["responseMimeType"] == "application/json"
+    assert calls[0]["systemInstruction"]["parts"][0]["text"] == gemini_api.build_preamble(mode="batch")
+    assert '"id": 1, "name": "Bob"' in calls[0]["contents"][0]["parts"][0]["text"]
+    print(f"✅ Batch messages: {messages}")
+
+def test_quota_limiter_waits_for_token_budget():
+    """A request that would exceed TPM is held until the window frees up"""
+    limiter = QuotaLimiter(rpm=10, tpm=100, window=0.2)
+
+    async def run():
+        first = await limiter.acquire(80)
+        limiter.record(first, 90)
+        started = asyncio.get_running_loop().time()
+        await limiter.acquire(20)
+        return asyncio.get_running_loop().time() - started
+
+    waited = asyncio.run(run())
+    assert waited >= 0.15
+    assert limiter.status()["tokens_last_minute"] == 20
+    print(f"✅ Waited {waited:.2f}s for token budget")
+
+def test_failed_rows_are_empty_and_accounted():
+    """Failures leave rows empty and are counted; usage comes from usageMetadata"""
+    def handler(request):
+        if "Bob" in request.read().decode():
+            return httpx.Response(400)
+        return httpx.Response(200, json={
+            "candidates": [{"content": {"parts": [{"text": "Hi Ann"}]}}],
+            "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 50, "totalTokenCount": 150}
+        })
+
+    process_limiter = quota.get_limiter()
+    before = process_limiter.status()["requests_last_minute"]
+    with fake_gemini(handler):
+        df = pd.DataFrame({"email": ["ann@mail.com", "bob@mail.com"], "name": ["Ann", "Bob"]})
+        usage = CampaignUsage(input_cost_per_mtok=1.0, output_cost_per_mtok=2.0)
+        messages = gemini_api.generate_messages(df, usage=usage)
+        fake_limiter = quota.get_limiter()
+
+    assert fake_limiter is not process_limiter and fake_limiter.status()["requests_last_minute"] == 2
+    assert process_limiter.status()["requests_last_minute"] == before, "tests don't spend the real quota"
+
+    assert messages == ["Hi Ann", ""]
+    summary = usage.summary()
+    assert summary["requests"] == 1 and summary["failed"] == 1
+    assert summary["errors"][0]["row"] == 1
+    assert summary["prompt_tokens"] == 100 and summary["output_tokens"] == 50
+    assert abs(usage.cost - 0.0002) < 1e-9
+    print(f"✅ Usage: {summary}")
+
+def test_sync_calls_share_one_loop_and_client():
+    """Sync entry points reuse one pooled client; a loop's client is closed with its loop"""
+    async def grab():
+        return asyncio.get_running_loop(), gemini_client.get_async_client(), quota.current_usage()
+
+    usage = CampaignUsage()
+    with quota.track_usage(usage):
+        loop_a, client_a, seen_usage = run_sync(grab())
+    loop_b, client_b, _ = run_sync(grab())
+    assert loop_a is loop_b and client_a is client_b and not client_a.is_closed
+    assert seen_usage is usage, "the caller's context carries over"
+
+    _, client_c, _ = asyncio.run(grab())
+    assert client_c is not client_a
+    assert client_c.is_closed, "closed when asyncio.run() shut its loop down"
+    assert not client_a.is_closed
+    print("✅ Sync calls share the background loop's client")
+
+if __name__ == "__main__":
+    test_bounded_concurrency_and_completion_order()
+    test_generate_messages_keeps_row_order()
+    test_segment_mode_calls_once_per_topic()
+    test_batch_mode_retries_missing_recipients()
+    test_quota_limiter_waits_for_token_budget()
+    test_failed_rows_are_empty_and_accounted()
+    test_sync_calls_share_one_loop_and_client()
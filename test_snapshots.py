@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for server-side campaign snapshots
+"""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+from io import BytesIO
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+import pyarrow as pa
+import snapshots
+from snapshots import SnapshotStore
+
+class UploadFile:
+    def __init__(self, filename, content):
+        self.filename = filename
+        self.file = BytesIO(content)
+
+def make_rows(count=5):
+    return pd.DataFrame({
+        "email": [f"user{i}@mail.com" for i in range(count)],
+        "name": [f"User {i}" for i in range(count)],
+        "message": ["Hi", None] * (count // 2) + ["Hi"] * (count % 2)
+    })
+
+def test_save_load_and_preview():
+    """Snapshots round-trip rows and upload details, and pages slice them"""
+    store = SnapshotStore(tempfile.mkdtemp())
+    df = make_rows()
+    campaign_id = store.save(df, filename="contacts.csv", sheet=None)
+
+    assert store.load(campaign_id)['email'].tolist() == df['email'].tolist()
+    assert list(store.load(campaign_id, columns=['email', 'topic']).columns) == ['email']
+    assert store.rows(campaign_id, offset=3, limit=10) == [
+        {"email": "user3@mail.com", "name": "User 3", "message": None},
+        {"email": "user4@mail.com", "name": "User 4", "message": "Hi"}
+    ]
+
+    info = store.info(campaign_id)
+    assert info["rows"] == 5 and info["filename"] == "contacts.csv"
+    assert info["columns"] == ["email", "name", "message"]
+
+    for bad_id in ["../../etc/passwd", "0" * 32]:
+        try:
+            store.info(bad_id)
+            assert False, "unknown ids raise KeyError"
+        except KeyError:
+            pass
+    print("✅ Snapshots round-trip and page rows")
+
+def test_exports():
+    """CSV, Parquet and Arrow exports all carry the same rows"""
+    store = SnapshotStore(tempfile.mkdtemp())
+    df = make_rows(7)
+    campaign_id = store.save(df)
+
+    csv_rows = pd.read_csv(BytesIO(b"".join(store.export(campaign_id, "csv"))))
+    parquet_rows = pd.read_parquet(BytesIO(b"".join(store.export(campaign_id, "parquet"))))
+    arrow_rows = pa.ipc.open_file(pa.py_buffer(b"".join(store.export(campaign_id, "arrow")))).read_all()
+    assert csv_rows['email'].tolist() == df['email'].tolist()
+    assert parquet_rows['name'].tolist() == df['name'].tolist()
+    assert arrow_rows.num_rows == 7
+
+    try:
+        store.export(campaign_id, "xml")
+        assert False, "unknown formats raise ValueError"
+    except ValueError:
+        pass
+    store.delete(campaign_id)
+    try:
+        store.load(campaign_id)
+        assert False, "deleted snapshots are gone"
+    except KeyError:
+        pass
+    print("✅ Snapshots export as CSV, Parquet and Arrow")
+
+def test_upload_returns_campaign_id():
+    """/upload/ snapshots the parsed list and can omit the rows from the response"""
+    import main
+
+    store = SnapshotStore(tempfile.mkdtemp())
+    original = snapshots._snapshot_store
+    snapshots._snapshot_store = store
+    try:
+        response = asyncio.run(main.upload_file(
+            UploadFile("contacts.csv", b"email,name\nann@mail.com,Ann\nbob@mail.com,Bob\n"),
+            generate_from_gemini=False, generation_mode="row", sheet_name="", include_rows=False,
+            response_format="json", page_size=0
+        ))
+    finally:
+        snapshots._snapshot_store = original
+
+    content = json.loads(response.body)
+    assert content["data"] is None and content["rows"] == 2
+    assert store.load(content["campaign_id"])['email'].tolist() == ["ann@mail.com", "bob@mail.com"]
+    print("✅ Uploads are snapshotted under a campaign id")
+
+if __name__ == "__main__":
+    test_save_load_and_preview()
+    test_exports()
+    test_upload_returns_campaign_id()
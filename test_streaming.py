@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for streamed Gemini generation and the /generate/stream/ endpoint
+"""
+
+import sys
+import os
+import asyncio
+import json
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import httpx
+import gemini_api
+import quota
+from gemini_fakes import fake_gemini
+from quota import ESTIMATED_OUTPUT_TOKENS, estimate_tokens
+
+PROMPT = "Say hi to Ann"
+
+class Events(httpx.AsyncByteStream):
+    """Server-sent events carrying one text chunk each, optionally failing at the end"""
+
+    def __init__(self, texts, fail=False, delay=0.0, usage=None):
+        self.texts = texts
+        self.fail = fail
+        self.delay = delay
+        self.usage = usage
+
+    async def __aiter__(self):
+        for i, text in enumerate(self.texts):
+            event = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+            if self.usage and i == len(self.texts) - 1:
+                event["usageMetadata"] = self.usage
+            yield f"data: {json.dumps(event)}\n\n".encode("utf-8")
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise httpx.ReadError("connection reset")
+
+def streaming(texts, **options):
+    """A MockTransport handler answering every request with the given events"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, stream=Events(texts, **options))
+    handler.calls = calls
+    return handler
+
+def test_chunks_arrive_in_order():
+    """Chunks are yielded as they arrive and usageMetadata corrects the quota"""
+    handler = streaming(["Hel", "lo ", "Ann"], usage={"promptTokenCount": 5, "totalTokenCount": 12})
+    with fake_gemini(handler):
+        chunks = list(gemini_api.stream_text_chunks_sync(PROMPT))
+        window = quota.get_limiter().status()
+
+    assert chunks == ["Hel", "lo ", "Ann"]
+    assert window["requests_last_minute"] == 1 and window["tokens_last_minute"] == 12
+    print(f"✅ Chunks: {chunks}")
+
+def test_error_mid_stream_is_raised():
+    """A failure after the first chunk surfaces as GeminiError and is not retried"""
+    handler = streaming(["Hel", "lo "], fail=True)
+    seen = []
+    with fake_gemini(handler):
+        try:
+            for chunk in gemini_api.stream_text_chunks_sync(PROMPT):
+                seen.append(chunk)
+            assert False, "the stream should fail"
+        except gemini_api.GeminiError as e:
+            error = str(e)
+
+    assert seen == ["Hel", "lo "]
+    assert "connection reset" in error
+    assert len(handler.calls) == 1, "output was already seen, so no retry"
+    print(f"✅ Error after {len(seen)} chunks: {error}")
+
+def test_early_stop_corrects_quota():
+    """A consumer that stops early is charged for the streamed text, not the full estimate"""
+    handler = streaming(["Hello", " there", " Ann"], delay=0.2)
+    with fake_gemini(handler):
+        chunks = gemini_api.stream_text_chunks_sync(PROMPT)
+        first = next(chunks)
+        chunks.close()
+        tokens = quota.get_limiter().status()["tokens_last_minute"]
+
+    assert first == "Hello"
+    assert tokens == estimate_tokens(PROMPT) + estimate_tokens(first)
+    assert tokens < estimate_tokens(PROMPT) + ESTIMATED_OUTPUT_TOKENS
+    print(f"✅ Charged {tokens} tokens after stopping early")
+
+def test_stream_endpoint():
+    """The endpoint streams text and aborts, rather than appending error text, on failure"""
+    import main
+
+    async def post():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/generate/stream/", json={"recipient": {"name": "Ann"}})
+
+    with fake_gemini(streaming(["Hello", " Ann"])):
+        response = asyncio.run(post())
+    assert response.status_code == 200 and response.text == "Hello Ann"
+
+    with fake_gemini(lambda request: httpx.Response(400)):
+        response = asyncio.run(post())
+    assert response.status_code == 502 and "HTTP 400" in response.json()["error"]
+
+    with fake_gemini(streaming(["Hello"], fail=True)):
+        try:
+            asyncio.run(post())
+            assert False, "the response should be aborted"
+        except gemini_api.GeminiError:
+            pass
+    print("✅ Stream endpoint streams, reports early errors and aborts on late ones")
+
+if __name__ == "__main__":
+    test_chunks_arrive_in_order()
+    test_error_mid_stream_is_raised()
+    test_early_stop_corrects_quota()
+    test_stream_endpoint()
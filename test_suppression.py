@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script for the suppression list (unsubscribes, bounces, complaints)
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from io import BytesIO
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+import email_sender
+import parser as file_parser
+import pipeline
+import suppression
+from suppression import SuppressionList, suppression_events
+
+class UploadFile:
+    def __init__(self, filename, content):
+        self.filename = filename
+        self.file = BytesIO(content)
+
+def test_lookup_is_normalized_and_survives_compaction():
+    """Addresses match case-insensitively before and after the log is folded in"""
+    directory = tempfile.mkdtemp()
+    suppressions = SuppressionList(directory, compact_threshold=3)
+
+    assert suppressions.add([" Ann@Mail.com ", None, "bob@mail.com", "ann@mail.com"], "bounce") == 2
+    assert suppressions.contains(["ann@mail.com", "BOB@MAIL.COM", "cat@mail.com", None]).tolist() == [
+        True, True, False, False
+    ]
+    assert suppressions.add(["cat@mail.com", "dan@mail.com"], "unsubscribe") == 2
+    assert suppressions.stats()["pending"] == 0, "log is compacted past the threshold"
+
+    # A second process sees the same files
+    reopened = SuppressionList(directory)
+    assert reopened.is_suppressed("Dan@mail.com")
+    assert not reopened.is_suppressed("eve@mail.com")
+    assert reopened.stats()["by_reason"] == {"unsubscribe": 2, "bounce": 2, "complaint": 0, "manual": 0}
+
+    suppressions.add(["eve@mail.com"], "complaint")
+    assert reopened.is_suppressed("eve@mail.com"), "appends by other instances are picked up"
+    print("✅ Suppression lookups are normalized and persistent")
+
+def test_webhook_events():
+    """Hard bounces, complaints and unsubscribe replies are suppressed"""
+    assert suppression_events({
+        "type": "email.bounced",
+        "data": {"to": ["Ann <ann@mail.com>"], "bounce": {"type": "Permanent"}}
+    }) == [("ann@mail.com", "bounce")]
+    assert suppression_events({
+        "type": "email.bounced", "data": {"to": ["ann@mail.com"], "bounce": {"type": "Transient"}}
+    }) == []
+    assert suppression_events({"type": "email.complained", "data": {"to": "bob@mail.com"}}) == [
+        ("bob@mail.com", "complaint")
+    ]
+    assert suppression_events({"from": "Cat <cat@mail.com>", "subject": "Please UNSUBSCRIBE me"}) == [
+        ("cat@mail.com", "unsubscribe")
+    ]
+    assert suppression_events({
+        "type": "email.received", "data": {"from": "Dan <dan@mail.com>", "to": ["hi@us.com"], "text": "unsubscribe"}
+    }) == [("dan@mail.com", "unsubscribe")]
+    assert suppression_events({"type": "email.delivered", "data": {"to": ["ann@mail.com"]}}) == []
+    for event_type in ("email.sent", "email.delivered"):
+        assert suppression_events({"type": event_type, "data": {
+            "from": "Us <hi@us.com>", "to": ["ann@mail.com"], "subject": "How to unsubscribe"
+        }}) == [], "our own outbound mail never suppresses anyone"
+    print("✅ Webhook events map to suppression reasons")
+
+def test_parse_and_send_skip_suppressed():
+    """parse_file, send_bulk_emails and the pipeline never mail suppressed rows"""
+    suppressions = SuppressionList(tempfile.mkdtemp())
+    suppressions.add(["bob@mail.com"], "unsubscribe")
+    sent = []
+
+    def fake_send(email_data):
+        sent.append(email_data["to"][0])
+        return {"id": "x"}
+
+    original_list = suppression._suppression_list
+    original_send = email_sender.resend.Emails.send
+    original_key = email_sender.resend.api_key
+    suppression._suppression_list = suppressions
+    email_sender.resend.Emails.send = fake_send
+    email_sender.resend.api_key = "re_test"
+    try:
+        df = file_parser.parse_file(UploadFile("contacts.csv", b"email,message\nann@mail.com,Hi\nBob@mail.com,Hi\n"))
+        assert df['email'].tolist() == ["ann@mail.com"]
+
+        summary = email_sender.send_bulk_emails({"emails": [
+            {"email": "ann@mail.com", "message": "Hi"},
+            {"email": "bob@mail.com", "message": "Hi"}
+        ]}, delay_seconds=0)
+        assert summary["summary"]["sent"] == 1
+        assert summary["summary"]["suppressed"] == 1
+
+        rows = pd.DataFrame({"email": ["ann@mail.com", "bob@mail.com"], "message": ["Hi", "Hi"]})
+        result = asyncio.run(pipeline.CampaignPipeline(rows).run())
+        assert result["summary"]["sent"] == 1
+        assert result["summary"]["suppressed"] == 1
+    finally:
+        suppression._suppression_list = original_list
+        email_sender.resend.Emails.send = original_send
+        email_sender.resend.api_key = original_key
+
+    assert sent == ["ann@mail.com", "ann@mail.com"]
+    print("✅ Suppressed recipients are filtered before sending")
+
+if __name__ == "__main__":
+    test_lookup_is_normalized_and_survives_compaction()
+    test_webhook_events()
+    test_parse_and_send_skip_suppressed()
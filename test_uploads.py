@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for resumable chunked uploads
+"""
+
+import sys
+import os
+import hashlib
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+import snapshots
+from parser import parse_file
+from uploads import UploadManager, UploadOffsetError
+
+class UploadFile:
+    def __init__(self, filename, content):
+        self.filename = filename
+        self.file = BytesIO(content)
+
+def contacts_csv(rows=3000) -> bytes:
+    lines = ["Email,Name,Notes"]
+    for i in range(rows):
+        # Quoted newlines must survive chunk boundaries
+        notes = '"line one\nline two"' if i % 50 == 0 else "plain"
+        lines.append(f" User{i % 2500}@Company.io ,User {i % 2500},{notes}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def with_snapshot_store(test):
+    def run():
+        original = snapshots._snapshot_store
+        snapshots._snapshot_store = snapshots.SnapshotStore(tempfile.mkdtemp())
+        try:
+            test()
+        finally:
+            snapshots._snapshot_store = original
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+@with_snapshot_store
+def test_streamed_csv_matches_parse_file():
+    """Chunks parsed while they arrive give the same rows as a one-shot parse"""
+    content = contacts_csv()
+    manager = UploadManager(tempfile.mkdtemp())
+    upload = manager.create("contacts.csv", len(content))
+
+    for start in range(0, len(content), 7000):
+        upload.append(content[start:start + 7000], offset=start)
+        time.sleep(0.001)
+    result = manager.finalize(upload.upload_id, hashlib.sha256(content).hexdigest())
+
+    expected = parse_file(UploadFile("contacts.csv", content))
+    snapshot = snapshots.get_snapshot_store().load(result["campaign_id"])
+    assert result["rows"] == len(expected) == 2500
+    assert result["sha256"] == hashlib.sha256(content).hexdigest()
+    assert snapshot['email'].tolist() == expected['email'].tolist()
+    assert os.listdir(manager.directory) == [], "raw bytes are removed once snapshotted"
+    print("✅ Streamed CSV uploads match a one-shot parse")
+
+@with_snapshot_store
+def test_resume_after_interruption():
+    """Offsets are enforced and an upload survives a server restart"""
+    content = contacts_csv(500)
+    directory = tempfile.mkdtemp()
+    upload = UploadManager(directory).create("contacts.csv", len(content))
+    upload.append(content[:4000], offset=0)
+
+    try:
+        upload.append(content[:100], offset=0)
+        assert False, "a stale offset is rejected"
+    except UploadOffsetError as e:
+        assert e.expected == 4000
+
+    restarted = UploadManager(directory)
+    resumed = restarted.get(upload.upload_id)
+    assert resumed.offset == 4000
+    try:
+        restarted.finalize(upload.upload_id)
+        assert False, "missing bytes are reported"
+    except ValueError as e:
+        assert "incomplete" in str(e)
+    try:
+        resumed.append(content[4000:], offset=4000)
+        restarted.finalize(upload.upload_id, checksum="0" * 64)
+        assert False, "checksum mismatches are reported"
+    except ValueError as e:
+        assert "Checksum" in str(e)
+    result = restarted.finalize(upload.upload_id, hashlib.sha256(content).hexdigest())
+    assert result["rows"] == 500
+    upload.abort()
+    print("✅ Uploads resume from their last offset")
+
+@with_snapshot_store
+def test_excel_and_discard():
+    """Workbooks are parsed on finalize; discarded uploads stop their parser"""
+    frame = pd.DataFrame({"email": ["ann@mail.com", "bob@mail.com"], "name": ["Ann", "Bob"]})
+    buffer = BytesIO()
+    frame.to_excel(buffer, index=False)
+    content = buffer.getvalue()
+
+    manager = UploadManager(tempfile.mkdtemp())
+    upload = manager.create("contacts.xlsx", len(content))
+    upload.append(content[:100])
+    upload.append(content[100:])
+    assert upload.rows_parsed == 0, "nothing is parsed before finalize"
+    assert manager.finalize(upload.upload_id)["rows"] == 2
+
+    pending = manager.create("contacts.csv")
+    pending.append(b"email,name\nann@mail.com,Ann\n")
+    manager.discard(pending.upload_id)
+    assert not any(t.name == f"upload-{pending.upload_id}" for t in threading.enumerate())
+    assert os.listdir(manager.directory) == []
+    try:
+        manager.get(pending.upload_id)
+        assert False, "discarded uploads are gone"
+    except KeyError:
+        pass
+
+    try:
+        manager.create("contacts.txt")
+        assert False, "unsupported types are rejected up front"
+    except ValueError:
+        pass
+    try:
+        manager.create("contacts.csv", -1)
+        assert False, "negative lengths are rejected up front"
+    except ValueError:
+        pass
+    print("✅ Excel uploads and discards behave")
+
+if __name__ == "__main__":
+    test_streamed_csv_matches_parse_file()
+    test_resume_after_interruption()
+    test_excel_and_discard()
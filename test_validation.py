@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared vectorized email validation engine
+"""
+
+import sys
+import os
+import random
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import pandas as pd
+from utils import validate_email
+from validation import email_reason, email_reason_codes, normalize_emails, valid_email_mask
+
+CASES = {
+    " John.Doe@Company.IO ": "ok",
+    "": "missing",
+    None: "missing",
+    "a@@b.com": "at_sign",
+    "no-at-sign.com": "at_sign",
+    "@b.com": "local_length",
+    ("x" * 65) + "@b.com": "local_length",
+    "a@": "domain_length",
+    "a@localhost": "domain_format",
+    "a@-b.com": "domain_format",
+    "a@b.c0m": "pattern",
+    "a b@c.com": "pattern",
+    "a@example.com": "blocked_domain",
+    "a..b@c.com": "dots",
+    "a@b..com": "dots",
+}
+
+def test_reason_codes_match_scalar_rules():
+    """Vectorized reason codes equal the per-value rules"""
+    emails = pd.Series(list(CASES), dtype=object)
+    reasons = email_reason_codes(emails)
+
+    assert reasons.astype(str).tolist() == list(CASES.values())
+    assert [email_reason(e) for e in CASES] == list(CASES.values())
+    print(f"✅ Reason codes: {dict(zip(emails.fillna('None'), reasons))}")
+
+def test_mask_agrees_with_validate_email():
+    """The column mask and utils.validate_email accept the same addresses"""
+    emails = pd.Series(list(CASES) + [float("nan"), "ok.person@sub.domain.org"], dtype=object)
+    mask = valid_email_mask(emails)
+
+    assert mask.tolist() == [validate_email(e) for e in emails]
+    assert mask.index.equals(emails.index)
+    print(f"✅ {int(mask.sum())} valid of {len(mask)}")
+
+def test_non_ascii_parity():
+    """Non-ASCII letters are never case-mapped into a different ASCII address"""
+    assert email_reason("\u0130an@mail.com") == "pattern"
+    assert email_reason("\u212aim@mail.com") == "pattern", "Kelvin sign is not 'k'"
+    assert normalize_emails(pd.Series(["  \u0130an@Mail.COM "])).tolist() == ["\u0130an@mail.com"]
+
+    rng = random.Random(38)
+    alphabet = "aZ.@-_ \u0130\u0131\u212a\u00df\u00e9\u00c9\u1e9e"
+    emails = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))) + rng.choice(["", "@Mail.com", ".IO"])
+              for _ in range(20000)]
+    vectorized = email_reason_codes(pd.Series(emails, dtype=object)).astype(str).tolist()
+    mismatches = [(e, v) for e, v in zip(emails, vectorized) if email_reason(e) != v]
+    assert not mismatches, mismatches[:5]
+    print(f"✅ {len(emails)} mixed-script addresses agree")
+
+if __name__ == "__main__":
+    test_reason_codes_match_scalar_rules()
+    test_mask_agrees_with_validate_email()
+    test_non_ascii_parity()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Test script for batched webhook ingestion
+"""
+
+import sys
+import os
+import asyncio
+import base64
+import json
+import sqlite3
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import httpx
+import suppression
+from gemini_fakes import patched
+import webhook_ingest
+from suppression import SuppressionList
+from webhook_ingest import RingBuffer, WebhookIngestor, WebhookSignatureError, sign_payload, verify_signature
+
+SECRET = "whsec_" + base64.b64encode(b"blastify-test-secret").decode("ascii")
+
+def event(event_type, to, **data):
+    return json.dumps({"type": event_type, "data": {"to": [to], **data}}).encode("utf-8")
+
+def test_signature_verification():
+    """Svix signatures are checked, including rotation and the timestamp window"""
+    body = event("email.delivered", "ann@mail.com")
+    headers = sign_payload(body, "msg_1", SECRET, timestamp=1_700_000_000)
+    verify_signature(body, headers, SECRET, now=1_700_000_100)
+
+    rotated = {**headers, "svix-signature": "v1,bm90LXRoaXMtb25l " + headers["svix-signature"]}
+    verify_signature(body, rotated, SECRET, now=1_700_000_100)
+
+    for bad_body, bad_headers, now in [
+        (body + b" ", headers, 1_700_000_100),
+        (body, {**headers, "svix-id": "msg_2"}, 1_700_000_100),
+        (body, headers, 1_700_001_000),
+        (body, {"svix-id": "msg_1"}, 1_700_000_100),
+    ]:
+        try:
+            verify_signature(bad_body, bad_headers, SECRET, now=now)
+            assert False, "tampered, stale and unsigned requests are rejected"
+        except WebhookSignatureError:
+            pass
+    print("✅ Webhook signatures are verified")
+
+def test_ring_buffer_wraps_and_pushes_back():
+    """The buffer keeps FIFO order across the wrap and refuses items when full"""
+    buffer = RingBuffer(4)
+    assert all(buffer.put(i) for i in range(3))
+    assert buffer.drain(2) == [0, 1]
+    assert all(buffer.put(i) for i in range(3, 6))
+    assert not buffer.put(6), "a full buffer refuses new items"
+    assert buffer.drain(10) == [2, 3, 4, 5]
+    assert len(buffer) == 0 and buffer.drain(1) == []
+    print("✅ Ring buffer wraps and pushes back")
+
+def test_batches_dedup_and_suppressions():
+    """Retries are stored once and bounces reach the suppression list"""
+    original = suppression._suppression_list
+    suppression._suppression_list = SuppressionList(tempfile.mkdtemp())
+    path = os.path.join(tempfile.mkdtemp(), "events.sqlite3")
+    try:
+        ingestor = WebhookIngestor(path, buffer_size=8, flush_interval=60, dedup_size=2)
+        bounce = event("email.bounced", "ann@mail.com", bounce={"type": "Permanent"})
+        assert ingestor.submit(bounce, "msg_1") == "queued"
+        assert ingestor.submit(bounce, "msg_1") == "duplicate"
+        for i in range(2, 8):
+            assert ingestor.submit(event("email.delivered", f"user{i}@mail.com"), f"msg_{i}") == "queued"
+        assert ingestor.submit(b"{}", "msg_8") == "queued"
+        assert ingestor.submit(b"{}", "msg_9") == "full"
+        assert ingestor.flush() == 8
+
+        # msg_1 fell out of the 2-entry LRU; the primary key still stores it once
+        assert ingestor.submit(bounce, "msg_1") == "queued"
+        assert ingestor.submit(b"{}", "msg_9") == "queued", "a refused event is accepted on retry"
+        ingestor.close()
+
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 9
+        assert conn.execute("SELECT COUNT(*) FROM events WHERE type = 'email.delivered'").fetchone()[0] == 6
+        stats = ingestor.stats()
+        assert stats["duplicates"] == 1 and stats["rejected"] == 1 and stats["stored"] == 9
+        assert suppression.get_suppression_list().is_suppressed("ann@mail.com")
+    finally:
+        suppression._suppression_list = original
+    print("✅ Events are deduplicated, stored in batches and applied to suppressions")
+
+def test_failed_writes_and_suppressions_are_retried():
+    """A batch that fails to write is retried first; failed suppressions are retried too"""
+    suppressions = SuppressionList(tempfile.mkdtemp())
+    failures = []
+
+    class FlakySuppressions:
+        def add(self, addresses, reason):
+            if not failures:
+                failures.append(reason)
+                raise OSError("disk full")
+            return suppressions.add(addresses, reason)
+
+    path = os.path.join(tempfile.mkdtemp(), "events.sqlite3")
+    with patched((suppression, "_suppression_list", FlakySuppressions())):
+        ingestor = WebhookIngestor(path, buffer_size=4, flush_rows=100, flush_interval=60)
+        ingestor._conn.execute("PRAGMA busy_timeout=0")
+        for i in range(1, 5):
+            assert ingestor.submit(event("email.bounced", f"user{i}@mail.com"), f"msg_{i}") == "queued"
+
+        # Another writer holds the database: the first batch cannot be stored
+        locker = sqlite3.connect(path)
+        locker.execute("BEGIN IMMEDIATE")
+        ingestor.flush_rows = 2
+        try:
+            ingestor.flush()
+            assert False, "the write should fail"
+        except sqlite3.OperationalError:
+            pass
+        ingestor.flush_rows = 100
+        assert ingestor.submit(event("email.delivered", "user5@mail.com"), "msg_5") == "queued"
+        assert ingestor.submit(event("email.delivered", "user6@mail.com"), "msg_6") == "queued"
+        assert ingestor.stats()["buffered"] == 6, "the failed batch is held, not dropped"
+        locker.rollback()
+
+        # The suppression list fails once; the bounces stay queued until it works
+        ingestor.flush_rows = 2
+        try:
+            ingestor.flush()
+            assert False, "the suppression add should fail"
+        except OSError:
+            pass
+        assert ingestor.stats()["stored"] == 6 and ingestor.stats()["unsuppressed"] == 4
+        ingestor.flush()
+        ingestor.close()
+
+    order = [row[0] for row in sqlite3.connect(path).execute("SELECT event_id FROM events ORDER BY rowid")]
+    assert order == [f"msg_{i}" for i in range(1, 7)], order
+    assert all(suppressions.is_suppressed(f"user{i}@mail.com") for i in range(1, 5))
+    assert ingestor.stats()["suppressed"] == 4 and ingestor.stats()["unsuppressed"] == 0
+    print("✅ Failed writes and suppressions are retried in order")
+
+def test_endpoint_acknowledges_signed_events():
+    """The webhook answers before storage and rejects bad signatures when a secret is set"""
+    import main
+
+    original_secret = webhook_ingest.RESEND_WEBHOOK_SECRET
+    original_ingestor = webhook_ingest._webhook_ingestor
+    webhook_ingest.RESEND_WEBHOOK_SECRET = SECRET
+    webhook_ingest._webhook_ingestor = WebhookIngestor(
+        os.path.join(tempfile.mkdtemp(), "events.sqlite3"), flush_interval=60, apply_suppressions=False
+    )
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            body = event("email.opened", "ann@mail.com")
+            signed = await client.post("/webhook/inbound-email/", content=body, headers=sign_payload(body, "msg_1", SECRET))
+            retried = await client.post("/webhook/inbound-email/", content=body, headers=sign_payload(body, "msg_1", SECRET))
+            unsigned = await client.post("/webhook/inbound-email/", content=body)
+            stats = await client.get("/webhook/events/")
+            return signed, retried, unsigned, stats.json()
+
+    try:
+        signed, retried, unsigned, stats = asyncio.run(run())
+    finally:
+        webhook_ingest.close_webhook_ingestor()
+        webhook_ingest.RESEND_WEBHOOK_SECRET = original_secret
+        webhook_ingest._webhook_ingestor = original_ingestor
+
+    assert signed.json() == {"status": "received"}
+    assert retried.json() == {"status": "duplicate"}
+    assert unsigned.status_code == 401
+    assert stats["received"] == 1 and stats["buffered"] == 1 and stats["stored"] == 0
+    print("✅ Webhook endpoint acknowledges before storing")
+
+def test_endpoint_refuses_events_without_a_secret():
+    """Without a signing secret nothing is queued, so forged bounces can't suppress anyone"""
+    import main
+
+    original_secret = webhook_ingest.RESEND_WEBHOOK_SECRET
+    original_ingestor = webhook_ingest._webhook_ingestor
+    webhook_ingest.RESEND_WEBHOOK_SECRET = ""
+    webhook_ingest._webhook_ingestor = WebhookIngestor(
+        os.path.join(tempfile.mkdtemp(), "events.sqlite3"), flush_interval=60, apply_suppressions=False
+    )
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            forged = await client.post("/webhook/inbound-email/", content=event("email.bounced", "ann@mail.com"))
+            stats = await client.get("/webhook/events/")
+            return forged, stats.json()
+
+    try:
+        forged, stats = asyncio.run(run())
+    finally:
+        webhook_ingest.close_webhook_ingestor()
+        webhook_ingest.RESEND_WEBHOOK_SECRET = original_secret
+        webhook_ingest._webhook_ingestor = original_ingestor
+
+    assert forged.status_code == 503
+    assert stats["received"] == 0 and stats["buffered"] == 0
+    print("✅ Unsigned webhooks are refused without a secret")
+
+if __name__ == "__main__":
+    test_signature_verification()
+    test_ring_buffer_wraps_and_pushes_back()
+    test_batches_dedup_and_suppressions()
+    test_failed_writes_and_suppressions_are_retried()
+    test_endpoint_acknowledges_signed_events()
+    test_endpoint_refuses_events_without_a_secret()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test script for the worker pools behind the API handlers
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import workers
+from snapshots import SnapshotStore
+
+CONTENT = b"Email,Name\n ann@mail.com ,Ann\nnot-an-email,Bad\nbob@mail.com,Bob\nann@mail.com,Ann\n"
+
+def test_parse_in_process_pool():
+    """Parsing runs in a spawned worker and lands in the snapshot store"""
+    directory = tempfile.mkdtemp()
+    try:
+        campaign_id, rows = asyncio.run(
+            workers.run_cpu_bound(workers.parse_to_snapshot, CONTENT, "contacts.csv", None, directory)
+        )
+    finally:
+        workers.shutdown()
+
+    assert rows == 2
+    assert SnapshotStore(directory).load(campaign_id)['email'].tolist() == ["ann@mail.com", "bob@mail.com"]
+    print("✅ Uploads are parsed in worker processes")
+
+def test_thread_fallback():
+    """WORKER_PROCESSES=0 runs CPU-bound work in the thread pool"""
+    original = workers.WORKER_PROCESSES
+    workers.WORKER_PROCESSES = 0
+    try:
+        assert workers.get_process_pool() is None
+        result = asyncio.run(workers.run_cpu_bound(
+            workers.import_suppressions, CONTENT, "contacts.csv", "unsubscribe", tempfile.mkdtemp()
+        ))
+    finally:
+        workers.WORKER_PROCESSES = original
+        workers.shutdown()
+
+    assert result["rows"] == 2 and result["added"] == 2
+    print("✅ CPU-bound work falls back to threads")
+
+if __name__ == "__main__":
+    test_parse_in_process_pool()
+    test_thread_fallback()